@@ -13,16 +13,19 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# (Skipped when run programmatically, e.g. by app.core.migrations from the
+# gunicorn master, whose logging is already configured.)
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 from app.core.db import Base
-from app.models import user, device, raw_sensor_data, processed_sensor_data  # Import all models
+from app.models import user, device, raw_sensor_data, processed_sensor_data, notification_outbox, status_event, device_statistics, sensor_rollup, rollup_dirty_hour, access  # Import all models
 from app.core.config import settings
 
 target_metadata = Base.metadata
 
-config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+# (% escaped for configparser: URL-encoded passwords and socket paths)
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
 
 
 def run_migrations_offline() -> None:
@@ -77,6 +80,12 @@ async def run_async_migrations() -> None:
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
 
+    # A caller may pass its own (locked, in-transaction) connection
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
+
     asyncio.run(run_async_migrations())
 
 
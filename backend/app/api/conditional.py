@@ -0,0 +1,49 @@
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a weak ETag from cheap version values (counters, max ids, timestamps)."""
+    raw = "|".join(str(part) for part in parts)
+    digest = hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an ETag (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+
+def validator_headers(etag: str) -> dict[str, str]:
+    """Headers that let clients revalidate the response on their next request."""
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(etag: str, vary: str | None = None) -> Response:
+    """
+    Empty 304 response carrying the current validator.
+
+    `vary` must repeat the full response's Vary header, so caches keep one
+    entry per representation (e.g. JSON and MessagePack) under the validator.
+    """
+    headers = validator_headers(etag)
+    if vary:
+        headers["Vary"] = vary
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def set_validator(response: Response, etag: str) -> None:
+    """Attach the validator to a full response so clients can revalidate later."""
+    response.headers.update(validator_headers(etag))
@@ -1,11 +1,12 @@
-from typing import Generator
+from typing import Any, Generator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, event
 from app.core import security
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.db import get_db
 from app.models.user import User
@@ -14,6 +15,27 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/access-token"
 )
 
+# Columns needed to authorize a request (never includes the password hash)
+PRINCIPAL_FIELDS = ("id", "email", "full_name", "is_active", "is_superuser")
+
+# user_id -> principal column values
+principal_cache: TTLCache[int, dict[str, Any]] = TTLCache(settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target: User) -> None:
+    # Only this worker's cache is cleared; other workers expire via the TTL
+    principal_cache.invalidate(target.id)
+
+def principal_claims(user: User) -> dict[str, Any]:
+    """Claims embedded in access tokens when JWT_EMBED_CLAIMS is enabled."""
+    return {
+        "email": user.email,
+        "name": user.full_name,
+        "active": user.is_active,
+        "su": user.is_superuser,
+    }
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> User:
@@ -32,14 +54,29 @@ async def get_current_user(
     # Let's assume it's user_id as string
     try:
         user_id = int(token_data)
-    except ValueError:
+    except (TypeError, ValueError):
         raise HTTPException(status_code=403, detail="Could not validate credentials")
+    
+    # Stateless fast path: everything needed is signed into the token
+    if settings.JWT_EMBED_CLAIMS and "active" in payload:
+        return User(
+            id=user_id,
+            email=payload.get("email"),
+            full_name=payload.get("name"),
+            is_active=payload["active"],
+            is_superuser=payload.get("su", False),
+        )
+    
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        return User(**cached)
         
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalars().first()
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    principal_cache.set(user_id, {field: getattr(user, field) for field in PRINCIPAL_FIELDS})
     return user
 
 def get_current_active_user(
@@ -48,3 +85,10 @@ def get_current_active_user(
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+def get_current_active_superuser(
+    current_user: User = Depends(get_current_active_user),
+) -> User:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="The user doesn't have enough privileges")
+    return current_user
@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.api import deps
+from app.core.profiling import event_loop_monitor, profiler_lock, sample_stacks
+
+router = APIRouter(dependencies=[Depends(deps.get_current_active_superuser)])
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+):
+    """
+    Sample this worker's stacks (event loop and executor threads) for
+    `seconds` and return them as a collapsed-stack file for flamegraph.pl,
+    speedscope or inferno. Only the worker that receives the request is
+    profiled (see the X-Worker-PID header).
+    """
+    if not profiler_lock.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running on this worker."
+        )
+    try:
+        stacks = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    finally:
+        profiler_lock.release()
+    pid = os.getpid()
+    return PlainTextResponse(
+        stacks,
+        headers={
+            "Content-Disposition": f"attachment; filename=profile-{pid}.folded",
+            "X-Worker-PID": str(pid),
+        },
+    )
+
+@router.get("/event-loop/stalls")
+async def get_event_loop_stalls():
+    """Recent callbacks that blocked this worker's event loop, with their stacks."""
+    return {"pid": os.getpid(), "stalls": list(event_loop_monitor.stalls)}
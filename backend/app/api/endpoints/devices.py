@@ -1,9 +1,11 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_db
-from app.schemas.device import DeviceRegister, DeviceResponse, DeviceUpdate
+from app.api import deps
+from app.api.conditional import make_etag, etag_matches, not_modified, set_validator
+from app.core.db import get_db, get_read_db
+from app.schemas.device import DeviceRegister, DeviceResponse, DeviceUpdate, DeviceIngestKeyResponse
 from app.services.device_service import DeviceService
 
 router = APIRouter()
@@ -35,15 +37,25 @@ async def register_device(
 
 @router.get("", response_model=List[DeviceResponse])
 async def list_devices(
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     List all registered ESP32 devices.
     
+    Supports conditional GET: a matching If-None-Match returns 304
+    without loading or serializing the device list.
+    
     Returns:
         List of all devices in the system
     """
+    etag = make_etag("devices", *await DeviceService.get_devices_version(db))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     devices = await DeviceService.get_all_devices(db)
+    set_validator(response, etag)
     return devices
 
 
@@ -92,6 +104,35 @@ async def update_device(
     return device
 
 
+@router.post(
+    "/{device_id}/ingest-key",
+    response_model=DeviceIngestKeyResponse,
+    dependencies=[Depends(deps.get_current_active_superuser)]
+)
+async def rotate_ingest_key(
+    device_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Issue (or rotate) the key a device uses to authenticate ingest requests.
+    Superusers only: a key lets its holder send readings as the device.
+    
+    The plain key is returned only once; flash it into the device and send
+    it in the X-Device-Key header. After a rotation the previous key keeps
+    working until `previous_key_valid_until`.
+    
+    Raises:
+        HTTPException 404: If device not found
+    """
+    device, api_key = await DeviceService.rotate_ingest_key(db, device_id)
+    return DeviceIngestKeyResponse(
+        device_id=device.id,
+        device_uid=device.device_uid,
+        ingest_key=api_key,
+        previous_key_valid_until=device.previous_ingest_key_expires_at,
+    )
+
+
 @router.delete("/{device_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_device(
     device_id: int,
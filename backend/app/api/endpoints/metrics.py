@@ -0,0 +1,24 @@
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+
+from app.core import metrics
+from app.core.config import settings
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: str | None = Header(None)):
+    """
+    Metrics in the Prometheus text format, aggregated over all workers.
+
+    Scrapes send `Authorization: Bearer <METRICS_TOKEN>` when a token is
+    set. With METRICS_REQUIRE_TOKEN (the gunicorn entry point) and no token
+    configured, the endpoint is not served at all.
+    """
+    if not settings.METRICS_TOKEN:
+        if settings.METRICS_REQUIRE_TOKEN:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    elif not hmac.compare_digest((authorization or "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token.")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,33 +1,143 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status, UploadFile, File
+import glob
 import os
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Literal
-import csv
-import io
 import asyncio
-from datetime import datetime, timezone
-from dateutil.parser import parse as parse_date
-import pytz
-import openpyxl
-from fastapi.responses import StreamingResponse
-
-from app.core.db import get_db
-from app.schemas.sensor import SensorIngestRequest, ProcessedSensorDataResponse, ManualSensorIngestRequest
+import math
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from fastapi.responses import Response, StreamingResponse
+
+from app.api.conditional import make_etag, etag_matches, not_modified, validator_headers
+from app.core.db import get_read_db, get_analytics_db, get_ingest_db, get_bulk_db, get_bulk_read_db
+from app.core.metrics import INGEST_READINGS, UPLOAD_ROWS, UPLOAD_BYTES, EXPORT_ROWS, EXPORT_BYTES
+from app.core.serialization import VARY, FastJSONResponse, encoded_response, to_columnar, wants_msgpack
+from app.schemas.sensor import (
+    SensorIngestRequest,
+    ProcessedSensorDataResponse,
+    ManualSensorIngestRequest,
+    SensorBatchIngestRequest,
+    SensorBatchIngestResponse,
+    StatusHistoryResponse,
+    DeviceStatisticsResponse,
+    AnalyticsSummaryResponse,
+    AlignedSeriesResponse,
+)
+from app.models.device import Device
 from app.models.processed_sensor_data import ProcessedSensorData
 from app.services.device_service import DeviceService
-from app.services.sensor_service import SensorService
+from app.services.ingest_dedup import DedupWindow, ingest_dedup
+from app.services.sensor_service import SensorService, DuplicateReadingError, PROCESSED_COLUMNS
+from app.services.status_event_service import StatusEventService
+from app.services.analytics_service import AnalyticsService, SERIES_METRICS
+from app.services.deadband import deadband_compressor
+from app.services.file_formats import available_formats, format_for_filename, get_format, map_upload_row
+from app.services.ingest_rate_limiter import ingest_rate_limiter
+from app.services.online_stats import online_stats
 
 router = APIRouter()
 
+# Last uploaded file (temp_uploads/<name><original extension>), re-read by uploads without a file
+TEMP_UPLOAD_NAME = "sensor_data_processed"
+
+_ingest_outcomes = {outcome: INGEST_READINGS.labels(outcome) for outcome in ("stored", "held", "duplicate")}
+
+def _authenticate_device(device: Device, api_key: str | None) -> None:
+    """Reject ingest requests whose X-Device-Key does not match the device."""
+    if not DeviceService.verify_ingest_key(device, api_key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing device key."
+        )
+
+def _throttle(device: Device, cost: int = 1) -> None:
+    """
+    Raise 429 if the device exceeded its ingest rate limit (one token per
+    reading). Call after _authenticate_device, so only the device itself
+    can spend its tokens.
+    """
+    wait = ingest_rate_limiter.acquire(device.device_uid, cost, device.ingest_rate_limit, device.ingest_burst)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests from this device.",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+def _replayed(reading: dict) -> FastJSONResponse:
+    """Response for a reading that was already stored (idempotent retry)."""
+    return FastJSONResponse(reading, status_code=status.HTTP_200_OK, headers={"Idempotent-Replayed": "true"})
+
+def _ingest_response(reading: dict, outcome: str) -> FastJSONResponse:
+    """Response for a single ingested reading, by outcome (stored, duplicate, held)."""
+    if outcome == "duplicate":
+        return _replayed(reading)
+    if outcome == "held":
+        # Folded into the last stored reading by deadband compression
+        return FastJSONResponse(reading, status_code=status.HTTP_202_ACCEPTED, headers={"Reading-Held": "true"})
+    return FastJSONResponse(reading, status_code=status.HTTP_201_CREATED)
+
+async def _store_reading(
+    db: AsyncSession,
+    device: Device,
+    sensor_data,
+    dedup_key: str | None,
+    api_key: str | None,
+    timestamp: datetime | None = None
+) -> tuple[dict, str]:
+    """
+    Store one reading, remembering its idempotency key for fast retries.
+    
+    Returns:
+        Tuple of the stored reading (as a dict) and the outcome: "stored",
+        "duplicate" (already stored) or "held" (deadband compression; the
+        dict is the stored reading it was folded into)
+    """
+    device_uid = device.device_uid
+    device_id = device.id
+    try:
+        reading = await SensorService.ingest_sensor_data(
+            db, device, sensor_data, timestamp=timestamp, dedup_key=DedupWindow.durable_key(dedup_key)
+        )
+    except DuplicateReadingError as e:
+        stored, outcome = e.reading, "duplicate"
+    else:
+        if reading is None:
+            stored, outcome = deadband_compressor.reference(device_id), "held"
+        else:
+            stored, outcome = SensorService.reading_to_dict(reading), "stored"
+    
+    if dedup_key:
+        ingest_dedup.remember(device_uid, dedup_key, api_key, stored)
+    _ingest_outcomes[outcome].inc()
+    return stored, outcome
+
 @router.post("/ingest", response_model=ProcessedSensorDataResponse, status_code=status.HTTP_201_CREATED)
 async def ingest_sensor_data(
     sensor_data: SensorIngestRequest,
-    db: AsyncSession = Depends(get_db)
+    x_device_key: str | None = Header(None),
+    idempotency_key: str | None = Header(None),
+    db: AsyncSession = Depends(get_ingest_db)
 ):
     """
     Ingest sensor data from ESP32 device.
+    
+    Devices with an ingest key must send it in the X-Device-Key header.
+    Each device is rate limited (429 with Retry-After when exceeded).
+    Retries carrying the same Idempotency-Key (or `seq` and `boot_id`) are
+    answered with the stored reading (200, Idempotent-Replayed: true)
+    instead of a new row; recent keys are answered from memory without
+    touching the database. A `seq` without `boot_id` is only deduplicated
+    for INGEST_DEDUP_TTL_SECONDS, since counters restart on reboot.
     """
+    dedup_key = DedupWindow.make_key(sensor_data.seq, idempotency_key, sensor_data.boot_id)
+    if dedup_key:
+        replay = ingest_dedup.lookup(sensor_data.device_uid, dedup_key, x_device_key)
+        if replay is not None:
+            return _replayed(replay)
+    
     # Validate device exists
     device = await DeviceService.get_device_by_uid(db, sensor_data.device_uid)
     
@@ -37,20 +147,29 @@ async def ingest_sensor_data(
             detail=f"Device with UID '{sensor_data.device_uid}' not found. "
                    f"Device must be registered before sending data."
         )
+    _authenticate_device(device, x_device_key)
+    _throttle(device)
     
     # Process and store sensor reading
-    reading = await SensorService.ingest_sensor_data(db, device, sensor_data)
-    
-    return reading
+    reading, outcome = await _store_reading(db, device, sensor_data, dedup_key, x_device_key)
+    return _ingest_response(reading, outcome)
 
 @router.post("/ingest/manual", response_model=ProcessedSensorDataResponse, status_code=status.HTTP_201_CREATED)
 async def ingest_manual_sensor_data(
     sensor_data: ManualSensorIngestRequest,
-    db: AsyncSession = Depends(get_db)
+    x_device_key: str | None = Header(None),
+    idempotency_key: str | None = Header(None),
+    db: AsyncSession = Depends(get_ingest_db)
 ):
     """
     Manually ingest sensor data with optional custom timestamp.
     """
+    dedup_key = DedupWindow.make_key(sensor_data.seq, idempotency_key, sensor_data.boot_id)
+    if dedup_key:
+        replay = ingest_dedup.lookup(sensor_data.device_uid, dedup_key, x_device_key)
+        if replay is not None:
+            return _replayed(replay)
+    
     # Validate device exists
     device = await DeviceService.get_device_by_uid(db, sensor_data.device_uid)
     
@@ -59,25 +178,77 @@ async def ingest_manual_sensor_data(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Device with UID '{sensor_data.device_uid}' not found."
         )
+    _authenticate_device(device, x_device_key)
+    _throttle(device)
     
     # Process and store sensor reading with custom timestamp
-    reading = await SensorService.ingest_sensor_data(
-        db, 
-        device, 
-        sensor_data, 
+    reading, outcome = await _store_reading(
+        db,
+        device,
+        sensor_data,
+        dedup_key,
+        x_device_key,
         timestamp=sensor_data.timestamp
     )
+    return _ingest_response(reading, outcome)
+
+@router.post("/ingest/batch", response_model=SensorBatchIngestResponse)
+async def ingest_sensor_batch(
+    batch: SensorBatchIngestRequest,
+    x_device_key: str | None = Header(None),
+    db: AsyncSession = Depends(get_ingest_db)
+):
+    """
+    Replay buffered readings (e.g. after a connectivity outage).
+    
+    Readings with an `idempotency_key` (or `seq` and `boot_id`) that was
+    already stored are skipped, so a batch can safely be resent in full.
+    At most MAX_BATCH_READINGS readings per request.
+    """
+    device = await DeviceService.get_device_by_uid(db, batch.device_uid)
+    
+    if not device:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Device with UID '{batch.device_uid}' not found."
+        )
+    _authenticate_device(device, x_device_key)
+    _throttle(device, len(batch.readings))
+    
+    accepted = 0
+    duplicates = 0
+    held = 0
+    ids = []
+    for item in batch.readings:
+        dedup_key = DedupWindow.make_key(item.seq, item.idempotency_key, item.boot_id)
+        replay = ingest_dedup.lookup(batch.device_uid, dedup_key, x_device_key) if dedup_key else None
+        if replay is not None:
+            duplicates += 1
+            ids.append(replay["id"])
+            continue
+        
+        reading, outcome = await _store_reading(
+            db, device, item, dedup_key, x_device_key, timestamp=item.timestamp
+        )
+        if outcome == "duplicate":
+            duplicates += 1
+        elif outcome == "held":
+            held += 1
+        else:
+            accepted += 1
+        ids.append(reading["id"])
     
-    return reading
+    return {"accepted": accepted, "duplicates": duplicates, "held": held, "ids": ids}
 
 @router.post("/devices/{device_id}/upload", status_code=status.HTTP_201_CREATED)
 async def upload_processed_data(
     device_id: int,
     file: UploadFile = File(None),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_bulk_db)
 ):
     """
-    Upload processed sensor data from a CSV or Excel file and associate it with a device.
+    Upload processed sensor data from a file (CSV, Excel, NDJSON; see
+    app.services.file_formats) and associate it with a device.
     Generates dummy raw sensor data (0s) to satisfy foreign key constraints.
     If no file is provided, attempts to read from a local temporary 'temp_uploads' folder.
     """
@@ -88,167 +259,88 @@ async def upload_processed_data(
             detail=f"Device with ID '{device_id}' not found."
         )
 
-    # Temporary storage logic
+    # Temporary storage logic: the last uploaded file, kept with its extension
     temp_dir = os.path.join(os.getcwd(), "temp_uploads")
-    default_file_path = os.path.join(temp_dir, "sensor_data_processed.xlsx")
+    stored_files = glob.glob(os.path.join(temp_dir, f"{TEMP_UPLOAD_NAME}.*"))
 
-    content = None
-    filename = ""
+    if file:
+        filename = file.filename.lower()
+    elif stored_files:
+        filename = os.path.basename(max(stored_files, key=os.path.getmtime))
+    else:
+        raise HTTPException(
+            status_code=400, 
+            detail="No file provided and no previously uploaded file found in temporary storage."
+        )
+
+    file_format = format_for_filename(filename)
+    if file_format is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file format. Supported formats: {', '.join(available_formats())}."
+        )
 
     if file:
         content = await file.read()
-        filename = file.filename.lower()
         
         # Save to temp storage for future re-use
         os.makedirs(temp_dir, exist_ok=True)
-        with open(default_file_path, "wb") as f:
+        for path in stored_files:
+            with suppress(FileNotFoundError):
+                os.remove(path)
+        with open(os.path.join(temp_dir, TEMP_UPLOAD_NAME + os.path.splitext(filename)[1]), "wb") as f:
             f.write(content)
-            
     else:
-        # Try to read from temp storage
-        if not os.path.exists(default_file_path):
-            raise HTTPException(
-                status_code=400, 
-                detail="No file provided and no previously uploaded file found in temporary storage."
-            )
-        with open(default_file_path, "rb") as f:
+        with open(os.path.join(temp_dir, filename), "rb") as f:
             content = f.read()
-        filename = "sensor_data_processed.xlsx"
     
     rows_processed = 0
     errors = []
+    uploaded = []
 
     try:
         from app.models.raw_sensor_data import RawSensorData
-        from app.models.processed_sensor_data import ProcessedSensorData
         
-        if filename.endswith(".csv"):
-            import codecs
-            reader = csv.DictReader(codecs.iterdecode(io.BytesIO(content), 'utf-8'))
-            
-            for index, row in enumerate(reader):
-                try:
-                    # Map columns (fallback to lowercase matching if needed, but exact matches preferred)
-                    def get_val(keys, default=0.0):
-                        for k in keys:
-                            if k in row and row[k]:
-                                return float(row[k])
-                        return default
-                        
-                    created_at_raw = row.get("Created At") or row.get("created_at")
-                    if created_at_raw:
-                        created_at = parse_date(created_at_raw)
-                        if created_at.tzinfo is None:
-                            # Assume IST for naive uploaded times
-                            ist_tz = pytz.timezone('Asia/Kolkata')
-                            created_at = ist_tz.localize(created_at).astimezone(pytz.UTC)
-                    else:
-                        created_at = datetime.now(timezone.utc)
-
-                    status_val = row.get("Status") or row.get("status", "SAFE")
-                    tilt_x = get_val(["Tilt Diff X", "tilt_diff_x"])
-                    tilt_y = get_val(["Tilt Diff Y", "tilt_diff_y"])
-                    tilt_z = get_val(["Tilt Diff Z", "tilt_diff_z"])
-                    dist_mm = get_val(["Distance Diff (mm)", "distance_diff_mm"])
-                    tilt_pct = get_val(["Tilt Change %", "tilt_change_percent"])
-                    dist_pct = get_val(["Distance Change %", "distance_change_percent"])
-                    
-                    # 1. Create Mock Raw Data
-                    mock_raw = RawSensorData(
-                        device_id=device_id,
-                        tilt_x=0.0, tilt_y=0.0, tilt_z=0.0, distance_mm=0.0,
-                        created_at=created_at
-                    )
-                    db.add(mock_raw)
-                    await db.flush() # Flush to get ID
-                    
-                    # 2. Create Processed Data using real values
-                    processed = ProcessedSensorData(
-                        device_id=device_id,
-                        raw_data_id=mock_raw.id,
-                        tilt_diff_x=tilt_x,
-                        tilt_diff_y=tilt_y,
-                        tilt_diff_z=tilt_z,
-                        distance_diff_mm=dist_mm,
-                        tilt_change_percent=tilt_pct,
-                        distance_change_percent=dist_pct,
-                        status=status_val,
-                        created_at=created_at
-                    )
-                    db.add(processed)
-                    rows_processed += 1
-                except Exception as e:
-                    errors.append(f"Row {index+2}: {str(e)}")
-                    
-        elif filename.endswith(".xlsx"):
-            workbook = openpyxl.load_workbook(io.BytesIO(content), data_only=True)
-            sheet = workbook.active
-            headers = [cell.value for cell in sheet[1]]
-            
-            for index, row_cells in enumerate(sheet.iter_rows(min_row=2, values_only=True)):
-                if not any(row_cells): continue # Skip empty rows
+        # Parsing (openpyxl for Excel) runs off the event loop, like building exports
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, lambda: list(file_format.read(content)))
+        
+        for row_number, row in rows:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                values = map_upload_row(row)
                 
-                try:
-                    row = dict(zip(headers, row_cells))
-                    
-                    def get_val(keys, default=0.0):
-                        for k in keys:
-                            if k in row and row[k] is not None:
-                                return float(row[k])
-                        return default
-                    
-                    created_at_raw = row.get("Created At") or row.get("created_at")
-                    if isinstance(created_at_raw, datetime):
-                        created_at = created_at_raw
-                    elif created_at_raw:
-                        created_at = parse_date(str(created_at_raw))
-                    else:
-                        created_at = datetime.now(timezone.utc)
-                        
-                    if created_at.tzinfo is None:
-                        # Assume IST for naive uploaded times
-                        ist_tz = pytz.timezone('Asia/Kolkata')
-                        created_at = ist_tz.localize(created_at).astimezone(pytz.UTC)
-
-                    status_val = str(row.get("Status") or row.get("status") or "SAFE")
-                    tilt_x = get_val(["Tilt Diff X", "tilt_diff_x"])
-                    tilt_y = get_val(["Tilt Diff Y", "tilt_diff_y"])
-                    tilt_z = get_val(["Tilt Diff Z", "tilt_diff_z"])
-                    dist_mm = get_val(["Distance Diff (mm)", "distance_diff_mm"])
-                    tilt_pct = get_val(["Tilt Change %", "tilt_change_percent"])
-                    dist_pct = get_val(["Distance Change %", "distance_change_percent"])
-                    
-                    # 1. Create Mock Raw Data
-                    mock_raw = RawSensorData(
-                        device_id=device_id,
-                        tilt_x=0.0, tilt_y=0.0, tilt_z=0.0, distance_mm=0.0,
-                        created_at=created_at
-                    )
-                    db.add(mock_raw)
-                    await db.flush() # Flush to get ID
-                    
-                    # 2. Create Processed Data
-                    processed = ProcessedSensorData(
-                        device_id=device_id,
-                        raw_data_id=mock_raw.id,
-                        tilt_diff_x=tilt_x,
-                        tilt_diff_y=tilt_y,
-                        tilt_diff_z=tilt_z,
-                        distance_diff_mm=dist_mm,
-                        tilt_change_percent=tilt_pct,
-                        distance_change_percent=dist_pct,
-                        status=status_val,
-                        created_at=created_at
-                    )
-                    db.add(processed)
-                    rows_processed += 1
-                except Exception as e:
-                    errors.append(f"Row {index+2}: {str(e)}")
-        else:
-            raise HTTPException(status_code=400, detail="Invalid file format. Only .csv and .xlsx are supported.")
+                # 1. Create Mock Raw Data
+                mock_raw = RawSensorData(
+                    device_id=device_id,
+                    tilt_x=0.0, tilt_y=0.0, tilt_z=0.0, distance_mm=0.0,
+                    created_at=values["created_at"]
+                )
+                db.add(mock_raw)
+                await db.flush() # Flush to get ID
+                
+                # 2. Create Processed Data using real values
+                processed = ProcessedSensorData(
+                    device_id=device_id,
+                    raw_data_id=mock_raw.id,
+                    **values
+                )
+                db.add(processed)
+                uploaded.append(processed)
+                rows_processed += 1
+            except Exception as e:
+                errors.append(f"Row {row_number}: {str(e)}")
 
         if rows_processed > 0:
+            await StatusEventService.record_bulk_transitions(db, device_id, uploaded)
+            await AnalyticsService.mark_rollup_dirty(db, device_id, [reading.created_at for reading in uploaded])
+            # Uploaded rows may change the baseline; every worker reloads it on the next reading
+            device.generation += 1
             await db.commit()
+            SensorService.forget_device(device_id)
+            UPLOAD_ROWS.labels(file_format.name).inc(rows_processed)
+            UPLOAD_BYTES.labels(file_format.name).inc(len(content))
         else:
             await db.rollback()
             
@@ -263,124 +355,164 @@ async def upload_processed_data(
 
 @router.get("/devices/{device_id}/processed", response_model=List[ProcessedSensorDataResponse])
 async def get_processed_data(
+    request: Request,
     device_id: int,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    format: Literal["json", "columnar"] = "json",
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get processed sensor data for a specific device.
+    
+    Supports conditional GET keyed on the device's latest reading id.
+    Rows are selected as plain columns and encoded directly to JSON bytes.
+    
+    `format=columnar` returns one array per field (see `to_columnar`), and
+    `Accept: application/msgpack` switches either format to MessagePack.
     """
-    result = await db.execute(
-        select(ProcessedSensorData)
-        .where(ProcessedSensorData.device_id == device_id)
-        .order_by(ProcessedSensorData.created_at.desc())
-        .limit(limit)
+    version = await SensorService.get_processed_version(db, device_id)
+    etag = make_etag("processed", device_id, version, limit, format, wants_msgpack(request))
+    if etag_matches(request, etag):
+        return not_modified(etag, vary=VARY)
+    
+    rows = await SensorService.get_processed_rows(db, device_id, limit)
+    content = to_columnar(rows) if format == "columnar" else rows
+    return encoded_response(request, content, headers=validator_headers(etag))
+
+
+@router.get("/devices/{device_id}/status-history", response_model=StatusHistoryResponse)
+async def get_status_history(
+    device_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int = 1000,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get status transitions (e.g. SAFE -> ALERT) and time spent in each status.
+    
+    Reads only the status_events table, never the readings themselves.
+    """
+    return await StatusEventService.get_status_history(db, device_id, start, end, limit)
+
+
+@router.get("/devices/{device_id}/summary", response_model=AnalyticsSummaryResponse)
+async def get_analytics_summary(
+    request: Request,
+    device_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact: bool = False,
+    format: Literal["json", "columnar"] = "json",
+    db: AsyncSession = Depends(get_analytics_db)
+):
+    """
+    Get min, max, mean, stddev and percentiles of the processed metrics,
+    reading counts per status and time spent in each status over a range.
+    
+    Computed in the database over the full range. Long ranges use the
+    hourly rollup (no percentiles) unless exact=true.
+    
+    `format=columnar` returns one array per statistic across the metrics
+    and statuses as codes (see `AnalyticsService.summary_to_columnar`);
+    with `Accept: application/msgpack` it is sent as MessagePack.
+    """
+    summary = await AnalyticsService.get_summary(db, device_id, start, end, exact)
+    if format == "columnar":
+        return encoded_response(request, AnalyticsService.summary_to_columnar(summary))
+    return summary
+
+
+@router.get("/series", response_model=AlignedSeriesResponse)
+async def get_aligned_series(
+    request: Request,
+    device_ids: List[int] | None = Query(None),
+    building_name: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    bucket_seconds: int = Query(300, ge=1),
+    metrics: List[Literal[SERIES_METRICS]] = Query(["tilt_change_percent", "distance_change_percent"]),
+    format: Literal["json", "columnar"] = "json",
+    db: AsyncSession = Depends(get_analytics_db)
+):
+    """
+    Get several devices' readings bucketed onto one time axis.
+    
+    Select devices with repeated `device_ids` or a `building_name`. Returns
+    a time x device matrix per metric (bucket averages) from one grouped
+    query. Defaults to the last 24 hours; `format=columnar` sends bucket
+    times as epoch deltas (see `AnalyticsService.series_to_columnar`) and
+    `Accept: application/msgpack` switches to MessagePack.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=24)
+    content = await AnalyticsService.get_aligned_series(
+        db, device_ids, building_name, start, end, bucket_seconds, list(dict.fromkeys(metrics))
     )
-    return result.scalars().all()
+    if format == "columnar":
+        content = AnalyticsService.series_to_columnar(content)
+    return encoded_response(request, content)
+
+
+@router.get("/devices/{device_id}/stats", response_model=DeviceStatisticsResponse)
+async def get_device_statistics(
+    device_id: int,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get streaming statistics of the raw readings: EWMA, variance, min/max
+    and trend (slope per hour) for tilt and distance.
+    
+    Maintained incrementally during ingest, so no history is scanned.
+    """
+    return await online_stats.get_summary(db, device_id)
 
 
 @router.get("/devices/{device_id}/export")
 async def export_sensor_data(
     device_id: int,
-    format: Literal["csv", "xlsx"] = "csv",
+    format: str = "csv",
     limit: int = 1000,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_bulk_read_db)
 ):
     """
-    Export processed sensor data as CSV or Excel.
+    Export processed sensor data as CSV, Excel or NDJSON.
     """
-    # 1. Fetch Data
+    file_format = get_format(format)
+    if file_format is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format '{format}'. Supported formats: {', '.join(available_formats())}."
+        )
+
+    # 1. Fetch Data (plain column rows, no ORM entities)
     result = await db.execute(
-        select(ProcessedSensorData)
+        select(*PROCESSED_COLUMNS)
         .where(ProcessedSensorData.device_id == device_id)
         .order_by(ProcessedSensorData.created_at.desc())
         .limit(limit)
     )
-    data = result.scalars().all()
+    data = result.all()
+    EXPORT_ROWS.labels(file_format.name).inc(len(data))
     
-    filename = f"sensor_data_device_{device_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    filename = f"sensor_data_device_{device_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
 
-    if format == "csv":
-        async def iter_csv():
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Headers
-            headers = [
-                "ID", "Created At", "Status",
-                "Tilt Diff X", "Tilt Diff Y", "Tilt Diff Z",
-                "Distance Diff (mm)",
-                "Tilt Change %", "Distance Change %"
-            ]
-            writer.writerow(headers)
-            output.seek(0)
-            yield output.read()
-            output.truncate(0)
-            output.seek(0)
-            
-            # Rows
-            for row in data:
-                writer.writerow([
-                    row.id,
-                    row.created_at.isoformat(),
-                    row.status,
-                    row.tilt_diff_x,
-                    row.tilt_diff_y,
-                    row.tilt_diff_z,
-                    row.distance_diff_mm,
-                    row.tilt_change_percent,
-                    row.distance_change_percent
-                ])
-                output.seek(0)
-                yield output.read()
-                output.truncate(0)
-                output.seek(0)
-
-        return StreamingResponse(
-            iter_csv(),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}.csv"}
-        )
-        
-    elif format == "xlsx":
-        def generate_excel():
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            sheet.title = "Sensor Data"
-            
-            # Headers
-            headers = [
-                "ID", "Created At", "Status",
-                "Tilt Diff X", "Tilt Diff Y", "Tilt Diff Z",
-                "Distance Diff (mm)",
-                "Tilt Change %", "Distance Change %"
-            ]
-            sheet.append(headers)
-            
-            # Rows
-            for row in data:
-                sheet.append([
-                    row.id,
-                    row.created_at.replace(tzinfo=None), # Excel doesn't like timezone aware datetimes sometimes
-                    row.status,
-                    row.tilt_diff_x,
-                    row.tilt_diff_y,
-                    row.tilt_diff_z,
-                    row.distance_diff_mm,
-                    row.tilt_change_percent,
-                    row.distance_change_percent
-                ])
-                
-            output = io.BytesIO()
-            workbook.save(output)
-            output.seek(0)
-            return output
+    if file_format.streaming:
+        async def iter_chunks():
+            written = 0
+            try:
+                for chunk in file_format.write(data):
+                    written += len(chunk)
+                    yield chunk
+            finally:
+                # Counted once per export (also when the client disconnects early)
+                EXPORT_BYTES.labels(file_format.name).inc(written)
 
-        loop = asyncio.get_running_loop()
-        output = await loop.run_in_executor(None, generate_excel)
-        
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}.xlsx"}
-        )
+        return StreamingResponse(iter_chunks(), media_type=file_format.media_type, headers=headers)
+
+    # Whole-file formats (Excel) are built off the event loop
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(None, lambda: b"".join(file_format.write(data)))
+    EXPORT_BYTES.labels(file_format.name).inc(len(content))
+    return Response(content, media_type=file_format.media_type, headers=headers)
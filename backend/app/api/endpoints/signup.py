@@ -5,7 +5,7 @@ from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_db
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async
 from app.models.user import User
 
 router = APIRouter()
@@ -33,7 +33,7 @@ async def post_signup(
             "message_class": "error"
         })
     
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     new_user = User(email=email, hashed_password=hashed_password, full_name=full_name)
     db.add(new_user)
     await db.commit()
@@ -0,0 +1,115 @@
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import HTTP_REQUEST_DURATION
+from app.core.query_stats import QueryStats, track_queries
+
+logger = logging.getLogger(__name__)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route that handled a request (bounded label values).
+
+    Routes of included routers carry their path relative to the router
+    prefix, so the prefix is taken from the request path (one segment per
+    template segment).
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "<unmatched>"
+    segments = scope["path"].split("/")
+    prefix = "/".join(segments[: max(len(segments) - template.count("/"), 0)])
+    return prefix + template
+
+
+class RequestMetricsMiddleware:
+    """
+    Records request latency by method, route template and status code.
+
+    Plain ASGI middleware (no per-request Request/Response objects), so it
+    adds a few microseconds per request. Streaming responses are timed to
+    their last chunk.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.labels(scope["method"], route_template(scope), status_code).observe(
+                time.perf_counter() - started
+            )
+
+
+class QueryTimingMiddleware:
+    """
+    Per-request SQL instrumentation (statement count and database time).
+
+    - `Server-Timing: db;dur=<ms>;desc="<n> queries"` on every response
+      (SQL_SERVER_TIMING), covering the statements run before the response
+      started.
+    - A warning for requests slower than SLOW_REQUEST_LOG_SECONDS.
+    - With QUERY_REPEAT_DETECTION (development), a warning for statements
+      executed QUERY_REPEAT_THRESHOLD or more times in one request, the
+      usual sign of per-row queries or flushes in a loop.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        with track_queries() as stats:
+            async def send_with_timing(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    if settings.SQL_SERVER_TIMING:
+                        MutableHeaders(scope=message).append(
+                            "Server-Timing", f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'
+                        )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                self._report(scope, status_code, time.perf_counter() - started, stats)
+
+    @staticmethod
+    def _report(scope: Scope, status_code: int, elapsed: float, stats: QueryStats) -> None:
+        request = f"{scope['method']} {scope['path']}"
+        threshold = settings.SLOW_REQUEST_LOG_SECONDS
+        if threshold and elapsed >= threshold:
+            logger.warning(
+                "Slow request %s -> %s in %.0f ms (%d queries, %.0f ms in database)",
+                request, status_code, elapsed * 1000, stats.count, stats.duration * 1000,
+            )
+        if settings.QUERY_REPEAT_DETECTION:
+            for statement, count in stats.repeated(settings.QUERY_REPEAT_THRESHOLD):
+                logger.warning("Repeated query in %s (%dx, possible N+1): %s", request, count, statement)
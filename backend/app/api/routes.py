@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import health, auth, signup, users, devices, sensor, device_page
+from .endpoints import health, auth, signup, users, devices, sensor, device_page, admin
 
 api_router = APIRouter()
 api_router.include_router(health.router)
@@ -10,6 +10,7 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(device_page.router, prefix="/devices", tags=["devices-ui"])
 api_router.include_router(devices.router, prefix="/devices", tags=["devices"])
 api_router.include_router(sensor.router, prefix="/sensor", tags=["sensor"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 
 
@@ -0,0 +1,97 @@
+import random
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import INGEST_IN_FLIGHT, HEAVY_IN_FLIGHT, INGEST_SHED, HEAVY_SHED
+
+# Smoothing of the pool checkout wait average (weight of the newest sample)
+_WAIT_ALPHA = 0.2
+# A wait average with no newer sample than this no longer signals pressure
+_WAIT_STALE_SECONDS = 2.0
+
+class AdmissionController:
+    """
+    Fast 503s instead of unbounded queueing when the database saturates.
+    
+    Two workload classes are tracked: "ingest" and "heavy" (exports,
+    uploads, analytics). Ingest is rejected once ADMISSION_INGEST_MAX_IN_FLIGHT
+    requests are running, or, while the smoothed ingest pool checkout wait
+    exceeds ADMISSION_MAX_POOL_WAIT_SECONDS, once every pooled connection is
+    busy (requests beyond that would only queue). Heavy requests are shed
+    first: whenever ingest shows pressure, and beyond their own in-flight
+    cap. Rejections carry a jittered Retry-After so devices do not retry in
+    lockstep.
+    
+    Counts are per process (asyncio, single thread), like the pools.
+    """
+    
+    def __init__(self):
+        self.in_flight = {"ingest": 0, "heavy": 0}
+        self.pool_wait: dict[str, float] = {}
+        self._sampled_at: dict[str, float] = {}
+    
+    def record_wait(self, pool: str, seconds: float) -> None:
+        """Fold one pool checkout wait into the pool's moving average."""
+        previous = self.pool_wait.get(pool, seconds)
+        self.pool_wait[pool] = previous + _WAIT_ALPHA * (seconds - previous)
+        self._sampled_at[pool] = time.monotonic()
+    
+    def current_wait(self, pool: str) -> float:
+        """Recent average checkout wait (0 once no request has waited lately)."""
+        if time.monotonic() - self._sampled_at.get(pool, 0.0) > _WAIT_STALE_SECONDS:
+            return 0.0
+        return self.pool_wait.get(pool, 0.0)
+    
+    def ingest_saturated(self) -> bool:
+        return self.current_wait("ingest") > settings.ADMISSION_MAX_POOL_WAIT_SECONDS
+    
+    def ingest_under_pressure(self) -> bool:
+        return self.ingest_saturated() or self.in_flight["ingest"] >= settings.DB_POOL_INGEST_SIZE
+    
+    @contextmanager
+    def admit(self, workload: str) -> Iterator[None]:
+        """
+        Hold an admission slot for the duration of a request.
+        
+        Raises:
+            HTTPException 503: If the request is shed
+        """
+        in_flight = self.in_flight[workload]
+        if workload == "ingest":
+            gauge = INGEST_IN_FLIGHT
+            shed = in_flight >= settings.ADMISSION_INGEST_MAX_IN_FLIGHT or (
+                self.ingest_saturated() and in_flight >= settings.DB_POOL_INGEST_SIZE
+            )
+            if shed:
+                INGEST_SHED.inc()
+        else:
+            gauge = HEAVY_IN_FLIGHT
+            shed = in_flight >= settings.ADMISSION_HEAVY_MAX_IN_FLIGHT or self.ingest_under_pressure()
+            if shed:
+                HEAVY_SHED.inc()
+        if shed:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry later.",
+                headers={"Retry-After": self.retry_after()},
+            )
+        
+        self.in_flight[workload] += 1
+        gauge.inc()
+        try:
+            yield
+        finally:
+            self.in_flight[workload] -= 1
+            gauge.dec()
+    
+    @staticmethod
+    def retry_after() -> str:
+        """Retry-After in whole seconds, jittered between 1x and 2x the base."""
+        base = settings.ADMISSION_RETRY_AFTER_SECONDS
+        return str(max(1, round(random.uniform(base, 2 * base))))
+
+admission = AdmissionController()
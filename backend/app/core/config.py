@@ -20,11 +20,118 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str
+    # Create missing tables on startup (development). The production entry
+    # point (gunicorn.conf.py) applies Alembic migrations once before
+    # forking workers and turns this off.
+    DB_CREATE_ALL: bool = True
+    # Optional read replica for read-only endpoints; used while its
+    # replication lag is within READ_REPLICA_MAX_LAG_SECONDS
+    DATABASE_READ_URL: str | None = None
+    READ_REPLICA_MAX_LAG_SECONDS: float = 10.0
+    READ_REPLICA_LAG_CHECK_SECONDS: float = 5.0
+    # Connection pool per workload class (per worker process): interactive
+    # API requests, device ingest, bulk export/import and background jobs.
+    # Ingest has its own pool, so its connections stay reserved under any
+    # read load; a short timeout makes it fail fast instead of queueing.
+    DB_POOL_INTERACTIVE_SIZE: int = 10
+    DB_POOL_INTERACTIVE_OVERFLOW: int = 10
+    DB_POOL_INTERACTIVE_TIMEOUT: float = 30.0
+    DB_POOL_INGEST_SIZE: int = 10
+    DB_POOL_INGEST_OVERFLOW: int = 5
+    DB_POOL_INGEST_TIMEOUT: float = 5.0
+    DB_POOL_BULK_SIZE: int = 3
+    DB_POOL_BULK_OVERFLOW: int = 2
+    DB_POOL_BULK_TIMEOUT: float = 60.0
+    # Admission control: shed load with 503 + jittered Retry-After instead of
+    # queueing on the pools (heavy reads/bulk are shed before ingest)
+    ADMISSION_INGEST_MAX_IN_FLIGHT: int = 64
+    ADMISSION_HEAVY_MAX_IN_FLIGHT: int = 4
+    ADMISSION_MAX_POOL_WAIT_SECONDS: float = 0.25
+    ADMISSION_RETRY_AFTER_SECONDS: float = 5.0
+    # Per-request SQL instrumentation: Server-Timing header with statement
+    # count and database time, and a warning for slow requests (0 disables)
+    SQL_SERVER_TIMING: bool = True
+    SLOW_REQUEST_LOG_SECONDS: float = 1.0
+    # Development: warn when one statement runs this many times in a request
+    QUERY_REPEAT_DETECTION: bool = False
+    QUERY_REPEAT_THRESHOLD: int = 5
+    # Event loop lag monitor: timer period, and how long the loop may be
+    # blocked before the blocking callback's stack is captured (0 disables)
+    EVENT_LOOP_LAG_CHECK_SECONDS: float = 0.1
+    EVENT_LOOP_STALL_SECONDS: float = 0.25
 
     # Security
     SECRET_KEY: str = "changethis"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 1 day
+    # Authenticated user lookups are cached per token subject (0 disables)
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0
+    # Embed user claims (active, superuser, email, name) in access tokens so
+    # requests can be authenticated without any database lookup
+    JWT_EMBED_CLAIMS: bool = False
+
+    # Device ingest authentication (X-Device-Key header)
+    # When False, devices without a configured key may still ingest
+    INGEST_REQUIRE_DEVICE_KEY: bool = False
+    # How long the previous key keeps working after a rotation
+    DEVICE_KEY_ROTATION_GRACE_SECONDS: int = 86400
+    DEVICE_KEY_CACHE_TTL_SECONDS: float = 300.0
+
+    # Idempotent ingest: recent keys remembered per device (in memory), for
+    # at most INGEST_DEDUP_TTL_SECONDS (the only dedup a bare `seq` without
+    # boot_id gets, since device counters restart on reboot)
+    INGEST_DEDUP_WINDOW: int = 256
+    INGEST_DEDUP_MAX_DEVICES: int = 10000
+    INGEST_DEDUP_TTL_SECONDS: float = 300.0
+    # Per-device ingest rate limit (token bucket: requests/second and burst;
+    # a rate of 0 disables). Devices can override both.
+    INGEST_RATE_LIMIT_PER_SECOND: float = 1.0
+    INGEST_RATE_LIMIT_BURST: int = 10
+    INGEST_RATE_LIMIT_MAX_DEVICES: int = 10000
+
+    # Password hashing (argon2 cost parameters and offload pool)
+    PASSWORD_HASH_TIME_COST: int = 3
+    PASSWORD_HASH_MEMORY_COST: int = 65536  # KiB
+    PASSWORD_HASH_PARALLELISM: int = 4
+    PASSWORD_HASH_WORKERS: int = 2  # Concurrent hashes per process
+    PASSWORD_HASH_MAX_QUEUE: int = 64  # Waiting jobs before new ones are rejected
+
+    # Alert notifications (outbox dispatcher runs only when SMTP_HOST is set)
+    SMTP_HOST: str | None = None
+    SMTP_PORT: int = 587
+    SMTP_USER: str | None = None
+    SMTP_PASSWORD: str | None = None
+    SMTP_STARTTLS: bool = True
+    SMTP_FROM: str = "alerts@structsense.local"
+    NOTIFICATION_DISPATCH_INTERVAL_SECONDS: float = 10.0
+    NOTIFICATION_BATCH_SIZE: int = 200
+    # Minimum gap between emails for the same device and recipient
+    NOTIFICATION_MIN_INTERVAL_SECONDS: float = 300.0
+    # Failed sends are retried after RETRY_BASE * 2^(attempts - 1) seconds (capped
+    # at RETRY_MAX) and marked FAILED after MAX_ATTEMPTS
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BASE_SECONDS: float = 30.0
+    NOTIFICATION_RETRY_MAX_SECONDS: float = 3600.0
+    # Claimed rows go back to other workers if not resolved within this time
+    NOTIFICATION_LEASE_SECONDS: float = 600.0
+
+    # Streaming device statistics: EWMA/trend half-life and how often the
+    # in-memory state is checkpointed to the device_statistics table
+    STATS_HALF_LIFE_SECONDS: float = 900.0
+    STATS_CHECKPOINT_INTERVAL_SECONDS: float = 60.0
+
+    # Analytics summaries: ranges at least this long read the hourly rollup
+    # (refreshed every ANALYTICS_ROLLUP_REFRESH_SECONDS) instead of raw rows
+    ANALYTICS_ROLLUP_MIN_RANGE_HOURS: float = 48.0
+    ANALYTICS_ROLLUP_REFRESH_SECONDS: float = 300.0
+    # Dirty hours claimed by a refresh go back to other workers if not cleared within this time
+    ANALYTICS_ROLLUP_LEASE_SECONDS: float = 600.0
+
+    # Prometheus /metrics: when set, scrapes must send `Authorization: Bearer <token>`.
+    # With METRICS_REQUIRE_TOKEN (forced on by gunicorn.conf.py for production)
+    # /metrics is not served until a token is set.
+    METRICS_TOKEN: str | None = None
+    METRICS_REQUIRE_TOKEN: bool = False
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -1,15 +1,92 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from app.core.admission import admission
 from app.core.config import settings
-
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    pool_size=20,
-    max_overflow=10,
-    pool_recycle=3600,
+from app.core.metrics import (
+    DB_POOL_CHECKOUTS, DB_POOL_WAIT, DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, DB_POOL_SIZE, DB_REPLICA_LAG,
 )
-AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+logger = logging.getLogger(__name__)
+
+# Workload classes with their own connection pool (sizes/timeouts in
+# settings.DB_POOL_<CLASS>_*), so bulk transfers and heavy reads can never
+# take the connections ingest needs
+POOLS = ("interactive", "ingest", "bulk")
+# Pools that also get a replica engine when DATABASE_READ_URL is set
+READ_POOLS = ("interactive", "bulk")
+
+def _create_engine(url: str, pool: str, label: str | None = None, **kwargs) -> AsyncEngine:
+    prefix = f"DB_POOL_{pool.upper()}"
+    engine = create_async_engine(
+        url,
+        echo=False,
+        pool_size=getattr(settings, f"{prefix}_SIZE"),
+        max_overflow=getattr(settings, f"{prefix}_OVERFLOW"),
+        pool_timeout=getattr(settings, f"{prefix}_TIMEOUT"),
+        pool_recycle=3600,
+        **kwargs
+    )
+    label = label or pool
+    checkouts = DB_POOL_CHECKOUTS.labels(label)
+    checked_out, overflow = DB_POOL_CHECKED_OUT.labels(label), DB_POOL_OVERFLOW.labels(label)
+
+    def on_checkout(*args) -> None:
+        checkouts.inc()
+        checked_out.set(engine.pool.checkedout())
+        overflow.set(engine.pool.overflow())
+
+    def on_checkin(*args) -> None:
+        checked_out.set(engine.pool.checkedout())
+        overflow.set(engine.pool.overflow())
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "checkin", on_checkin)
+    return engine
+
+engines: dict[str, AsyncEngine] = {pool: _create_engine(settings.DATABASE_URL, pool) for pool in POOLS}
+session_factories = {
+    pool: async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    for pool, engine in engines.items()
+}
+
+# Optional read replica for read-only endpoints (sessions are read-only)
+read_engines: dict[str, AsyncEngine] = {}
+if settings.DATABASE_READ_URL:
+    read_engines = {
+        pool: _create_engine(
+            settings.DATABASE_READ_URL,
+            pool,
+            f"{pool}_replica",
+            connect_args={"server_settings": {"default_transaction_read_only": "on"}},
+        )
+        for pool in READ_POOLS
+    }
+read_session_factories = {
+    pool: async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    for pool, engine in read_engines.items()
+}
+
+def report_pool_sizes() -> None:
+    """
+    Set db_pool_size for every pool. Called at worker startup: with
+    gunicorn's preload_app, import time runs only in the master.
+    """
+    for pool, pool_engine in engines.items():
+        DB_POOL_SIZE.labels(pool).set(pool_engine.pool.size())
+    for pool, pool_engine in read_engines.items():
+        DB_POOL_SIZE.labels(f"{pool}_replica").set(pool_engine.pool.size())
+
+engine = engines["interactive"]
+AsyncSessionLocal = session_factories["interactive"]
+# Background jobs (dispatch, checkpoints, rollups) run on the bulk pool
+BulkSessionLocal = session_factories["bulk"]
 
 class Base(DeclarativeBase):
     pass
@@ -17,3 +94,100 @@ class Base(DeclarativeBase):
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+class ReplicaMonitor:
+    """
+    Tracks replication lag of the read replica.
+    
+    The replica is used only while its measured lag is within
+    READ_REPLICA_MAX_LAG_SECONDS and the last check is recent; otherwise
+    (unreachable, lagging, not yet checked) reads go to the primary.
+    """
+    
+    def __init__(self):
+        self.lag_seconds: float | None = None
+        self.checked_at = 0.0
+        DB_REPLICA_LAG.set(-1)
+    
+    @property
+    def usable(self) -> bool:
+        if not read_engines or self.lag_seconds is None:
+            return False
+        fresh = time.monotonic() - self.checked_at <= 3 * settings.READ_REPLICA_LAG_CHECK_SECONDS
+        return fresh and self.lag_seconds <= settings.READ_REPLICA_MAX_LAG_SECONDS
+    
+    async def check(self) -> float | None:
+        """Measure the replica's lag (0 when fully replayed or not a standby)."""
+        try:
+            async with read_engines["interactive"].connect() as conn:
+                lag = await conn.scalar(text(
+                    "SELECT CASE"
+                    " WHEN NOT pg_is_in_recovery() THEN 0"
+                    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                    " END"
+                ))
+            self.lag_seconds = float(lag)
+        except Exception:
+            logger.warning("Read replica check failed; reading from primary", exc_info=True)
+            self.lag_seconds = None
+        self.checked_at = time.monotonic()
+        DB_REPLICA_LAG.set(-1 if self.lag_seconds is None else self.lag_seconds)
+        return self.lag_seconds
+
+replica_monitor = ReplicaMonitor()
+
+async def run_replica_monitor() -> None:
+    """Background loop measuring replica lag until cancelled."""
+    while True:
+        await replica_monitor.check()
+        await asyncio.sleep(settings.READ_REPLICA_LAG_CHECK_SECONDS)
+
+def session_dependency(pool: str = "interactive", read_only: bool = False, workload: str | None = None):
+    """
+    Build a route dependency yielding a session from a workload pool.
+    
+    With read_only=True the session comes from the read replica when one is
+    configured and fresh enough, else from the primary. Clients that must
+    read their own writes send `X-Read-Consistency: strong` to force the
+    primary.
+    
+    With a workload ("ingest" or "heavy") the request goes through admission
+    control first and its connection checkout wait feeds admission control.
+    The wait is recorded in the pool metrics either way.
+    """
+    primary = session_factories[pool]
+    replica = read_session_factories.get(pool) if read_only else None
+    primary_wait = DB_POOL_WAIT.labels(pool)
+    replica_wait = DB_POOL_WAIT.labels(f"{pool}_replica") if replica is not None else None
+    
+    async def dependency(request: Request):
+        session_factory, wait = primary, primary_wait
+        if (
+            replica is not None
+            and replica_monitor.usable
+            and request.headers.get("X-Read-Consistency", "").lower() != "strong"
+        ):
+            session_factory, wait = replica, replica_wait
+        with admission.admit(workload) if workload else nullcontext():
+            async with session_factory() as session:
+                started = time.perf_counter()
+                await session.connection()
+                waited = time.perf_counter() - started
+                wait.observe(waited)
+                if workload:
+                    admission.record_wait(pool, waited)
+                yield session
+    
+    return dependency
+
+get_read_db = session_dependency("interactive", read_only=True)
+get_analytics_db = session_dependency("interactive", read_only=True, workload="heavy")
+get_ingest_db = session_dependency("ingest", workload="ingest")
+get_bulk_db = session_dependency("bulk", workload="heavy")
+get_bulk_read_db = session_dependency("bulk", read_only=True, workload="heavy")
+
+async def dispose_engines() -> None:
+    for engine in (*engines.values(), *read_engines.values()):
+        await engine.dispose()
@@ -0,0 +1,163 @@
+"""
+Prometheus metrics (prometheus_client).
+
+Under gunicorn every worker is a separate process, so the metrics run in
+prometheus_client's multiprocess mode: gunicorn.conf.py points
+PROMETHEUS_MULTIPROC_DIR at an emptied directory before anything imports
+this module, each process writes its values to files there, and a scrape
+of any worker aggregates all of them. Counters and histograms are summed
+over processes (including exited workers); each gauge declares how its
+per-process values combine (multiprocess_mode). Without
+PROMETHEUS_MULTIPROC_DIR (uvicorn in development, tests) the values are
+those of the one process.
+
+Gauges are updated where their value changes; scrapes run no callbacks,
+since in multiprocess mode only the scraped worker would run them.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+# Latency buckets in seconds: 1ms .. 30s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render() -> bytes:
+    """All metrics (of every worker in multiprocess mode) in the Prometheus text format."""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status"),
+    buckets=DEFAULT_BUCKETS,
+)
+
+# Password hashing (argon2) offload pool
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth", "Password hash/verify jobs waiting for a pool thread",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight", "Password hash/verify jobs currently running",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total", "Password hash/verify jobs rejected because the queue was full"
+)
+
+# Alert notification outbox
+NOTIFICATION_OUTBOX_PENDING = Gauge(
+    "notification_outbox_pending", "Notifications waiting in the outbox (at the last dispatch)",
+    multiprocess_mode="livemax",
+)
+NOTIFICATIONS_SENT = Counter(
+    "notifications_sent_total", "Notification emails delivered"
+)
+NOTIFICATIONS_FAILED = Counter(
+    "notifications_failed_total", "Notification outbox rows whose delivery attempt failed"
+)
+
+# Admission control (load shedding)
+INGEST_IN_FLIGHT = Gauge(
+    "ingest_in_flight", "Ingest requests currently admitted",
+    multiprocess_mode="livesum",
+)
+HEAVY_IN_FLIGHT = Gauge(
+    "heavy_requests_in_flight", "Heavy read/bulk requests (export, upload, analytics) currently admitted",
+    multiprocess_mode="livesum",
+)
+INGEST_SHED = Counter(
+    "ingest_requests_shed_total", "Ingest requests rejected with 503 by admission control"
+)
+HEAVY_SHED = Counter(
+    "heavy_requests_shed_total", "Heavy read/bulk requests rejected with 503 by admission control"
+)
+
+# Per-device ingest rate limiting
+INGEST_THROTTLED = Counter(
+    "ingest_requests_throttled_total", "Ingest requests rejected with 429 by per-device rate limits"
+)
+
+# Ingest throughput (rows/s = rate() of these) and processing stages.
+# Nothing is labelled by device: the fleet size is unbounded, and device
+# uids are not for whoever can scrape.
+INGEST_READINGS = Counter(
+    "ingest_readings_total", "Ingested readings by outcome (stored, held, duplicate)", ("outcome",)
+)
+INGEST_STAGE_DURATION = Histogram(
+    "sensor_ingest_stage_seconds",
+    "Time spent in each SensorService.ingest_sensor_data stage",
+    ("stage",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+# Connection pools (gauges summed over the live workers)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Connections checked out of each pool", ("pool",)
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time a request waited for its pooled connection", ("pool",),
+    buckets=DEFAULT_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently checked out", ("pool",),
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size (negative: unused pool slots)", ("pool",),
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Configured pool size", ("pool",),
+    multiprocess_mode="livesum",
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Last measured read replica lag (-1: no replica, unknown or unreachable)",
+    multiprocess_mode="livemax",
+)
+
+# Bulk transfer throughput
+UPLOAD_ROWS = Counter(
+    "upload_rows_total", "Rows imported by file uploads", ("format",)
+)
+UPLOAD_BYTES = Counter(
+    "upload_bytes_total", "Bytes of uploaded files processed", ("format",)
+)
+EXPORT_ROWS = Counter(
+    "export_rows_total", "Rows written by exports", ("format",)
+)
+EXPORT_BYTES = Counter(
+    "export_bytes_total", "Bytes of export files produced", ("format",)
+)
+
+# Background task queues
+STATS_CHECKPOINT_PENDING = Gauge(
+    "stats_checkpoint_pending_devices", "Devices whose statistics changed before the last checkpoint started",
+    multiprocess_mode="livesum",
+)
+ROLLUP_PENDING_HOURS = Gauge(
+    "rollup_pending_hours", "Device hours awaiting the hourly rollup when its last refresh started",
+    multiprocess_mode="livemax",
+)
+
+# Event loop health
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a periodic timer",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls_total", "Times a callback blocked the event loop beyond EVENT_LOOP_STALL_SECONDS"
+)
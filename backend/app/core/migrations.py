@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import os
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import inspect, pool, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.core.db import Base
+from app.models import access  # noqa: F401 (registers every table, like alembic/env.py)
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic.ini")
+# Revision matching the schema create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+# Serialises migrations across processes and hosts (pg_advisory_xact_lock key)
+_MIGRATION_LOCK_KEY = 0x5E50_0002
+
+
+def _upgrade(connection, config: Config) -> None:
+    config.attributes["connection"] = connection
+    tables = set(inspect(connection).get_table_names())
+    if "alembic_version" not in tables and "devices" in tables:
+        # Database created by create_all. One from before migrations existed
+        # has exactly the baseline schema: record that and let the upgrade
+        # below add everything since. One created (in development) from the
+        # current models is already at head.
+        current = not compare_metadata(MigrationContext.configure(connection), Base.metadata)
+        revision = "head" if current else BASELINE_REVISION
+        logger.info("Adopting existing schema as revision %s", revision)
+        command.stamp(config, revision)
+    command.upgrade(config, "head")
+
+
+async def _migrate() -> None:
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    engine = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    try:
+        async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Other instances starting at the same time wait here, then
+                # find the schema up to date
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+            await conn.run_sync(_upgrade, config)
+    finally:
+        await engine.dispose()
+
+
+def migrate() -> None:
+    """
+    Bring the database schema to the latest Alembic revision.
+
+    Run once per deployment before serving (the gunicorn master calls it
+    before forking workers, see gunicorn.conf.py). The whole upgrade runs in
+    one transaction holding an advisory lock, so concurrently starting
+    instances never race on DDL. Uses its own connection, so no pooled
+    connection is inherited by forked workers.
+    """
+    asyncio.run(_migrate())
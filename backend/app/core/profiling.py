@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+# One profile at a time per worker
+profiler_lock = threading.Lock()
+
+# Directory containing the app package (paths below it are shown relative)
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_frame_labels: dict = {}
+
+
+def _frame_label(code) -> str:
+    """`function (path:line)`, paths shortened to the project or package."""
+    label = _frame_labels.get(code)
+    if label is None:
+        path = code.co_filename
+        if "site-packages" + os.sep in path:
+            path = path.split("site-packages" + os.sep, 1)[1]
+        elif path.startswith(_APP_ROOT + os.sep):
+            path = path[len(_APP_ROOT) + 1:]
+        else:
+            path = os.path.basename(path)
+        label = _frame_labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})"
+    return label
+
+
+def sample_stacks(seconds: float, interval: float) -> str:
+    """
+    Sample the stacks of every thread in this process (event loop and
+    executor threads) every `interval` seconds for `seconds`.
+
+    Runs in its own thread and only reads frames, so the worker keeps
+    serving requests; each sample holds the GIL for a few microseconds per
+    thread.
+
+    Returns:
+        Collapsed stacks (`thread;outer;...;inner count` per line), the input
+        format of flamegraph.pl, speedscope and inferno
+    """
+    own = threading.get_ident()
+    counts: Counter[str] = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class EventLoopMonitor:
+    """
+    Measures event loop lag and captures the stack of callbacks that block it.
+
+    A task wakes every EVENT_LOOP_LAG_CHECK_SECONDS and records how late it
+    woke (event_loop_lag_seconds). A watchdog thread checks the task's
+    heartbeat; when the loop has not run for EVENT_LOOP_STALL_SECONDS it
+    captures the loop thread's current stack, i.e. the blocking callback,
+    logs it and keeps it in `stalls` (most recent last).
+    """
+
+    def __init__(self, max_stalls: int = 50):
+        self.stalls: deque[dict] = deque(maxlen=max_stalls)
+        self._heartbeat = time.monotonic()
+        self._loop_thread: int | None = None
+        self._stop = threading.Event()
+
+    async def run(self) -> None:
+        """Heartbeat loop (plus watchdog thread) until cancelled."""
+        interval = settings.EVENT_LOOP_LAG_CHECK_SECONDS
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        watchdog = threading.Thread(target=self._watch, args=(interval,), name="event-loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                expected = time.monotonic() + interval
+                await asyncio.sleep(interval)
+                now = time.monotonic()
+                EVENT_LOOP_LAG.observe(max(now - expected, 0.0))
+                self._heartbeat = now
+        finally:
+            self._stop.set()
+
+    def _watch(self, interval: float) -> None:
+        threshold = settings.EVENT_LOOP_STALL_SECONDS
+        reported = None
+        while not self._stop.wait(interval / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - interval
+            if blocked < threshold or heartbeat == reported:
+                continue
+            reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            EVENT_LOOP_STALLS.inc()
+            self.stalls.append({
+                "detected_at": datetime.now(timezone.utc).isoformat(),
+                "blocked_seconds": round(blocked, 3),  # so far, when the stack was captured
+                "stack": stack,
+            })
+            logger.warning("Event loop blocked for at least %.0f ms at:\n%s", blocked * 1000, stack)
+
+
+event_loop_monitor = EventLoopMonitor()
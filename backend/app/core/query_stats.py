@@ -0,0 +1,107 @@
+import logging
+import time
+from collections import Counter as StatementCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """SQL statements executed (and database time spent) in one request."""
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self, record_statements: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        # statement text -> executions (only when recording, see track_queries)
+        self.statements: StatementCounter[str] | None = StatementCounter() if record_statements else None
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements executed at least `threshold` times (likely N+1 loops)."""
+        if not self.statements:
+            return []
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+# Callbacks receiving the stats of every finished request (see assert_max_queries)
+_observers: list[Callable[[QueryStats], None]] = []
+
+
+def current_stats() -> QueryStats | None:
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Count the statements executed in this context (a request, a test).
+
+    Statement texts are recorded as well while repeat detection is enabled
+    or a query-count assertion is active.
+    """
+    stats = QueryStats(settings.QUERY_REPEAT_DETECTION or bool(_observers))
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        for observer in _observers:
+            observer(stats)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.count += 1
+    started = getattr(context, "_query_started", None)
+    if started is not None:
+        stats.duration += time.perf_counter() - started
+    if stats.statements is not None:
+        stats.statements[statement] += 1
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[list[QueryStats]]:
+    """
+    Test helper: fail if the requests (or code) run inside the block execute
+    more than `limit` statements in total.
+
+    Works with TestClient (requests handled in another thread are reported
+    by the query timing middleware) and with direct async service calls::
+
+        with assert_max_queries(3):
+            client.get("/api/v1/sensor/devices/1/processed")
+
+    Raises:
+        AssertionError: Listing the executed statements when over the limit
+    """
+    collected: list[QueryStats] = []
+    _observers.append(collected.append)
+    try:
+        with track_queries():
+            yield collected
+    finally:
+        _observers.remove(collected.append)
+    total = sum(stats.count for stats in collected)
+    if total > limit:
+        statements = StatementCounter()
+        for stats in collected:
+            statements.update(stats.statements or {})
+        listing = "\n".join(f"  {n}x {sql}" for sql, n in statements.most_common())
+        raise AssertionError(f"Expected at most {limit} queries, executed {total}:\n{listing}")
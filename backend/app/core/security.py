@@ -1,17 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from typing import Any, Callable, TypeVar, Union
+import asyncio
+import hashlib
+import hmac
 import secrets
+import threading
 
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_IN_FLIGHT, PASSWORD_HASH_REJECTED
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=settings.PASSWORD_HASH_TIME_COST,
+    argon2__memory_cost=settings.PASSWORD_HASH_MEMORY_COST,
+    argon2__parallelism=settings.PASSWORD_HASH_PARALLELISM,
+)
+
+# argon2 releases the GIL, so a small thread pool keeps hashing off the event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+
+# Jobs submitted to the hash pool that have not started (admission limit)
+_queue_lock = threading.Lock()
+_queued = 0
+
+T = TypeVar("T")
 
 ALGORITHM = settings.ALGORITHM
 
 def create_access_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any], expires_delta: timedelta = None, claims: dict[str, Any] | None = None
 ) -> str:
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -19,7 +43,7 @@ def create_access_token(
         expire = datetime.now(timezone.utc) + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -29,15 +53,79 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_in_hash_pool(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Run a CPU-heavy hashing call on the bounded hash pool.
+    
+    A job leaves the queue when a thread starts it, or when it is cancelled
+    before that (the awaiting request was cancelled), so abandoned jobs
+    never hold queue slots.
+    
+    Raises:
+        HTTPException 503: If too many jobs are already waiting
+    """
+    global _queued
+    with _queue_lock:
+        admitted = _queued < settings.PASSWORD_HASH_MAX_QUEUE
+        if admitted:
+            _queued += 1
+            PASSWORD_HASH_QUEUE_DEPTH.inc()
+    if not admitted:
+        PASSWORD_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent authentication requests, please retry.",
+            headers={"Retry-After": "1"},
+        )
+
+    waiting = True
+
+    def leave_queue(*_: Any) -> None:
+        global _queued
+        nonlocal waiting
+        with _queue_lock:
+            if waiting:
+                waiting = False
+                _queued -= 1
+                PASSWORD_HASH_QUEUE_DEPTH.dec()
+
+    def run() -> T:
+        leave_queue()
+        PASSWORD_HASH_IN_FLIGHT.inc()
+        try:
+            return fn(*args)
+        finally:
+            PASSWORD_HASH_IN_FLIGHT.dec()
+
+    future = _hash_executor.submit(run)
+    # Also runs when the job is cancelled before it started
+    future.add_done_callback(leave_queue)
+    # Cancelling the awaiting task cancels a job that has not started yet
+    return await asyncio.wrap_future(future)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await _run_in_hash_pool(get_password_hash, password)
+
 def generate_api_key() -> str:
     """Generate a secure random API key for device authentication"""
     return secrets.token_urlsafe(32)
 
 def get_api_key_hash(api_key: str) -> str:
-    """Hash an API key for secure storage"""
-    return pwd_context.hash(api_key)
+    """
+    Hash an API key for secure storage.
+    
+    Keys are 256-bit random tokens, so a keyed HMAC-SHA256 is enough to make
+    the stored value useless without SECRET_KEY; a slow password hash would
+    only add milliseconds to every device request.
+    """
+    return hmac.new(settings.SECRET_KEY.encode(), api_key.encode(), hashlib.sha256).hexdigest()
 
 def verify_api_key(plain_api_key: str, hashed_api_key: str) -> bool:
-    """Verify an API key against its hash"""
-    return pwd_context.verify(plain_api_key, hashed_api_key)
+    """Verify an API key against its hash (constant-time comparison)"""
+    return hmac.compare_digest(get_api_key_hash(plain_api_key), hashed_api_key)
 
@@ -0,0 +1,139 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, binary responses are unavailable without it
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+# Request headers that select the encoding of negotiated responses
+VARY = "Accept"
+
+# Canonical status lookup table for columnar responses (index = code)
+STATUS_CODES = ("SAFE", "WARNING", "ALERT")
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        # Match Pydantic's output for UTC timestamps
+        return obj.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode plain Python data (dicts, lists, datetimes) straight to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response for pre-built plain data.
+
+    Skips FastAPI's response_model validation and jsonable_encoder walk,
+    so callers must hand it rows that already match the documented schema.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class MsgPackResponse(Response):
+    """MessagePack response for plain data (datetimes are sent as ISO strings)."""
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def to_columnar(
+    rows: list[dict],
+    time_key: str = "created_at",
+    status_key: str = "status",
+) -> dict:
+    """
+    Transpose row dicts into one array per field.
+
+    - `time_key` becomes integer epoch-millisecond deltas: the first entry is
+      relative to `time_base`, every other entry to the previous row.
+    - `status_key` becomes small integer codes into `status_codes`.
+    """
+    keys = list(rows[0].keys()) if rows else []
+    columns = {key: [row[key] for row in rows] for key in keys}
+    return encode_columns(columns, len(rows), time_key, status_key)
+
+
+def encode_columns(
+    columns: dict[str, list],
+    count: int,
+    time_key: str = "created_at",
+    status_key: str = "status",
+) -> dict:
+    """Columnar payload of arrays that are already one per field (see `to_columnar`)."""
+    content = {"format": "columnar", "count": count, "columns": columns}
+
+    if time_key in columns:
+        epochs = [round(ts.timestamp() * 1000) for ts in columns[time_key]]
+        time_base = epochs[0] if epochs else 0
+        previous = time_base
+        deltas = []
+        for epoch in epochs:
+            deltas.append(epoch - previous)
+            previous = epoch
+        columns[time_key] = deltas
+        content["time_base"] = time_base
+        content["time_unit"] = "ms"
+
+    if status_key in columns:
+        lookup = list(STATUS_CODES)
+        codes = {name: index for index, name in enumerate(lookup)}
+        encoded = []
+        for value in columns[status_key]:
+            code = codes.get(value)
+            if code is None:
+                # Uploaded data may carry non-canonical statuses
+                code = codes[value] = len(lookup)
+                lookup.append(value)
+            encoded.append(code)
+        columns[status_key] = encoded
+        content["status_codes"] = lookup
+
+    return content
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the client asked for MessagePack through the Accept header."""
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def encoded_response(request: Request, content: Any, headers: dict[str, str] | None = None) -> Response:
+    """
+    Encode plain data as JSON, or as MessagePack when the client accepts it.
+
+    Raises:
+        HTTPException 406: If MessagePack was requested but is not installed
+    """
+    headers = {**(headers or {}), "Vary": VARY}
+    if wants_msgpack(request):
+        if msgpack is None:
+            raise HTTPException(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                detail="MessagePack encoding is not available on this server."
+            )
+        return MsgPackResponse(content, headers=headers)
+    return FastJSONResponse(content, headers=headers)
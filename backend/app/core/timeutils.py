@@ -0,0 +1,6 @@
+from datetime import datetime, timezone
+
+
+def as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes (e.g. from SQLite) as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
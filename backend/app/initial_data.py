@@ -4,7 +4,7 @@ import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import AsyncSessionLocal
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async
 from app.models.user import User
 from sqlalchemy import select
 
@@ -19,7 +19,7 @@ async def create_superuser() -> None:
         if not user:
             user = User(
                 email="admin@structsense.com",
-                hashed_password=get_password_hash("admin"),
+                hashed_password=await get_password_hash_async("admin"),
                 is_superuser=True,
                 is_active=True,
             )
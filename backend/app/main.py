@@ -1,21 +1,51 @@
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 from app.core.config import settings
-from app.core.db import engine, Base
+from app.core.db import engine, read_engines, Base, BulkSessionLocal, dispose_engines, report_pool_sizes, run_replica_monitor
 from app.api.routes import api_router
+from app.api.endpoints import metrics
+from app.api.middleware import QueryTimingMiddleware, RequestMetricsMiddleware
+from app.services.notification_service import run_notification_dispatcher
+from app.services.online_stats import online_stats, run_stats_checkpointer
+from app.services.analytics_service import run_rollup_refresher
+from app.core.profiling import event_loop_monitor
 import app.models # Import models to register them with Base
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Per-worker gauges (this runs in each worker, unlike preloaded imports)
+    report_pool_sizes()
+    
+    # Create tables on startup (without migrations, see DB_CREATE_ALL)
+    if settings.DB_CREATE_ALL:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    
+    # Background alert delivery (only when SMTP is configured)
+    dispatcher = None
+    if settings.SMTP_HOST:
+        dispatcher = asyncio.create_task(run_notification_dispatcher())
+    checkpointer = asyncio.create_task(run_stats_checkpointer())
+    refresher = asyncio.create_task(run_rollup_refresher())
+    # Replica lag tracking (only when a read replica is configured)
+    monitor = asyncio.create_task(run_replica_monitor()) if read_engines else None
+    # Event loop lag and stall stacks
+    loop_monitor = asyncio.create_task(event_loop_monitor.run()) if settings.EVENT_LOOP_STALL_SECONDS else None
     yield
-    # Close DB connection
-    await engine.dispose()
+    for task in (dispatcher, checkpointer, refresher, monitor, loop_monitor):
+        if task:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    # Final statistics checkpoint
+    async with BulkSessionLocal() as db:
+        await online_stats.checkpoint(db)
+    # Close DB connections
+    await dispose_engines()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -33,7 +63,12 @@ if settings.cors_origins:
         allow_headers=["*"],
     )
 
+app.add_middleware(QueryTimingMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+# Prometheus scrape endpoint (outside the versioned API)
+app.include_router(metrics.router)
 
 templates = Jinja2Templates(directory="app/templates")
 
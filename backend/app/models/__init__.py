@@ -2,5 +2,10 @@ from app.models.user import User
 from app.models.device import Device
 from app.models.raw_sensor_data import RawSensorData
 from app.models.processed_sensor_data import ProcessedSensorData
+from app.models.notification_outbox import NotificationOutbox
+from app.models.status_event import StatusEvent
+from app.models.device_statistics import DeviceStatistics
+from app.models.sensor_rollup import SensorRollupHourly
+from app.models.rollup_dirty_hour import RollupDirtyHour
 
-__all__ = ["User", "Device", "RawSensorData", "ProcessedSensorData"]
+__all__ = ["User", "Device", "RawSensorData", "ProcessedSensorData", "NotificationOutbox", "StatusEvent", "DeviceStatistics", "SensorRollupHourly", "RollupDirtyHour"]
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import String, Boolean, Float, DateTime
+from sqlalchemy import String, Boolean, Float, DateTime, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.db import Base
 from typing import TYPE_CHECKING, List
@@ -7,6 +7,11 @@ from typing import TYPE_CHECKING, List
 if TYPE_CHECKING:
     from .raw_sensor_data import RawSensorData
     from .processed_sensor_data import ProcessedSensorData
+    from .notification_outbox import NotificationOutbox
+    from .status_event import StatusEvent
+    from .device_statistics import DeviceStatistics
+    from .sensor_rollup import SensorRollupHourly
+    from .rollup_dirty_hour import RollupDirtyHour
 
 class Device(Base):
     __tablename__ = "devices"
@@ -25,12 +30,37 @@ class Device(Base):
     distance_warning_threshold: Mapped[float] = mapped_column(Float, default=5.0, nullable=False)
     distance_alert_threshold: Mapped[float] = mapped_column(Float, default=10.0, nullable=False)
     
+    # Deadband compression: readings within the deadband of the last stored
+    # reading (same status) are counted but not stored, up to a maximum gap
+    compression_enabled: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false", nullable=False)
+    deadband_tilt: Mapped[float] = mapped_column(Float, default=50.0, server_default="50", nullable=False)
+    deadband_distance_mm: Mapped[float] = mapped_column(Float, default=1.0, server_default="1", nullable=False)
+    compression_max_gap_seconds: Mapped[int] = mapped_column(Integer, default=300, server_default="300", nullable=False)
+    
+    # Ingest rate limit overrides (requests/second and burst; None = defaults)
+    ingest_rate_limit: Mapped[float | None] = mapped_column(Float, nullable=True)
+    ingest_burst: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    
     # Email for notifications
     notification_email: Mapped[str | None] = mapped_column(String, nullable=True)
     
     installed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     connection_status: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     last_seen_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    # Ingest authentication (HMAC-SHA256 of the device key, see core.security)
+    ingest_key_hash: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Previous key stays valid until it expires, so devices can be re-flashed after a rotation
+    previous_ingest_key_hash: Mapped[str | None] = mapped_column(String, nullable=True)
+    previous_ingest_key_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    # Bumped on every metadata/threshold update and whenever the device's data
+    # is reset, uploaded or gets a new first reading; used to build cheap
+    # ETags and to invalidate per-process ingest caches
+    generation: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Latest stored processed reading, set by ingest in the same transaction;
+    # per-process caches of its status are valid while it is unchanged
+    latest_reading_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
@@ -40,3 +70,8 @@ class Device(Base):
     # Relationships
     raw_readings: Mapped[List["RawSensorData"]] = relationship(back_populates="device", cascade="all, delete-orphan")
     processed_readings: Mapped[List["ProcessedSensorData"]] = relationship(back_populates="device", cascade="all, delete-orphan")
+    notifications: Mapped[List["NotificationOutbox"]] = relationship(back_populates="device", cascade="all, delete-orphan")
+    status_events: Mapped[List["StatusEvent"]] = relationship(back_populates="device", cascade="all, delete-orphan")
+    statistics: Mapped["DeviceStatistics"] = relationship(back_populates="device", cascade="all, delete-orphan", uselist=False)
+    hourly_rollups: Mapped[List["SensorRollupHourly"]] = relationship(back_populates="device", cascade="all, delete-orphan")
+    rollup_dirty_hours: Mapped[List["RollupDirtyHour"]] = relationship(cascade="all, delete-orphan")
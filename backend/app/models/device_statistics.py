@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+from sqlalchemy import ForeignKey, DateTime, Integer, JSON
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.core.db import Base
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .device import Device
+
+class DeviceStatistics(Base):
+    """
+    Checkpoint of a device's streaming statistics (EWMA, variance, trend).
+    
+    Each process merges the readings it ingested into this row periodically
+    (see app.services.online_stats).
+    """
+    __tablename__ = "device_statistics"
+
+    device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"), primary_key=True)
+    sample_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    
+    # Timestamp of the last reading folded into the statistics
+    last_reading_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    # Per-metric accumulator state (see app.services.online_stats)
+    state: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    
+    # Last reset; partial states accumulated before it are discarded
+    reset_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    
+    # Relationships
+    device: Mapped["Device"] = relationship("Device", back_populates="statistics")
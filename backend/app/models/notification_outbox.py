@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+from sqlalchemy import Integer, Float, ForeignKey, DateTime, String, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.core.db import Base
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .device import Device
+
+class NotificationOutbox(Base):
+    """
+    Alert notifications written in the same transaction as the reading that
+    triggered them and delivered later by the background dispatcher.
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_state_created", "state", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"), nullable=False, index=True)
+    recipient: Mapped[str] = mapped_column(String, nullable=False)
+    
+    # Status transition that triggered the notification
+    previous_status: Mapped[str] = mapped_column(String, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    
+    # Snapshot of the triggering reading (kept here so delivery needs no joins)
+    tilt_change_percent: Mapped[float] = mapped_column(Float, nullable=False)
+    distance_change_percent: Mapped[float] = mapped_column(Float, nullable=False)
+    reading_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    
+    # Delivery state: PENDING, SENDING (claimed by a dispatcher until
+    # claimed_until), SENT, FAILED (gave up after NOTIFICATION_MAX_ATTEMPTS)
+    state: Mapped[str] = mapped_column(String, nullable=False, default="PENDING")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[str | None] = mapped_column(String, nullable=True)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Not sent before this time (retry backoff, debounce); None = as soon as possible
+    next_attempt_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    claimed_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    
+    # Relationships
+    device: Mapped["Device"] = relationship("Device", back_populates="notifications")
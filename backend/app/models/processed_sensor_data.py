@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Integer, Float, ForeignKey, DateTime, String
+from sqlalchemy import Integer, Float, ForeignKey, DateTime, String, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.db import Base
 from typing import TYPE_CHECKING
@@ -10,6 +10,12 @@ if TYPE_CHECKING:
 
 class ProcessedSensorData(Base):
     __tablename__ = "processed_sensor_data"
+    __table_args__ = (
+        # Lets max(id) per device (the read validator) resolve from the index alone
+        Index("ix_processed_sensor_data_device_id_id", "device_id", "id"),
+        # Time-range scans per device (analytics, history)
+        Index("ix_processed_sensor_data_device_created", "device_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"), nullable=False, index=True)
@@ -28,6 +34,11 @@ class ProcessedSensorData(Base):
     # Status: SAFE, WARNING, ALERT
     status: Mapped[str] = mapped_column(String, nullable=False, default="SAFE")
     
+    # Deadband compression: readings held (not stored) since the previous
+    # stored reading; the value was held over [held_since, created_at)
+    held_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    held_since: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Integer, Float, ForeignKey, DateTime
+from sqlalchemy import Integer, Float, ForeignKey, DateTime, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.db import Base
 from typing import TYPE_CHECKING
@@ -10,6 +10,10 @@ if TYPE_CHECKING:
 
 class RawSensorData(Base):
     __tablename__ = "raw_sensor_data"
+    __table_args__ = (
+        # Backstop for idempotent ingest (NULL keys never conflict)
+        UniqueConstraint("device_id", "dedup_key", name="uq_raw_sensor_data_device_dedup_key"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"), nullable=False, index=True)
@@ -21,6 +25,10 @@ class RawSensorData(Base):
     # Ultrasonic Distance (in millimeters)
     distance_mm: Mapped[float] = mapped_column(Float, nullable=False)
     
+    # Idempotency-Key (or boot-scoped sequence number) of the request that stored it;
+    # bare sequence numbers are not stored (they restart on reboot)
+    dedup_key: Mapped[str | None] = mapped_column(String, nullable=True)
+    
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
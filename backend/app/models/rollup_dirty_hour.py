@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import ForeignKey, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.db import Base
+
+class RollupDirtyHour(Base):
+    """
+    (device, hour) whose readings changed since its rollup row was computed.
+    
+    Written in the same transaction as the readings, so a reading is either
+    in its hour's rollup row or its hour is marked here, however late its
+    transaction commits. Readers take marked hours from the readings;
+    AnalyticsService.refresh_rollups recomputes them and clears the marks.
+    """
+    __tablename__ = "rollup_dirty_hours"
+
+    device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    # Set while a refresh recomputes the hour (others skip it until then);
+    # a writer marking the hour again resets it, so the mark outlives that refresh
+    claimed_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,45 @@
+from datetime import datetime
+from sqlalchemy import Integer, Float, ForeignKey, DateTime
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.core.db import Base
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .device import Device
+
+class SensorRollupHourly(Base):
+    """
+    Hourly per-device rollup of processed readings.
+    
+    Holds mergeable aggregates (count, min, max, mean and sum of squared
+    deviations from the mean), so min/max/mean/stddev over any set of hours
+    are exact and combine without cancellation (Chan et al.). Hours marked
+    in RollupDirtyHour are recomputed by AnalyticsService.refresh_rollups.
+    """
+    __tablename__ = "processed_sensor_data_hourly"
+
+    device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    
+    reading_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    safe_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    warning_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    alert_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    
+    tilt_change_percent_min: Mapped[float] = mapped_column(Float, nullable=False)
+    tilt_change_percent_max: Mapped[float] = mapped_column(Float, nullable=False)
+    tilt_change_percent_mean: Mapped[float] = mapped_column(Float, nullable=False)
+    tilt_change_percent_m2: Mapped[float] = mapped_column(Float, nullable=False)
+    
+    distance_change_percent_min: Mapped[float] = mapped_column(Float, nullable=False)
+    distance_change_percent_max: Mapped[float] = mapped_column(Float, nullable=False)
+    distance_change_percent_mean: Mapped[float] = mapped_column(Float, nullable=False)
+    distance_change_percent_m2: Mapped[float] = mapped_column(Float, nullable=False)
+    
+    distance_diff_mm_min: Mapped[float] = mapped_column(Float, nullable=False)
+    distance_diff_mm_max: Mapped[float] = mapped_column(Float, nullable=False)
+    distance_diff_mm_mean: Mapped[float] = mapped_column(Float, nullable=False)
+    distance_diff_mm_m2: Mapped[float] = mapped_column(Float, nullable=False)
+    
+    # Relationships
+    device: Mapped["Device"] = relationship("Device", back_populates="hourly_rollups")
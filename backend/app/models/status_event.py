@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from sqlalchemy import ForeignKey, DateTime, String, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.core.db import Base
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .device import Device
+    from .processed_sensor_data import ProcessedSensorData
+
+class StatusEvent(Base):
+    """Status change of a device (e.g. SAFE -> ALERT), one row per transition."""
+    __tablename__ = "status_events"
+    __table_args__ = (
+        Index("ix_status_events_device_created", "device_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"), nullable=False)
+    
+    # previous_status is None for the device's first reading
+    previous_status: Mapped[str | None] = mapped_column(String, nullable=True)
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    
+    # Reading that triggered the transition
+    processed_data_id: Mapped[int] = mapped_column(ForeignKey("processed_sensor_data.id"), nullable=False)
+    
+    # Time of the transition (the triggering reading's timestamp)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False
+    )
+    
+    # Relationships
+    device: Mapped["Device"] = relationship("Device", back_populates="status_events")
+    reading: Mapped["ProcessedSensorData"] = relationship("ProcessedSensorData")
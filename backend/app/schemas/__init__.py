@@ -1,5 +1,5 @@
 from .user import UserCreate, UserUpdate, UserResponse
-from .device import DeviceRegister, DeviceUpdate, DeviceResponse
-from .sensor import SensorIngestRequest, ProcessedSensorDataResponse
+from .device import DeviceRegister, DeviceUpdate, DeviceResponse, DeviceIngestKeyResponse
+from .sensor import SensorIngestRequest, ProcessedSensorDataResponse, StatusEventResponse, StatusHistoryResponse, DeviceStatisticsResponse, AnalyticsSummaryResponse, AlignedSeriesResponse
 from .access import UserDeviceAccessCreate, UserDeviceAccessUpdate, UserDeviceAccessResponse, UserDeviceAssign
 
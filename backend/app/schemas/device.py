@@ -2,6 +2,9 @@ from pydantic import BaseModel, ConfigDict, Field, computed_field
 from datetime import datetime, timezone, timedelta
 from typing import Optional
 
+# Devices seen within this window are reported as online
+ONLINE_WINDOW = timedelta(seconds=30)
+
 class DeviceBase(BaseModel):
     name: str
     type: str
@@ -22,6 +25,16 @@ class DeviceRegister(DeviceBase):
     # Email for notifications
     notification_email: str | None = None
     
+    # Deadband compression (off by default)
+    compression_enabled: bool = False
+    deadband_tilt: float = 50.0
+    deadband_distance_mm: float = 1.0
+    compression_max_gap_seconds: int = 300
+    
+    # Ingest rate limit overrides (None = server defaults)
+    ingest_rate_limit: float | None = None
+    ingest_burst: int | None = None
+    
     installed_at: datetime | None = None
 
 class DeviceUpdate(BaseModel):
@@ -37,6 +50,14 @@ class DeviceUpdate(BaseModel):
     distance_alert_threshold: float | None = None
     
     notification_email: str | None = None
+    
+    compression_enabled: bool | None = None
+    deadband_tilt: float | None = None
+    deadband_distance_mm: float | None = None
+    compression_max_gap_seconds: int | None = None
+    
+    ingest_rate_limit: float | None = None
+    ingest_burst: int | None = None
 
 class DeviceResponse(DeviceBase):
     """Schema for device response"""
@@ -49,6 +70,15 @@ class DeviceResponse(DeviceBase):
     distance_alert_threshold: float
     
     notification_email: str | None
+    
+    compression_enabled: bool
+    deadband_tilt: float
+    deadband_distance_mm: float
+    compression_max_gap_seconds: int
+    
+    ingest_rate_limit: float | None
+    ingest_burst: int | None
+    
     installed_at: datetime
     connection_status: bool
     last_seen_at: datetime | None
@@ -71,6 +101,14 @@ class DeviceResponse(DeviceBase):
             
         now = datetime.now(timezone.utc)
         diff = now - last_seen
-        return diff < timedelta(seconds=30)
+        return diff < ONLINE_WINDOW
     
     model_config = ConfigDict(from_attributes=True)
+
+
+class DeviceIngestKeyResponse(BaseModel):
+    """Schema for a newly issued device ingest key (shown only once)"""
+    device_id: int
+    device_uid: str
+    ingest_key: str
+    previous_key_valid_until: datetime | None = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from typing import Optional
 
@@ -11,6 +11,12 @@ class SensorIngestRequest(BaseModel):
     tilt_y: float
     tilt_z: float
     distance_mm: float
+    # Optional per-device sequence number used to drop retried readings.
+    # With boot_id (anything unique per boot) duplicates are rejected for
+    # good; a bare seq only within the recent-key window, so a counter that
+    # restarts on reboot does not get new readings dropped.
+    seq: Optional[int] = None
+    boot_id: Optional[str] = Field(None, max_length=64)
 
 class ManualSensorIngestRequest(SensorIngestRequest):
     """
@@ -18,6 +24,38 @@ class ManualSensorIngestRequest(SensorIngestRequest):
     """
     timestamp: Optional[datetime] = None
 
+# Readings accepted per batch request (bounds request size and time)
+MAX_BATCH_READINGS = 1000
+
+class SensorBatchReading(BaseModel):
+    """
+    Single reading inside a batch replay.
+    """
+    tilt_x: float
+    tilt_y: float
+    tilt_z: float
+    distance_mm: float
+    seq: Optional[int] = None
+    boot_id: Optional[str] = Field(None, max_length=64)
+    idempotency_key: Optional[str] = Field(None, max_length=128)
+    timestamp: Optional[datetime] = None
+
+class SensorBatchIngestRequest(BaseModel):
+    """
+    Schema for replaying buffered readings after an outage.
+    """
+    device_uid: str
+    readings: list[SensorBatchReading] = Field(max_length=MAX_BATCH_READINGS)
+
+class SensorBatchIngestResponse(BaseModel):
+    """
+    Result of a batch ingest.
+    """
+    accepted: int
+    duplicates: int
+    held: int = 0
+    ids: list[int]
+
 class ProcessedSensorDataResponse(BaseModel):
     """
     Schema for processed sensor data response.
@@ -41,4 +79,103 @@ class ProcessedSensorDataResponse(BaseModel):
     
     created_at: datetime
     
+    # Deadband compression (readings held since the previous stored reading)
+    held_count: int = 0
+    held_since: datetime | None = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+class StatusEventResponse(BaseModel):
+    """
+    Schema for a device status transition.
+    """
+    id: int
+    device_id: int
+    previous_status: str | None
+    status: str
+    processed_data_id: int
+    created_at: datetime
+    
     model_config = ConfigDict(from_attributes=True)
+
+class StatusHistoryResponse(BaseModel):
+    """
+    Schema for status transitions and time spent in each status over a range.
+    """
+    device_id: int
+    start: datetime | None
+    end: datetime
+    current_status: str | None
+    durations_seconds: dict[str, float]
+    events: list[StatusEventResponse]
+
+class MetricStatisticsResponse(BaseModel):
+    """
+    Schema for the streaming statistics of one metric.
+    """
+    ewma: float
+    ewm_std: float
+    mean: float
+    std: float
+    min: float
+    max: float
+    slope_per_hour: float | None
+
+class DeviceStatisticsResponse(BaseModel):
+    """
+    Schema for a device's streaming statistics (per raw metric).
+    """
+    device_id: int
+    sample_count: int
+    last_reading_at: datetime | None
+    half_life_seconds: float
+    metrics: dict[str, MetricStatisticsResponse]
+
+class MetricSummaryResponse(BaseModel):
+    """
+    Schema for aggregate statistics of one metric over a range.
+    """
+    min: float | None
+    max: float | None
+    mean: float | None
+    stddev: float | None
+    # p50/p90/p95/p99; None when served from the hourly rollup
+    percentiles: dict[str, float] | None
+
+class AnalyticsSummaryResponse(BaseModel):
+    """
+    Schema for a device's analytics summary over a time range.
+    """
+    device_id: int
+    start: datetime | None
+    end: datetime
+    # "raw" (readings scanned) or "rollup" (hourly rollup plus range edges)
+    source: str
+    count: int
+    status_counts: dict[str, int]
+    current_status: str | None
+    durations_seconds: dict[str, float]
+    metrics: dict[str, MetricSummaryResponse]
+
+class SeriesDeviceResponse(BaseModel):
+    """
+    Schema for a device column of an aligned series.
+    """
+    id: int
+    name: str
+
+class AlignedSeriesResponse(BaseModel):
+    """
+    Schema for bucketed readings of several devices on one time axis.
+    
+    counts[bucket][device] and values[metric][bucket][device] follow the
+    order of buckets and devices; empty cells are null.
+    """
+    start: datetime
+    end: datetime
+    bucket_seconds: int
+    buckets: list[datetime]
+    devices: list[SeriesDeviceResponse]
+    counts: list[list[int]]
+    values: dict[str, list[list[float | None]]]
@@ -1,4 +1,7 @@
 from app.services.device_service import DeviceService
 from app.services.sensor_service import SensorService
+from app.services.notification_service import NotificationService
+from app.services.status_event_service import StatusEventService
+from app.services.analytics_service import AnalyticsService
 
-__all__ = ["DeviceService", "SensorService"]
+__all__ = ["DeviceService", "SensorService", "NotificationService", "StatusEventService", "AnalyticsService"]
@@ -0,0 +1,537 @@
+import asyncio
+import logging
+import math
+from datetime import datetime, timezone, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, delete, update, and_, or_, tuple_, Float, Integer, DateTime, literal
+from sqlalchemy.dialects.postgresql import insert, array, ARRAY
+
+from app.core.config import settings
+from app.core.db import BulkSessionLocal
+from app.core.timeutils import as_utc
+from app.core.metrics import ROLLUP_PENDING_HOURS
+from app.core.serialization import STATUS_CODES, encode_columns
+from app.models.device import Device
+from app.models.processed_sensor_data import ProcessedSensorData
+from app.models.rollup_dirty_hour import RollupDirtyHour
+from app.models.sensor_rollup import SensorRollupHourly
+from app.services.status_event_service import StatusEventService
+
+logger = logging.getLogger(__name__)
+
+# Metrics summarised by the analytics endpoints (each has rollup columns)
+SUMMARY_METRICS = ("tilt_change_percent", "distance_change_percent", "distance_diff_mm")
+PERCENTILES = (50, 90, 95, 99)
+# Metrics available to the aligned multi-device series
+SERIES_METRICS = (
+    "tilt_diff_x", "tilt_diff_y", "tilt_diff_z", "distance_diff_mm",
+    "tilt_change_percent", "distance_change_percent",
+)
+# Upper bound on buckets x devices per aligned series response
+MAX_SERIES_CELLS = 200_000
+STATUSES = ("SAFE", "WARNING", "ALERT")
+
+def _hour_bucket(column):
+    return func.date_trunc("hour", column, "UTC")
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def _ceil_hour(value: datetime) -> datetime:
+    floor = _floor_hour(value)
+    return floor if floor == value else floor + timedelta(hours=1)
+
+def _merge_moments(a: tuple, b: tuple) -> tuple:
+    """Combine (count, mean, m2) of two disjoint sets (Chan et al.)."""
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    if not count_a:
+        return b
+    if not count_b:
+        return a
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    return count, mean_a + delta * count_b / count, m2_a + m2_b + delta * delta * count_a * count_b / count
+
+class AnalyticsService:
+    """
+    Aggregate statistics over processed readings, computed in the database.
+
+    Short ranges are summarised from the readings in a single aggregate
+    query (exact percentiles included). Long ranges combine the hourly
+    rollup for whole hours with the readings at the range edges and in
+    hours marked dirty (changed since their rollup row was computed), so
+    min/max/mean/stddev stay exact while only a few rows are scanned;
+    percentiles need every value and are only returned for the raw path
+    (exact=True forces it).
+    """
+
+    @staticmethod
+    async def get_summary(
+        db: AsyncSession,
+        device_id: int,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        exact: bool = False
+    ) -> dict:
+        """
+        Summarise a device's readings over [start, end].
+
+        Args:
+            db: Database session
+            device_id: Device ID
+            start: Range start (None = since the first reading)
+            end: Range end (None = now)
+            exact: Always scan the readings (adds percentiles on long ranges)
+
+        Returns:
+            Dict matching AnalyticsSummaryResponse
+        """
+        end = as_utc(end) if end else datetime.now(timezone.utc)
+        start = as_utc(start) if start else None
+
+        min_range = timedelta(hours=settings.ANALYTICS_ROLLUP_MIN_RANGE_HOURS)
+        use_rollup = not exact and (start is None or end - start >= min_range)
+        if use_rollup:
+            summary = await AnalyticsService._summarise_with_rollup(db, device_id, start, end)
+        else:
+            summary = await AnalyticsService._summarise_raw(db, device_id, start, end)
+
+        history = await StatusEventService.get_status_history(db, device_id, start, end, limit=1)
+        summary.update({
+            "device_id": device_id,
+            "start": start,
+            "end": end,
+            "source": "rollup" if use_rollup else "raw",
+            "current_status": history["current_status"],
+            "durations_seconds": history["durations_seconds"],
+        })
+        return summary
+
+    @staticmethod
+    async def _summarise_raw(db: AsyncSession, device_id: int, start: datetime | None, end: datetime) -> dict:
+        """One aggregate pass over the readings (min/max/mean/stddev/percentiles)."""
+        fractions = array([p / 100 for p in PERCENTILES])
+        columns = [func.count()]
+        columns += [func.count().filter(ProcessedSensorData.status == status) for status in STATUSES]
+        for name in SUMMARY_METRICS:
+            column = getattr(ProcessedSensorData, name)
+            columns += [
+                func.min(column),
+                func.max(column),
+                func.avg(column),
+                func.stddev_samp(column),
+                func.percentile_cont(fractions).within_group(column).cast(ARRAY(Float)),
+            ]
+
+        query = select(*columns).where(
+            ProcessedSensorData.device_id == device_id,
+            ProcessedSensorData.created_at <= end
+        )
+        if start is not None:
+            query = query.where(ProcessedSensorData.created_at >= start)
+        row = (await db.execute(query)).one()
+
+        count, *row = row
+        status_counts = dict(zip(STATUSES, row[:len(STATUSES)]))
+        values = row[len(STATUSES):]
+        metrics = {}
+        for i, name in enumerate(SUMMARY_METRICS):
+            minimum, maximum, mean, stddev, percentiles = values[5 * i:5 * i + 5]
+            metrics[name] = {
+                "min": minimum,
+                "max": maximum,
+                "mean": float(mean) if mean is not None else None,
+                "stddev": float(stddev) if stddev is not None else None,
+                "percentiles": (
+                    {f"p{p}": value for p, value in zip(PERCENTILES, percentiles)}
+                    if percentiles else None
+                ),
+            }
+        return {"count": count, "status_counts": status_counts, "metrics": metrics}
+
+    @staticmethod
+    async def _summarise_with_rollup(db: AsyncSession, device_id: int, start: datetime | None, end: datetime) -> dict:
+        """Clean whole hours from the rollup; edges and dirty hours from the readings."""
+        R = SensorRollupHourly
+        P = ProcessedSensorData
+        D = RollupDirtyHour
+        first_hour = _ceil_hour(start) if start is not None else None
+        last_hour = _floor_hour(end)
+
+        # Rollup part and the dirty hours it leaves out in one statement (one snapshot)
+        dirty = select(D.bucket).where(D.device_id == device_id, D.bucket < last_hour)
+        hours = select(R).where(R.device_id == device_id, R.bucket < last_hour)
+        if first_hour is not None:
+            dirty = dirty.where(D.bucket >= first_hour)
+            hours = hours.where(R.bucket >= first_hour)
+        dirty = dirty.cte("dirty")
+        hours = hours.where(R.bucket.not_in(select(dirty.c.bucket))).cte("hours")
+        count = func.sum(hours.c.reading_count)
+        columns = [
+            select(func.array_agg(dirty.c.bucket)).scalar_subquery(),
+            func.coalesce(count, 0),
+            func.coalesce(func.sum(hours.c.safe_count), 0),
+            func.coalesce(func.sum(hours.c.warning_count), 0),
+            func.coalesce(func.sum(hours.c.alert_count), 0),
+        ]
+        for name in SUMMARY_METRICS:
+            mean = hours.c[f"{name}_mean"]
+            grand_mean = select(func.sum(hours.c.reading_count * mean) / func.sum(hours.c.reading_count)).scalar_subquery()
+            columns += [
+                func.min(hours.c[f"{name}_min"]),
+                func.max(hours.c[f"{name}_max"]),
+                grand_mean,
+                # Chan: within-hour deviations plus each hour's offset from the overall mean
+                func.sum(hours.c[f"{name}_m2"] + hours.c.reading_count * (mean - grand_mean) * (mean - grand_mean)),
+            ]
+        rolled = (await db.execute(select(*columns))).one()
+        dirty_hours = rolled[0] or []
+
+        # Readings outside the whole hours, plus those in dirty hours
+        inside = P.created_at < last_hour
+        if first_hour is not None:
+            inside = and_(P.created_at >= first_hour, inside)
+        columns = [
+            func.count(),
+            *[func.count().filter(P.status == status) for status in STATUSES],
+        ]
+        for name in SUMMARY_METRICS:
+            column = getattr(P, name)
+            columns += [func.min(column), func.max(column), func.avg(column), func.var_pop(column) * func.count(column)]
+        query = select(*columns).where(
+            P.device_id == device_id,
+            P.created_at <= end,
+            or_(~inside, _hour_bucket(P.created_at).in_(dirty_hours))
+        )
+        if start is not None:
+            query = query.where(P.created_at >= start)
+        raw = (await db.execute(query)).one()
+
+        count = rolled[1] + raw[0]
+        status_counts = {
+            status: rolled[2 + i] + raw[1 + i] for i, status in enumerate(STATUSES)
+        }
+        metrics = {}
+        offset_rolled, offset_raw = 5, 1 + len(STATUSES)
+        for i, name in enumerate(SUMMARY_METRICS):
+            a = rolled[offset_rolled + 4 * i:offset_rolled + 4 * i + 4]
+            b = raw[offset_raw + 4 * i:offset_raw + 4 * i + 4]
+            mins = [v for v in (a[0], b[0]) if v is not None]
+            maxs = [v for v in (a[1], b[1]) if v is not None]
+            _, mean, m2 = _merge_moments(
+                (rolled[1], float(a[2] or 0.0), float(a[3] or 0.0)),
+                (raw[0], float(b[2] or 0.0), float(b[3] or 0.0)),
+            )
+            metrics[name] = {
+                "min": min(mins) if mins else None,
+                "max": max(maxs) if maxs else None,
+                "mean": mean if count else None,
+                "stddev": math.sqrt(max(m2, 0.0) / (count - 1)) if count > 1 else None,
+                "percentiles": None,
+            }
+        return {"count": count, "status_counts": status_counts, "metrics": metrics}
+
+    @staticmethod
+    async def get_aligned_series(
+        db: AsyncSession,
+        device_ids: list[int] | None,
+        building_name: str | None,
+        start: datetime,
+        end: datetime,
+        bucket_seconds: int,
+        metrics: list[str]
+    ) -> dict:
+        """
+        Bucket several devices' readings onto one shared time axis.
+        
+        All devices are aggregated in a single grouped query (average per
+        device and bucket); empty cells are None so rows line up by index.
+        
+        Args:
+            db: Database session
+            device_ids: Devices to compare (or None to use building_name)
+            building_name: Compare every device of this building
+            start: Range start (first bucket starts here)
+            end: Range end
+            bucket_seconds: Bucket width
+            metrics: Metrics to include (see SERIES_METRICS)
+            
+        Returns:
+            Dict matching AlignedSeriesResponse; values[metric][bucket][device]
+            
+        Raises:
+            HTTPException: If no devices are selected or the matrix is too large
+        """
+        start, end = as_utc(start), as_utc(end)
+        if end <= start:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="end must be after start"
+            )
+        
+        query = select(Device.id, Device.name).order_by(Device.id)
+        if device_ids:
+            query = query.where(Device.id.in_(device_ids))
+        elif building_name:
+            query = query.where(Device.building_name == building_name)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Provide device_ids or building_name"
+            )
+        devices = (await db.execute(query)).all()
+        
+        bucket_count = math.ceil((end - start).total_seconds() / bucket_seconds)
+        if bucket_count * max(len(devices), 1) > MAX_SERIES_CELLS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many cells ({bucket_count} buckets x {len(devices)} devices); use a wider bucket or a shorter range"
+            )
+        
+        width = timedelta(seconds=bucket_seconds)
+        values = {name: [[None] * len(devices) for _ in range(bucket_count)] for name in metrics}
+        counts = [[0] * len(devices) for _ in range(bucket_count)]
+        if devices:
+            P = ProcessedSensorData
+            bucket = func.date_bin(width, P.created_at, literal(start))
+            result = await db.execute(
+                select(
+                    P.device_id,
+                    bucket.label("bucket"),
+                    func.count(),
+                    *[func.avg(getattr(P, name)) for name in metrics]
+                )
+                .where(
+                    P.device_id.in_([device.id for device in devices]),
+                    P.created_at >= start,
+                    P.created_at < end
+                )
+                .group_by(P.device_id, bucket)
+            )
+            column_of = {device.id: i for i, device in enumerate(devices)}
+            for device_id, bucket_start, count, *averages in result:
+                row = int((as_utc(bucket_start) - start) / width)
+                col = column_of[device_id]
+                counts[row][col] = count
+                for name, value in zip(metrics, averages):
+                    values[name][row][col] = float(value)
+        
+        return {
+            "start": start,
+            "end": end,
+            "bucket_seconds": bucket_seconds,
+            "buckets": [start + width * i for i in range(bucket_count)],
+            "devices": [{"id": device.id, "name": device.name} for device in devices],
+            "counts": counts,
+            "values": values,
+        }
+
+    @staticmethod
+    def summary_to_columnar(summary: dict) -> dict:
+        """
+        Columnar form of a summary: one row per metric (`metric`, min, max,
+        mean, stddev, p50...), and status counts and durations as arrays
+        aligned with `status_codes` (current_status is a code too).
+        """
+        percentiles = [f"p{p}" for p in PERCENTILES]
+        columns = {"metric": list(summary["metrics"])}
+        for key in ("min", "max", "mean", "stddev"):
+            columns[key] = [metric[key] for metric in summary["metrics"].values()]
+        for key in percentiles:
+            columns[key] = [
+                (metric["percentiles"] or {}).get(key) for metric in summary["metrics"].values()
+            ]
+
+        lookup = list(STATUS_CODES)
+        for name in (*summary["status_counts"], *summary["durations_seconds"], summary["current_status"]):
+            if name is not None and name not in lookup:
+                lookup.append(name)
+        content = encode_columns(columns, len(columns["metric"]))
+        content.update({
+            "device_id": summary["device_id"],
+            "start": summary["start"],
+            "end": summary["end"],
+            "source": summary["source"],
+            "reading_count": summary["count"],
+            "status_codes": lookup,
+            "status_counts": [summary["status_counts"].get(name, 0) for name in lookup],
+            "durations_seconds": [summary["durations_seconds"].get(name, 0.0) for name in lookup],
+            "current_status": (
+                lookup.index(summary["current_status"]) if summary["current_status"] is not None else None
+            ),
+        })
+        return content
+
+    @staticmethod
+    def series_to_columnar(series: dict) -> dict:
+        """
+        Columnar form of an aligned series: one row per bucket, with
+        `bucket` as epoch-millisecond deltas, `counts` and each metric as
+        arrays in device order, and devices as id and name arrays.
+        """
+        columns = {"bucket": series["buckets"], "counts": series["counts"], **series["values"]}
+        content = encode_columns(columns, len(series["buckets"]), time_key="bucket")
+        content.update({
+            "start": series["start"],
+            "end": series["end"],
+            "bucket_seconds": series["bucket_seconds"],
+            "metrics": list(series["values"]),
+            "devices": {
+                "id": [device["id"] for device in series["devices"]],
+                "name": [device["name"] for device in series["devices"]],
+            },
+        })
+        return content
+
+    @staticmethod
+    def _mark_dirty(stmt):
+        """
+        Insert marks, leaving existing ones as they are unless a refresh has
+        claimed them (then the hour must be recomputed again).
+
+        An existing mark is not rewritten but is locked until the
+        transaction ends, so a refresh skips it while its readings are not
+        yet visible.
+        """
+        D = RollupDirtyHour
+        return stmt.on_conflict_do_update(
+            index_elements=[D.device_id, D.bucket],
+            set_={"claimed_until": None},
+            where=D.claimed_until.is_not(None),
+        )
+
+    @staticmethod
+    async def mark_rollup_dirty(db: AsyncSession, device_id: int, times) -> None:
+        """
+        Mark the hours of newly written readings for the next rollup refresh
+        (same transaction as the readings; caller commits).
+        """
+        buckets = sorted({_floor_hour(as_utc(value)) for value in times})
+        if not buckets:
+            return
+        stmt = insert(RollupDirtyHour).values(
+            [{"device_id": device_id, "bucket": bucket} for bucket in buckets]
+        )
+        await db.execute(AnalyticsService._mark_dirty(stmt))
+
+    @staticmethod
+    async def invalidate_rollups(db: AsyncSession) -> None:
+        """Mark every hour with readings (e.g. after loading readings with COPY; caller commits)."""
+        P = ProcessedSensorData
+        bucket = _hour_bucket(P.created_at)
+        stmt = insert(RollupDirtyHour).from_select(
+            ["device_id", "bucket"], select(P.device_id, bucket).distinct()
+        )
+        await db.execute(AnalyticsService._mark_dirty(stmt))
+
+    @staticmethod
+    async def refresh_rollups(db: AsyncSession) -> int:
+        """
+        Recompute the hourly rollup rows of every dirty hour and clear the marks.
+
+        Hours are recomputed from the readings, so the refresh is idempotent
+        and backdated manual readings, uploads and late-committing ingest
+        transactions are all picked up.
+
+        1. Claim: marks are leased in a short transaction of their own.
+           Marks locked by a writer that has not committed yet are skipped
+           (left for the next refresh), so the claim never waits for
+           ingest, and ingest only waits for the claim's commit.
+        2. Recompute the claimed hours, then delete the marks that are
+           still claimed by this refresh; a writer that marked an hour
+           again meanwhile reset its claim, so that mark stays. Readers
+           take marked hours from the readings until this commits.
+
+        Concurrent refreshes (other workers) skip claimed marks until the
+        lease (ANALYTICS_ROLLUP_LEASE_SECONDS) runs out.
+
+        Returns:
+            Number of (device, hour) buckets recomputed
+        """
+        P = ProcessedSensorData
+        R = SensorRollupHourly
+        D = RollupDirtyHour
+
+        # 1. Claim
+        now = datetime.now(timezone.utc)
+        lease = now + timedelta(seconds=settings.ANALYTICS_ROLLUP_LEASE_SECONDS)
+        claimable = (
+            select(D.device_id, D.bucket)
+            .where(or_(D.claimed_until.is_(None), D.claimed_until < now))
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(D)
+            .where(tuple_(D.device_id, D.bucket).in_(claimable))
+            .values(claimed_until=lease)
+            .returning(D.device_id, D.bucket)
+        )
+        claimed = result.all()
+        await db.commit()
+        ROLLUP_PENDING_HOURS.set(len(claimed))
+        if not claimed:
+            return 0
+
+        # 2. Recompute
+        dirty = select(
+            func.unnest(literal([row.device_id for row in claimed], ARRAY(Integer))).label("device_id"),
+            func.unnest(literal([row.bucket for row in claimed], ARRAY(DateTime(timezone=True)))).label("bucket"),
+        ).cte("dirty")
+        await db.execute(
+            delete(R).where(tuple_(R.device_id, R.bucket).in_(select(dirty.c.device_id, dirty.c.bucket)))
+        )
+
+        bucket = _hour_bucket(P.created_at)
+        columns = [
+            P.device_id,
+            bucket,
+            func.count(),
+            *[func.count().filter(P.status == status) for status in STATUSES],
+        ]
+        names = ["device_id", "bucket", "reading_count", "safe_count", "warning_count", "alert_count"]
+        for name in SUMMARY_METRICS:
+            column = getattr(P, name)
+            # var_pop is computed stably (Youngs-Cramer), unlike sum(x*x) - sum(x)^2/n
+            columns += [func.min(column), func.max(column), func.avg(column), func.var_pop(column) * func.count(column)]
+            names += [f"{name}_min", f"{name}_max", f"{name}_mean", f"{name}_m2"]
+        aggregate = (
+            select(*columns)
+            .join(dirty, and_(
+                P.device_id == dirty.c.device_id,
+                P.created_at >= dirty.c.bucket,
+                P.created_at < dirty.c.bucket + timedelta(hours=1)
+            ))
+            .group_by(P.device_id, bucket)
+        )
+        await db.execute(insert(R).from_select(names, aggregate))
+        # Last, so writers marking these hours wait on it only until the commit
+        await db.execute(
+            delete(D).where(
+                tuple_(D.device_id, D.bucket).in_(select(dirty.c.device_id, dirty.c.bucket)),
+                D.claimed_until == lease,
+            )
+        )
+        await db.commit()
+        return len(claimed)
+
+    @staticmethod
+    async def delete_rollups(db: AsyncSession, device_id: int) -> None:
+        """Drop a device's rollup rows and marks (caller commits)."""
+        await db.execute(delete(SensorRollupHourly).where(SensorRollupHourly.device_id == device_id))
+        await db.execute(delete(RollupDirtyHour).where(RollupDirtyHour.device_id == device_id))
+
+
+async def run_rollup_refresher() -> None:
+    """Background loop refreshing the hourly rollup until cancelled."""
+    while True:
+        try:
+            async with BulkSessionLocal() as db:
+                await AnalyticsService.refresh_rollups(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Rollup refresh failed")
+        await asyncio.sleep(settings.ANALYTICS_ROLLUP_REFRESH_SECONDS)
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from app.core.timeutils import as_utc
+from app.models.device import Device
+
+class _HeldState:
+    __slots__ = ("tilt_x", "tilt_y", "tilt_z", "distance_mm", "status", "stored_at", "reading", "held_count")
+    
+    def __init__(self, tilt_x: float, tilt_y: float, tilt_z: float, distance_mm: float, status: str, stored_at: datetime, reading: dict):
+        self.tilt_x = tilt_x
+        self.tilt_y = tilt_y
+        self.tilt_z = tilt_z
+        self.distance_mm = distance_mm
+        self.status = status
+        self.stored_at = stored_at
+        self.reading = reading
+        self.held_count = 0
+
+class DeadbandCompressor:
+    """
+    Per-device deadband compression for ingest.
+    
+    A reading is held (counted, not stored) when every raw value is within
+    the device's deadband of the last *stored* reading, its status is
+    unchanged and the last stored reading is younger than the device's
+    maximum gap (heartbeat). The next stored reading carries the number of
+    held readings and the start of the held interval, so readers see
+    explicit "held" intervals. Status changes are always stored, so no alert
+    is ever compressed away.
+    
+    The reference is kept per process but only used while it is still the
+    device's latest stored reading: once another worker stores a reading
+    (or the data is reset or uploaded), the next reading here is stored and
+    becomes the new reference. Readings held meanwhile are still counted
+    on it.
+    
+    A held reading inserts nothing; with the baseline and previous status
+    cached, its only query is the device lookup (plus a last_seen_at update
+    every LAST_SEEN_RESOLUTION_SECONDS).
+    """
+    
+    def __init__(self):
+        self._states: dict[int, _HeldState] = {}
+    
+    def should_hold(self, device: Device, sensor_data, status: str, timestamp: datetime, latest_id: int | None) -> bool:
+        """Whether this reading can be held instead of stored (latest_id: device's latest stored reading)."""
+        if not device.compression_enabled:
+            return False
+        state = self._states.get(device.id)
+        if state is None or state.status != status or state.reading["id"] != latest_id:
+            return False
+        if (as_utc(timestamp) - state.stored_at).total_seconds() >= device.compression_max_gap_seconds:
+            return False
+        return (
+            abs(sensor_data.tilt_x - state.tilt_x) <= device.deadband_tilt
+            and abs(sensor_data.tilt_y - state.tilt_y) <= device.deadband_tilt
+            and abs(sensor_data.tilt_z - state.tilt_z) <= device.deadband_tilt
+            and abs(sensor_data.distance_mm - state.distance_mm) <= device.deadband_distance_mm
+        )
+    
+    def hold(self, device_id: int) -> None:
+        """Count a held reading against the device's reference."""
+        self._states[device_id].held_count += 1
+    
+    def reference(self, device_id: int) -> dict:
+        """The last stored reading, which held readings are folded into."""
+        return self._states[device_id].reading
+    
+    def pending_hold(self, device_id: int) -> tuple[int, datetime | None]:
+        """Held readings (and held interval start) to record on the next stored reading."""
+        state = self._states.get(device_id)
+        if state is None or state.held_count == 0:
+            return 0, None
+        return state.held_count, state.stored_at
+    
+    def stored(self, device: Device, sensor_data, status: str, reading: dict) -> None:
+        """Make a newly stored reading the reference for the device."""
+        if not device.compression_enabled:
+            self._states.pop(device.id, None)
+            return
+        self._states[device.id] = _HeldState(
+            sensor_data.tilt_x,
+            sensor_data.tilt_y,
+            sensor_data.tilt_z,
+            sensor_data.distance_mm,
+            status,
+            as_utc(reading["created_at"]),
+            reading,
+        )
+    
+    def forget(self, device_id: int) -> None:
+        self._states.pop(device_id, None)
+
+deadband_compressor = DeadbandCompressor()
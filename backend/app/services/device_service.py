@@ -1,10 +1,22 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
+from app.core import security
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.timeutils import as_utc
 from app.models.device import Device
-from app.schemas.device import DeviceRegister, DeviceUpdate
-from datetime import datetime, timezone
+from app.schemas.device import DeviceRegister, DeviceUpdate, ONLINE_WINDOW
+from app.services.analytics_service import AnalyticsService
+from app.services.online_stats import online_stats
+from app.services.sensor_service import SensorService
+from datetime import datetime, timezone, timedelta
+import hmac
 from fastapi import HTTPException, status
 
+# (device_uid, presented key) -> stored hash it matched; a hit skips the HMAC
+# and stays correct across rotations because the stored hash is re-checked
+_verified_ingest_keys: TTLCache[tuple[str, str], str] = TTLCache(settings.DEVICE_KEY_CACHE_TTL_SECONDS)
+
 class DeviceService:
     """Service layer for device operations"""
     
@@ -43,6 +55,12 @@ class DeviceService:
             distance_warning_threshold=device_data.distance_warning_threshold,
             distance_alert_threshold=device_data.distance_alert_threshold,
             notification_email=device_data.notification_email,
+            compression_enabled=device_data.compression_enabled,
+            deadband_tilt=device_data.deadband_tilt,
+            deadband_distance_mm=device_data.deadband_distance_mm,
+            compression_max_gap_seconds=device_data.compression_max_gap_seconds,
+            ingest_rate_limit=device_data.ingest_rate_limit,
+            ingest_burst=device_data.ingest_burst,
             installed_at=device_data.installed_at or datetime.now(timezone.utc),
             connection_status=False,
             created_at=datetime.now(timezone.utc)
@@ -69,6 +87,33 @@ class DeviceService:
         devices = result.scalars().all()
         return list(devices)
     
+    @staticmethod
+    async def get_devices_version(db: AsyncSession) -> tuple:
+        """
+        Get a cheap validator for the device list.
+        
+        Covers additions/deletions (count, max id), metadata updates
+        (sum of generations), ingest activity (latest last_seen_at) and
+        the computed is_online flag (number of devices inside the window).
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Tuple that changes whenever the serialized device list would
+        """
+        online_cutoff = datetime.now(timezone.utc) - ONLINE_WINDOW
+        result = await db.execute(
+            select(
+                func.count(Device.id),
+                func.max(Device.id),
+                func.coalesce(func.sum(Device.generation), 0),
+                func.max(Device.last_seen_at),
+                func.count(Device.id).filter(Device.last_seen_at > online_cutoff),
+            )
+        )
+        return tuple(result.one())
+    
     @staticmethod
     async def get_device_by_uid(db: AsyncSession, device_uid: str) -> Device | None:
         """
@@ -136,6 +181,7 @@ class DeviceService:
         
         for field, value in update_data.items():
             setattr(device, field, value)
+        device.generation += 1
         
         await db.commit()
         await db.refresh(device)
@@ -160,6 +206,74 @@ class DeviceService:
         device.last_seen_at = datetime.now(timezone.utc)
         await db.commit()
 
+    @staticmethod
+    async def rotate_ingest_key(db: AsyncSession, device_id: int) -> tuple[Device, str]:
+        """
+        Issue a new ingest key for a device.
+        
+        The current key (if any) remains valid for
+        DEVICE_KEY_ROTATION_GRACE_SECONDS so the device can be updated.
+        
+        Args:
+            db: Database session
+            device_id: Device ID
+            
+        Returns:
+            Tuple of the updated Device and the new plain-text key
+            
+        Raises:
+            HTTPException: If device not found
+        """
+        device = await DeviceService.get_device_by_id(db, device_id)
+        if not device:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Device with ID {device_id} not found"
+            )
+        
+        api_key = security.generate_api_key()
+        if device.ingest_key_hash:
+            device.previous_ingest_key_hash = device.ingest_key_hash
+            device.previous_ingest_key_expires_at = datetime.now(timezone.utc) + timedelta(
+                seconds=settings.DEVICE_KEY_ROTATION_GRACE_SECONDS
+            )
+        device.ingest_key_hash = security.get_api_key_hash(api_key)
+        
+        await db.commit()
+        await db.refresh(device)
+        return device, api_key
+    
+    @staticmethod
+    def verify_ingest_key(device: Device, api_key: str | None) -> bool:
+        """
+        Check a presented ingest key against the device's current/previous key.
+        
+        Devices without a key are accepted unless INGEST_REQUIRE_DEVICE_KEY is set.
+        Successful verifications are cached so steady-state cost is a dict lookup.
+        """
+        if not device.ingest_key_hash:
+            return not settings.INGEST_REQUIRE_DEVICE_KEY
+        if not api_key:
+            return False
+        
+        valid_hashes = [device.ingest_key_hash]
+        expires_at = device.previous_ingest_key_expires_at
+        if device.previous_ingest_key_hash and expires_at:
+            if as_utc(expires_at) > datetime.now(timezone.utc):
+                valid_hashes.append(device.previous_ingest_key_hash)
+        
+        cache_key = (device.device_uid, api_key)
+        cached_hash = _verified_ingest_keys.get(cache_key)
+        if cached_hash is not None and cached_hash in valid_hashes:
+            return True
+        
+        presented_hash = security.get_api_key_hash(api_key)
+        for stored_hash in valid_hashes:
+            if hmac.compare_digest(presented_hash, stored_hash):
+                _verified_ingest_keys.set(cache_key, stored_hash)
+                return True
+        return False
+
     @staticmethod
     async def delete_device(db: AsyncSession, device_id: int) -> bool:
         """
@@ -169,8 +283,11 @@ class DeviceService:
         if not device:
             return False
             
+        device_uid = device.device_uid
         await db.delete(device)
         await db.commit()
+        SensorService.forget_device(device_id, device_uid)
+        online_stats.forget(device_id)
         return True
 
     @staticmethod
@@ -180,17 +297,29 @@ class DeviceService:
         """
         from app.models.raw_sensor_data import RawSensorData
         from app.models.processed_sensor_data import ProcessedSensorData
+        from app.models.status_event import StatusEvent
         from sqlalchemy import delete
         
         device = await DeviceService.get_device_by_id(db, device_id)
         if not device:
             return False
             
+        # Delete status events first (they reference processed readings)
+        await db.execute(delete(StatusEvent).where(StatusEvent.device_id == device_id))
+        
         # Delete processed data first (FK constraint)
         await db.execute(delete(ProcessedSensorData).where(ProcessedSensorData.device_id == device_id))
         
         # Delete raw data
         await db.execute(delete(RawSensorData).where(RawSensorData.device_id == device_id))
         
+        # Streaming statistics start over with the next reading
+        await online_stats.reset(db, device_id)
+        await AnalyticsService.delete_rollups(db, device_id)
+        # Other workers drop their cached baseline and status for the device
+        device.generation += 1
+        device.latest_reading_id = None
+        
         await db.commit()
+        SensorService.forget_device(device_id, device.device_uid)
         return True
@@ -0,0 +1,168 @@
+"""
+File formats for processed-data upload and export.
+
+Formats are registered by name with their file extensions, media type and
+the import path of their plugin class; the plugin module (and whatever it
+depends on, e.g. openpyxl) is imported on first use, so workers that never
+see an Excel file never load it.
+
+A plugin implements:
+
+    read(content: bytes) -> Iterator[tuple[int, dict | Exception]]
+        (row number in the file, {column: value}) per data row; a row that
+        cannot be decoded is yielded as the exception instead
+    write(rows) -> Iterator[str | bytes]
+        the export file in chunks (one chunk for non-streaming formats)
+    streaming: bool
+        whether write() produces chunks cheaply enough to stream from the
+        event loop (otherwise the export is built in a thread)
+
+Column names and value conversion are shared (COLUMNS, map_upload_row,
+export_values); plugins only deal with their file syntax.
+"""
+import importlib
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+# File header -> ProcessedSensorData attribute, in export column order.
+# Uploads accept either name for each column.
+COLUMNS = (
+    ("ID", "id"),
+    ("Created At", "created_at"),
+    ("Status", "status"),
+    ("Tilt Diff X", "tilt_diff_x"),
+    ("Tilt Diff Y", "tilt_diff_y"),
+    ("Tilt Diff Z", "tilt_diff_z"),
+    ("Distance Diff (mm)", "distance_diff_mm"),
+    ("Tilt Change %", "tilt_change_percent"),
+    ("Distance Change %", "distance_change_percent"),
+)
+HEADERS = [header for header, _ in COLUMNS]
+KEYS = [key for _, key in COLUMNS]
+_VALUE_COLUMNS = COLUMNS[3:]
+
+# Naive uploaded times are IST (fixed UTC+05:30, no DST)
+UPLOAD_TIMEZONE = timezone(timedelta(hours=5, minutes=30), "IST")
+
+
+class FileFormat:
+    """Registered format: metadata, plus the plugin loaded on first use."""
+
+    def __init__(self, name: str, plugin: str, extensions: tuple[str, ...], media_type: str):
+        self.name = name
+        self.plugin_path = plugin
+        self.extensions = extensions
+        self.media_type = media_type
+        self._plugin = None
+
+    @property
+    def plugin(self):
+        if self._plugin is None:
+            module, _, attr = self.plugin_path.partition(":")
+            self._plugin = getattr(importlib.import_module(module), attr)()
+        return self._plugin
+
+    def read(self, content: bytes):
+        return self.plugin.read(content)
+
+    def write(self, rows):
+        return self.plugin.write(rows)
+
+    @property
+    def streaming(self) -> bool:
+        return self.plugin.streaming
+
+
+_formats: dict[str, FileFormat] = {}
+
+
+def register_format(name: str, plugin: str, extensions: tuple[str, ...], media_type: str) -> None:
+    """Register (or replace) a format; `plugin` is "module:Class", imported lazily."""
+    _formats[name] = FileFormat(name, plugin, tuple(ext.lower() for ext in extensions), media_type)
+
+
+def get_format(name: str) -> FileFormat | None:
+    return _formats.get(name)
+
+
+def format_for_filename(filename: str) -> FileFormat | None:
+    """Format of an uploaded file, by extension."""
+    filename = filename.lower()
+    for file_format in _formats.values():
+        if filename.endswith(file_format.extensions):
+            return file_format
+    return None
+
+
+def available_formats() -> list[str]:
+    return list(_formats)
+
+
+def _parse_datetime(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # Anything else a spreadsheet or a person may write ("18/10/2026 10:00", "Oct 18 2026")
+        from dateutil.parser import parse
+        return parse(value)
+
+
+def map_upload_row(row: dict[str, Any]) -> dict[str, Any]:
+    """
+    ProcessedSensorData values of one uploaded row.
+
+    Accepts the export headers or the attribute names as keys, and strings
+    (CSV, NDJSON) or typed values (Excel cells). Missing or empty numeric
+    values are 0, a missing status is SAFE and a missing timestamp is now.
+
+    Raises:
+        ValueError: If a value cannot be converted
+    """
+    values = {}
+    for header, key in _VALUE_COLUMNS:
+        value = row.get(header)
+        if value is None or value == "":
+            value = row.get(key)
+        values[key] = float(value) if value is not None and value != "" else 0.0
+
+    created_at = row.get("Created At") or row.get("created_at")
+    if not created_at:
+        created_at = datetime.now(timezone.utc)
+    elif not isinstance(created_at, datetime):
+        created_at = _parse_datetime(str(created_at))
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=UPLOAD_TIMEZONE).astimezone(timezone.utc)
+    values["created_at"] = created_at
+
+    values["status"] = str(row.get("Status") or row.get("status") or "SAFE")
+    return values
+
+
+def export_values(row) -> tuple:
+    """One exported row's values in COLUMNS order (attribute access, e.g. a Row)."""
+    return (
+        row.id,
+        row.created_at,
+        row.status,
+        row.tilt_diff_x,
+        row.tilt_diff_y,
+        row.tilt_diff_z,
+        row.distance_diff_mm,
+        row.tilt_change_percent,
+        row.distance_change_percent,
+    )
+
+
+register_format("csv", "app.services.file_formats.csv_format:CSVFormat", (".csv",), "text/csv")
+register_format(
+    "xlsx",
+    "app.services.file_formats.xlsx_format:XLSXFormat",
+    (".xlsx",),
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+)
+register_format(
+    "ndjson",
+    "app.services.file_formats.ndjson_format:NDJSONFormat",
+    (".ndjson", ".jsonl"),
+    "application/x-ndjson",
+)
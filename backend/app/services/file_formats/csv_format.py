@@ -0,0 +1,32 @@
+import codecs
+import csv
+import io
+from typing import Iterator
+
+from app.services.file_formats import HEADERS, export_values
+
+
+class CSVFormat:
+    """Comma-separated values with a header line (UTF-8)."""
+
+    streaming = True
+
+    def read(self, content: bytes) -> Iterator[tuple[int, dict]]:
+        reader = csv.DictReader(codecs.iterdecode(io.BytesIO(content), "utf-8"))
+        # Line 1 is the header
+        for index, row in enumerate(reader):
+            yield index + 2, row
+
+    def write(self, rows) -> Iterator[str]:
+        """The header line, then one chunk per row."""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(HEADERS)
+        yield output.getvalue()
+
+        for row in rows:
+            output.seek(0)
+            output.truncate(0)
+            values = export_values(row)
+            writer.writerow((values[0], values[1].isoformat(), *values[2:]))
+            yield output.getvalue()
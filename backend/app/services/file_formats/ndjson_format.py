@@ -0,0 +1,29 @@
+import json
+from typing import Iterator
+
+from app.core.serialization import dumps
+from app.services.file_formats import KEYS, export_values
+
+
+class NDJSONFormat:
+    """Newline-delimited JSON: one object per line, keyed by attribute name."""
+
+    streaming = True
+
+    def read(self, content: bytes) -> Iterator[tuple[int, dict | Exception]]:
+        for number, line in enumerate(content.decode("utf-8").splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, exc
+                continue
+            if not isinstance(row, dict):
+                yield number, ValueError("expected a JSON object")
+                continue
+            yield number, row
+
+    def write(self, rows) -> Iterator[bytes]:
+        for row in rows:
+            yield dumps(dict(zip(KEYS, export_values(row)))) + b"\n"
@@ -0,0 +1,38 @@
+import io
+from typing import Iterator
+
+import openpyxl
+
+from app.services.file_formats import HEADERS, export_values
+
+
+class XLSXFormat:
+    """Excel workbook: the active sheet, headers in the first row."""
+
+    # The workbook is only complete once saved; built in a thread
+    streaming = False
+
+    def read(self, content: bytes) -> Iterator[tuple[int, dict]]:
+        workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            headers = next(rows, ())
+            for index, cells in enumerate(rows):
+                if not any(cells):
+                    continue  # Skip empty rows
+                yield index + 2, dict(zip(headers, cells))
+        finally:
+            workbook.close()
+
+    def write(self, rows) -> Iterator[bytes]:
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Sensor Data")
+        sheet.append(HEADERS)
+        for row in rows:
+            values = export_values(row)
+            # Excel has no timezone-aware datetimes
+            sheet.append((values[0], values[1].replace(tzinfo=None), *values[2:]))
+
+        output = io.BytesIO()
+        workbook.save(output)
+        yield output.getvalue()
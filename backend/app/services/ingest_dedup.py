@@ -0,0 +1,79 @@
+import hmac
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+class DedupWindow:
+    """
+    Per-device sliding window of recently stored idempotency keys.
+    
+    Keyed by device_uid so a retried reading can be answered before the
+    device is even looked up. Each entry keeps the stored reading (to replay
+    the original response) and the device key it was accepted with, so a
+    replay is only returned to a caller presenting the same key. Entries
+    expire after ttl seconds.
+    
+    Durable keys (Idempotency-Key, or seq scoped by a boot id) are also
+    stored on the reading: the unique (device_id, dedup_key) constraint on
+    raw_sensor_data is the backstop for keys that fell out of the window or
+    were stored by another worker. A bare seq restarts when the device
+    reboots, so it is only deduplicated within the window and its ttl;
+    storing it would reject the rebooted device's readings forever.
+    """
+    
+    def __init__(self, window_size: int, max_devices: int, ttl: float):
+        self.window_size = window_size
+        self.max_devices = max_devices
+        self.ttl = ttl
+        self._windows: OrderedDict[str, OrderedDict[str, tuple[dict, str | None, float]]] = OrderedDict()
+    
+    @staticmethod
+    def make_key(seq: int | None, idempotency_key: str | None, boot_id: str | None = None) -> str | None:
+        """Normalize a sequence number (with its boot id) or Idempotency-Key into one dedup key."""
+        if idempotency_key:
+            return f"k:{idempotency_key}"
+        if seq is not None:
+            return f"b:{boot_id}:{seq}" if boot_id else f"s:{seq}"
+        return None
+    
+    @staticmethod
+    def durable_key(key: str | None) -> str | None:
+        """The key to store on the reading (None for window-only keys)."""
+        if key is None or key.startswith("s:"):
+            return None
+        return key
+    
+    def lookup(self, device_uid: str, key: str, api_key: str | None) -> dict | None:
+        """Get the stored reading for a key seen recently, or None."""
+        window = self._windows.get(device_uid)
+        if window is None:
+            return None
+        entry = window.get(key)
+        if entry is None:
+            return None
+        reading, accepted_key, remembered_at = entry
+        if time.monotonic() - remembered_at >= self.ttl:
+            del window[key]
+            return None
+        if accepted_key is not None and not hmac.compare_digest(accepted_key, api_key or ""):
+            return None
+        return reading
+    
+    def remember(self, device_uid: str, key: str, api_key: str | None, reading: dict) -> None:
+        window = self._windows.get(device_uid)
+        if window is None:
+            if len(self._windows) >= self.max_devices:
+                self._windows.popitem(last=False)
+            window = self._windows[device_uid] = OrderedDict()
+        else:
+            self._windows.move_to_end(device_uid)
+        window[key] = (reading, api_key, time.monotonic())
+        window.move_to_end(key)
+        if len(window) > self.window_size:
+            window.popitem(last=False)
+    
+    def forget(self, device_uid: str) -> None:
+        self._windows.pop(device_uid, None)
+
+ingest_dedup = DedupWindow(settings.INGEST_DEDUP_WINDOW, settings.INGEST_DEDUP_MAX_DEVICES, settings.INGEST_DEDUP_TTL_SECONDS)
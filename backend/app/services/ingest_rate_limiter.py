@@ -0,0 +1,94 @@
+import time
+
+from app.core.config import settings
+from app.core.metrics import INGEST_THROTTLED
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at", "rate", "burst")
+    
+    def __init__(self, rate: float, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+        self.rate = rate
+        self.burst = burst
+
+class IngestRateLimiter:
+    """
+    Per-device token buckets for ingest, keyed by device_uid.
+    
+    Each reading takes one token; tokens refill at `rate` per second up to
+    `burst`. Buckets are only charged once the request's device key was
+    verified, so nobody else can spend a device's tokens. Checks are O(1)
+    and need no lock: they run on the event loop without awaiting. Buckets
+    are kept in least-recently-used order, so idle ones are evicted from the
+    front; a bucket that has been idle long enough to refill completely is
+    equivalent to a new one, so eviction never loosens or tightens a limit.
+    Per-device limits (Device.ingest_rate_limit / ingest_burst) are passed
+    with each acquire().
+    
+    State is per process: with several workers each enforces the limit on
+    the requests it receives.
+    """
+    
+    def __init__(self, rate: float, burst: int, max_devices: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_devices = max_devices
+        self._buckets: dict[str, _Bucket] = {}
+    
+    def acquire(self, device_uid: str, cost: int = 1, rate: float | None = None, burst: int | None = None) -> float:
+        """
+        Take `cost` tokens (one per reading) for an authenticated device.
+        
+        A request costing more than the burst proceeds once the bucket is
+        full and leaves it in debt, so batches are charged in full without
+        ever being refused outright.
+        
+        Args:
+            device_uid: Device the tokens are charged to
+            cost: Readings in the request
+            rate: The device's own rate (None = the configured default)
+            burst: The device's own burst (None = the configured default)
+        
+        Returns:
+            0 if the request may proceed, else seconds until enough tokens are available
+        """
+        rate = self.rate if rate is None else rate
+        burst = self.burst if burst is None else burst
+        now = time.monotonic()
+        bucket = self._buckets.pop(device_uid, None)
+        if bucket is None:
+            self._evict(now)
+            bucket = _Bucket(rate, burst, now)
+        else:
+            if bucket.rate > 0:
+                bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated_at) * bucket.rate)
+            bucket.updated_at = now
+            bucket.rate, bucket.burst = rate, burst
+            bucket.tokens = min(bucket.tokens, burst)
+        # Re-insert: dict order is least recently used first
+        self._buckets[device_uid] = bucket
+        
+        if bucket.rate <= 0:
+            return 0.0
+        needed = min(cost, bucket.burst)
+        if bucket.tokens >= needed:
+            bucket.tokens -= cost
+            return 0.0
+        INGEST_THROTTLED.inc()
+        return (needed - bucket.tokens) / bucket.rate
+    
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            uid = next(iter(self._buckets))
+            bucket = self._buckets[uid]
+            idle = bucket.rate <= 0 or (now - bucket.updated_at) * bucket.rate >= bucket.burst - bucket.tokens
+            if not idle and len(self._buckets) < self.max_devices:
+                break
+            del self._buckets[uid]
+
+ingest_rate_limiter = IngestRateLimiter(
+    settings.INGEST_RATE_LIMIT_PER_SECOND,
+    settings.INGEST_RATE_LIMIT_BURST,
+    settings.INGEST_RATE_LIMIT_MAX_DEVICES,
+)
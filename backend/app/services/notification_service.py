@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import smtplib
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_, or_
+
+from app.core.config import settings
+from app.core.db import BulkSessionLocal
+from app.core.metrics import NOTIFICATION_OUTBOX_PENDING, NOTIFICATIONS_SENT, NOTIFICATIONS_FAILED
+from app.core.timeutils import as_utc
+from app.models.device import Device
+from app.models.notification_outbox import NotificationOutbox
+from app.models.processed_sensor_data import ProcessedSensorData
+
+logger = logging.getLogger(__name__)
+
+# Statuses whose entry triggers a notification
+NOTIFY_STATUSES = ("WARNING", "ALERT")
+
+class NotificationService:
+    """
+    Transactional outbox for alert emails.
+    
+    Ingest only inserts outbox rows (in the reading's transaction); delivery
+    happens in a background dispatcher so ingest latency never depends on SMTP.
+    """
+    
+    @staticmethod
+    def enqueue_transition(
+        db: AsyncSession,
+        device: Device,
+        previous_status: str | None,
+        reading: ProcessedSensorData
+    ) -> NotificationOutbox | None:
+        """
+        Add an outbox row if the reading moved the device into WARNING or ALERT.
+        
+        The row is only added to the session; it is committed together with
+        the reading by the caller.
+        """
+        previous_status = previous_status or "SAFE"
+        if (
+            not device.notification_email
+            or reading.status not in NOTIFY_STATUSES
+            or reading.status == previous_status
+        ):
+            return None
+        
+        notification = NotificationOutbox(
+            device_id=device.id,
+            recipient=device.notification_email,
+            previous_status=previous_status,
+            status=reading.status,
+            tilt_change_percent=reading.tilt_change_percent,
+            distance_change_percent=reading.distance_change_percent,
+            reading_at=reading.created_at,
+        )
+        db.add(notification)
+        return notification
+    
+    @staticmethod
+    def build_message(device: Device, recipient: str, notifications: list[NotificationOutbox]) -> EmailMessage:
+        """One email per device and recipient summarizing every batched transition."""
+        latest = notifications[-1]
+        message = EmailMessage()
+        message["From"] = settings.SMTP_FROM
+        message["To"] = recipient
+        message["Subject"] = f"[StructSense] {device.name}: {latest.status}"
+        
+        lines = [
+            f"Device: {device.name} ({device.device_uid})",
+            f"Location: {device.building_name or '-'} {device.location_description or ''}".rstrip(),
+            "",
+            "Status changes:",
+        ]
+        for notification in notifications:
+            lines.append(
+                f"  {notification.reading_at.isoformat()}  "
+                f"{notification.previous_status} -> {notification.status}  "
+                f"(tilt {notification.tilt_change_percent:.1f}%, "
+                f"distance {notification.distance_change_percent:.1f}%)"
+            )
+        message.set_content("\n".join(lines))
+        return message
+    
+    @staticmethod
+    def send_email(message: EmailMessage) -> None:
+        """Deliver a message over SMTP (blocking, run in a thread)."""
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30) as smtp:
+            if settings.SMTP_STARTTLS:
+                smtp.starttls()
+            if settings.SMTP_USER:
+                smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD or "")
+            smtp.send_message(message)
+    
+    @staticmethod
+    def retry_delay(attempts: int) -> timedelta:
+        """Wait before the next attempt after `attempts` failed ones (exponential, capped)."""
+        seconds = settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        return timedelta(seconds=min(seconds, settings.NOTIFICATION_RETRY_MAX_SECONDS))
+    
+    @staticmethod
+    async def dispatch_pending(db: AsyncSession) -> int:
+        """
+        Deliver one batch of due notifications.
+        
+        1. Claim: due rows (PENDING past their next_attempt_at, or SENDING
+           with an expired lease) are locked with SKIP LOCKED and grouped
+           per (device, recipient). Each group is marked SENDING until
+           claimed_until, or, if it was emailed less than
+           NOTIFICATION_MIN_INTERVAL_SECONDS ago, postponed to the end of
+           that interval (debounce). This is committed before sending, so
+           no row lock is held while talking to SMTP.
+        2. Send one email per claimed group, outside any transaction.
+        3. Record: SENT; or PENDING again after an exponential backoff; or
+           FAILED after NOTIFICATION_MAX_ATTEMPTS. Rows whose lease expired
+           meanwhile (claimed again by another worker) are left alone.
+        
+        Returns:
+            Number of outbox rows delivered
+        """
+        now = datetime.now(timezone.utc)
+        due = or_(
+            and_(
+                NotificationOutbox.state == "PENDING",
+                or_(NotificationOutbox.next_attempt_at.is_(None), NotificationOutbox.next_attempt_at <= now),
+            ),
+            and_(NotificationOutbox.state == "SENDING", NotificationOutbox.claimed_until < now),
+        )
+        result = await db.execute(
+            select(NotificationOutbox)
+            .where(due)
+            .order_by(NotificationOutbox.created_at)
+            .limit(settings.NOTIFICATION_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        pending = result.scalars().all()
+        
+        pending_count = await db.execute(
+            select(func.count(NotificationOutbox.id)).where(NotificationOutbox.state.in_(("PENDING", "SENDING")))
+        )
+        NOTIFICATION_OUTBOX_PENDING.set(pending_count.scalar() or 0)
+        if not pending:
+            await db.commit()
+            return 0
+        
+        groups: dict[tuple[int, str], list[NotificationOutbox]] = defaultdict(list)
+        for notification in pending:
+            groups[(notification.device_id, notification.recipient)].append(notification)
+        
+        # Last delivery per group, so rate limits hold across workers and restarts
+        device_ids = {device_id for device_id, _ in groups}
+        last_sent_result = await db.execute(
+            select(NotificationOutbox.device_id, NotificationOutbox.recipient, func.max(NotificationOutbox.sent_at))
+            .where(NotificationOutbox.device_id.in_(device_ids), NotificationOutbox.state == "SENT")
+            .group_by(NotificationOutbox.device_id, NotificationOutbox.recipient)
+        )
+        last_sent = {(device_id, recipient): sent_at for device_id, recipient, sent_at in last_sent_result}
+        
+        devices_result = await db.execute(select(Device).where(Device.id.in_(device_ids)))
+        devices = {device.id: device for device in devices_result.scalars()}
+        
+        # 1. Claim
+        min_interval = timedelta(seconds=settings.NOTIFICATION_MIN_INTERVAL_SECONDS)
+        lease = now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+        claimed = []
+        for (device_id, recipient), notifications in groups.items():
+            sent_at = last_sent.get((device_id, recipient))
+            if sent_at is not None and now - as_utc(sent_at) < min_interval:
+                for notification in notifications:
+                    notification.state = "PENDING"
+                    notification.next_attempt_at = as_utc(sent_at) + min_interval
+                continue
+            for notification in notifications:
+                notification.state = "SENDING"
+                notification.claimed_until = lease
+            claimed.append((devices[device_id], recipient, notifications))
+        await db.commit()
+        
+        # 2. Send
+        errors: dict[int, str] = {}
+        for device, recipient, notifications in claimed:
+            message = NotificationService.build_message(device, recipient, notifications)
+            try:
+                await asyncio.to_thread(NotificationService.send_email, message)
+            except Exception as e:
+                for notification in notifications:
+                    errors[notification.id] = str(e)
+                NOTIFICATIONS_FAILED.inc(len(notifications))
+                logger.warning("Notification delivery to %s failed: %s", recipient, e)
+            else:
+                NOTIFICATIONS_SENT.inc()
+        
+        # 3. Record
+        claimed_ids = [notification.id for _, _, notifications in claimed for notification in notifications]
+        if not claimed_ids:
+            return 0
+        result = await db.execute(
+            select(NotificationOutbox)
+            .where(
+                NotificationOutbox.id.in_(claimed_ids),
+                NotificationOutbox.state == "SENDING",
+                NotificationOutbox.claimed_until == lease,
+            )
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        sent_at = datetime.now(timezone.utc)
+        delivered = 0
+        for notification in result.scalars():
+            notification.attempts += 1
+            notification.claimed_until = None
+            error = errors.get(notification.id)
+            if error is None:
+                notification.state = "SENT"
+                notification.sent_at = sent_at
+                delivered += 1
+            elif notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                notification.state = "FAILED"
+                notification.last_error = error
+                logger.error(
+                    "Giving up on notification %s to %s after %s attempts",
+                    notification.id, notification.recipient, notification.attempts,
+                )
+            else:
+                notification.state = "PENDING"
+                notification.last_error = error
+                notification.next_attempt_at = sent_at + NotificationService.retry_delay(notification.attempts)
+        await db.commit()
+        return delivered
+
+async def run_notification_dispatcher() -> None:
+    """Background loop delivering outbox notifications until cancelled."""
+    logger.info("Notification dispatcher started (SMTP %s:%s)", settings.SMTP_HOST, settings.SMTP_PORT)
+    while True:
+        try:
+            async with BulkSessionLocal() as db:
+                await NotificationService.dispatch_pending(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Notification dispatch failed")
+        await asyncio.sleep(settings.NOTIFICATION_DISPATCH_INTERVAL_SECONDS)
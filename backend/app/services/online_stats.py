@@ -0,0 +1,337 @@
+import asyncio
+import copy
+import logging
+import math
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import JSON, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.db import BulkSessionLocal
+from app.core.metrics import STATS_CHECKPOINT_PENDING
+from app.core.timeutils import as_utc
+from app.models.device import Device
+from app.models.device_statistics import DeviceStatistics
+
+logger = logging.getLogger(__name__)
+
+# Raw reading fields tracked per device
+METRICS = ("tilt_x", "tilt_y", "tilt_z", "distance_mm")
+
+class _MetricStats:
+    """
+    Mergeable accumulators for one metric.
+
+    - Welford mean/variance over every reading (plus min/max).
+    - Exponentially time-decayed weights (half-life STATS_HALF_LIFE_SECONDS):
+      weighted mean (EWMA), weighted variance and a weighted least-squares
+      trend of value over time, all kept as means and centred co-moments
+      (West's update), so large values with small spreads lose no precision.
+      Times are seconds relative to the device's latest reading, so the
+      state stays bounded however long the device runs.
+
+    Two accumulators over disjoint readings merge exactly (Chan et al.),
+    which is how partial states of several processes are combined.
+    """
+    __slots__ = ("count", "mean", "m2", "min", "max", "w", "ewma", "ewm2", "t_mean", "t_m2", "ty_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.w = 0.0
+        self.ewma = 0.0
+        self.ewm2 = 0.0
+        self.t_mean = 0.0
+        self.t_m2 = 0.0
+        self.ty_m2 = 0.0
+
+    def add(self, value: float, offset: float, weight: float) -> None:
+        """Fold in a reading taken `offset` seconds (<= 0) from the origin."""
+        # Welford
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        if weight <= 0.0:
+            return
+        self.w += weight
+        ratio = weight / self.w
+        dy = value - self.ewma
+        dt = offset - self.t_mean
+        self.ewma += ratio * dy
+        self.t_mean += ratio * dt
+        self.ewm2 += weight * dy * (value - self.ewma)
+        self.t_m2 += weight * dt * (offset - self.t_mean)
+        self.ty_m2 += weight * dt * (value - self.ewma)
+
+    def decay(self, shift: float, factor: float) -> None:
+        """Move the origin `shift` seconds later, decaying every weight by `factor`."""
+        self.t_mean -= shift
+        self.w *= factor
+        self.ewm2 *= factor
+        self.t_m2 *= factor
+        self.ty_m2 *= factor
+
+    def merge(self, other: "_MetricStats") -> None:
+        """Combine with another accumulator at the same origin."""
+        if other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+            self.count = count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        if other.w > 0.0:
+            w = self.w + other.w
+            scale = self.w * other.w / w
+            dy = other.ewma - self.ewma
+            dt = other.t_mean - self.t_mean
+            self.ewm2 += other.ewm2 + dy * dy * scale
+            self.t_m2 += other.t_m2 + dt * dt * scale
+            self.ty_m2 += other.ty_m2 + dt * dy * scale
+            self.ewma += dy * other.w / w
+            self.t_mean += dt * other.w / w
+            self.w = w
+
+    def slope(self) -> float | None:
+        """Trend in units per second (None until there is a time spread)."""
+        if self.t_m2 <= 1e-9:
+            return None
+        return self.ty_m2 / self.t_m2
+
+    def summary(self) -> dict:
+        slope = self.slope()
+        return {
+            "ewma": self.ewma,
+            "ewm_std": math.sqrt(max(self.ewm2 / self.w, 0.0)) if self.w > 0 else 0.0,
+            "mean": self.mean,
+            "std": math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "slope_per_hour": slope * 3600 if slope is not None else None,
+        }
+
+    def to_dict(self) -> dict:
+        state = {name: getattr(self, name) for name in self.__slots__}
+        # JSON has no infinities; only possible before the first reading
+        if self.count == 0:
+            state["min"] = state["max"] = None
+        return state
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "_MetricStats":
+        metric = cls()
+        for name in cls.__slots__:
+            if state.get(name) is not None:
+                setattr(metric, name, state[name])
+        return metric
+
+class _DeviceStats:
+    """A device's accumulators; `last_at` (latest reading) is the time origin."""
+    __slots__ = ("count", "last_at", "metrics", "started_at")
+
+    def __init__(self, count: int = 0, last_at: datetime | None = None, metrics: dict | None = None):
+        self.count = count
+        self.last_at = last_at
+        self.metrics = metrics or {name: _MetricStats() for name in METRICS}
+        # When this process started accumulating (compared with reset_at)
+        self.started_at = datetime.now(timezone.utc)
+
+    def _move_origin(self, last_at: datetime) -> None:
+        shift = (last_at - self.last_at).total_seconds()
+        factor = _decay(shift)
+        for metric in self.metrics.values():
+            metric.decay(shift, factor)
+        self.last_at = last_at
+
+    def add(self, values, created_at: datetime) -> None:
+        """Fold in one reading (older readings than the latest are fine)."""
+        if self.last_at is None:
+            self.last_at = created_at
+        elif created_at > self.last_at:
+            self._move_origin(created_at)
+        offset = (created_at - self.last_at).total_seconds()
+        weight = _decay(-offset)
+        for name, metric in self.metrics.items():
+            metric.add(getattr(values, name), offset, weight)
+        self.count += 1
+
+    def merge(self, other: "_DeviceStats") -> None:
+        """Combine with the state of other readings (other is consumed)."""
+        if other.last_at is None:
+            return
+        if self.last_at is None:
+            self.count, self.last_at, self.metrics = other.count, other.last_at, other.metrics
+            return
+        if other.last_at > self.last_at:
+            self._move_origin(other.last_at)
+        elif other.last_at < self.last_at:
+            other._move_origin(self.last_at)
+        for name, metric in self.metrics.items():
+            metric.merge(other.metrics[name])
+        self.count += other.count
+
+def _decay(seconds: float) -> float:
+    """Weight left after `seconds` (0 without a half-life: only the latest reading counts)."""
+    half_life = settings.STATS_HALF_LIFE_SECONDS
+    if half_life <= 0:
+        return 1.0 if seconds <= 0 else 0.0
+    return math.exp(-seconds * math.log(2) / half_life)
+
+class OnlineStats:
+    """
+    Streaming statistics per device, updated in O(1) for every ingested
+    reading (held, backdated and out-of-order readings included) without
+    touching history.
+
+    Each process only accumulates the readings it ingested since its last
+    checkpoint. The background checkpoint merges that partial state into
+    the device_statistics row under a row lock, so any number of workers
+    add up to the statistics of all readings. Reads combine the stored row
+    with this process's pending part (other workers' readings appear after
+    their next checkpoint).
+    """
+
+    def __init__(self):
+        self._pending: dict[int, _DeviceStats] = {}
+
+    def update(self, device_id: int, sensor_data, created_at: datetime) -> None:
+        """Fold one reading into the device's pending statistics."""
+        state = self._pending.get(device_id)
+        if state is None:
+            state = self._pending[device_id] = _DeviceStats()
+        state.add(sensor_data, as_utc(created_at))
+
+    async def get_summary(self, db: AsyncSession, device_id: int) -> dict:
+        """Current statistics (last checkpoint plus this process's pending readings)."""
+        row = await db.get(DeviceStatistics, device_id)
+        state = self._from_row(row) if row else _DeviceStats()
+        pending = self._pending.get(device_id)
+        if pending is not None and not self._predates_reset(pending, row):
+            state.merge(copy.deepcopy(pending))
+        return {
+            "device_id": device_id,
+            "sample_count": state.count,
+            "last_reading_at": state.last_at,
+            "half_life_seconds": settings.STATS_HALF_LIFE_SECONDS,
+            "metrics": {
+                name: metric.summary() for name, metric in state.metrics.items() if metric.count
+            },
+        }
+
+    async def checkpoint(self, db: AsyncSession) -> int:
+        """
+        Merge pending device states into device_statistics.
+
+        Devices deleted meanwhile are skipped, as are states that started
+        before the device's last reset. On failure the states are kept for
+        the next checkpoint.
+
+        Returns:
+            Number of devices written
+        """
+        pending, self._pending = self._pending, {}
+        STATS_CHECKPOINT_PENDING.set(len(pending))
+        if not pending:
+            return 0
+
+        written = 0
+        try:
+            # Rows for new devices; devices that no longer exist get none
+            await db.execute(
+                insert(DeviceStatistics)
+                .from_select(
+                    ["device_id", "sample_count", "state", "updated_at"],
+                    select(Device.id, literal(0), literal({}, JSON), func.now()).where(Device.id.in_(pending)),
+                )
+                .on_conflict_do_nothing(index_elements=[DeviceStatistics.device_id])
+            )
+            result = await db.execute(
+                select(DeviceStatistics)
+                .where(DeviceStatistics.device_id.in_(pending))
+                .order_by(DeviceStatistics.device_id)
+                .with_for_update()
+            )
+            now = datetime.now(timezone.utc)
+            for row in result.scalars():
+                state = pending[row.device_id]
+                if self._predates_reset(state, row):
+                    continue
+                merged = self._from_row(row)
+                merged.merge(copy.deepcopy(state))
+                row.sample_count = merged.count
+                row.last_reading_at = merged.last_at
+                row.state = {name: metric.to_dict() for name, metric in merged.metrics.items()}
+                row.updated_at = now
+                written += 1
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Keep them for the next checkpoint, with readings that arrived meanwhile
+            for device_id, state in pending.items():
+                newer = self._pending.get(device_id)
+                if newer is not None:
+                    state.merge(newer)
+                self._pending[device_id] = state
+            raise
+        return written
+
+    async def reset(self, db: AsyncSession, device_id: int) -> None:
+        """
+        Clear a device's statistics (caller commits).
+
+        The emptied row records reset_at, so partial states other processes
+        accumulated before the reset are discarded instead of merged.
+        """
+        self.forget(device_id)
+        stmt = insert(DeviceStatistics).values(
+            device_id=device_id, sample_count=0, last_reading_at=None, state={},
+            reset_at=func.now(), updated_at=func.now(),
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[DeviceStatistics.device_id],
+            set_={name: stmt.excluded[name] for name in ("sample_count", "last_reading_at", "state", "reset_at", "updated_at")},
+        ))
+
+    def forget(self, device_id: int) -> None:
+        self._pending.pop(device_id, None)
+
+    def pending_checkpoints(self) -> int:
+        """Devices changed since the last checkpoint."""
+        return len(self._pending)
+
+    @staticmethod
+    def _predates_reset(state: _DeviceStats, row: DeviceStatistics | None) -> bool:
+        return row is not None and row.reset_at is not None and state.started_at < as_utc(row.reset_at)
+
+    @staticmethod
+    def _from_row(row: DeviceStatistics) -> _DeviceStats:
+        return _DeviceStats(
+            row.sample_count,
+            as_utc(row.last_reading_at) if row.last_reading_at else None,
+            {name: _MetricStats.from_dict(row.state.get(name, {})) for name in METRICS},
+        )
+
+online_stats = OnlineStats()
+
+
+async def run_stats_checkpointer() -> None:
+    """Background loop checkpointing device statistics until cancelled."""
+    while True:
+        await asyncio.sleep(settings.STATS_CHECKPOINT_INTERVAL_SECONDS)
+        try:
+            async with BulkSessionLocal() as db:
+                await online_stats.checkpoint(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Device statistics checkpoint failed")
@@ -1,11 +1,61 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
 from app.models.raw_sensor_data import RawSensorData
 from app.models.processed_sensor_data import ProcessedSensorData
 from app.models.device import Device
 from app.schemas.sensor import SensorIngestRequest
+from app.services.analytics_service import AnalyticsService
+from app.services.notification_service import NotificationService
+from app.services.status_event_service import StatusEventService
+from app.services.deadband import deadband_compressor
+from app.services.ingest_dedup import ingest_dedup
+from app.services.online_stats import online_stats
+from app.services.status_tracker import status_tracker
+from app.core.metrics import INGEST_STAGE_DURATION
+from app.core.timeutils import as_utc
 from datetime import datetime, timezone
 import math
+import time
+
+# Columns returned by the read endpoints, in ProcessedSensorDataResponse order
+PROCESSED_COLUMNS = (
+    ProcessedSensorData.id,
+    ProcessedSensorData.device_id,
+    ProcessedSensorData.raw_data_id,
+    ProcessedSensorData.tilt_diff_x,
+    ProcessedSensorData.tilt_diff_y,
+    ProcessedSensorData.tilt_diff_z,
+    ProcessedSensorData.distance_diff_mm,
+    ProcessedSensorData.tilt_change_percent,
+    ProcessedSensorData.distance_change_percent,
+    ProcessedSensorData.status,
+    ProcessedSensorData.created_at,
+    ProcessedSensorData.held_count,
+    ProcessedSensorData.held_since,
+)
+
+# Device baselines (first raw reading) cached per process:
+# device_id -> (device generation, (x, y, z, distance, created_at)).
+# Reset, upload and backdated readings bump the generation, so every
+# worker reloads a baseline another worker replaced.
+_baselines: dict[int, tuple[int, tuple[float, float, float, float, datetime]]] = {}
+
+# Held readings refresh last_seen_at at most this often (keeps is_online accurate)
+LAST_SEEN_RESOLUTION_SECONDS = 10.0
+
+# ingest_sensor_data stage timers (children resolved once, off the hot path)
+_stage_timers = {
+    stage: INGEST_STAGE_DURATION.labels(stage)
+    for stage in ("baseline", "evaluate", "hold", "store", "commit", "refresh")
+}
+
+class DuplicateReadingError(Exception):
+    """Raised when a reading with the same idempotency key is already stored."""
+    
+    def __init__(self, reading: dict):
+        super().__init__("Reading already stored")
+        self.reading = reading
 
 class SensorService:
     """
@@ -29,11 +79,145 @@ class SensorService:
         )
         return result.scalars().first()
     
+    @staticmethod
+    async def get_baseline(db: AsyncSession, device: Device) -> tuple[float, float, float, float, datetime] | None:
+        """Get the device baseline (first reading), cached while the device generation is unchanged."""
+        cached = _baselines.get(device.id)
+        if cached is not None and cached[0] == device.generation:
+            return cached[1]
+        first_reading = await SensorService.get_initial_reading(db, device.id)
+        if first_reading is None:
+            _baselines.pop(device.id, None)
+            return None
+        baseline = (
+            first_reading.tilt_x,
+            first_reading.tilt_y,
+            first_reading.tilt_z,
+            first_reading.distance_mm,
+            first_reading.created_at,
+        )
+        _baselines[device.id] = (device.generation, baseline)
+        return baseline
+    
+    @staticmethod
+    def forget_device(device_id: int, device_uid: str | None = None) -> None:
+        """
+        Drop all per-process ingest state for a device.
+        
+        Call after its data was deleted, reset or bulk-replaced (and bump
+        the device generation, so other workers drop theirs too).
+        """
+        _baselines.pop(device_id, None)
+        status_tracker.forget(device_id)
+        deadband_compressor.forget(device_id)
+        if device_uid:
+            ingest_dedup.forget(device_uid)
+    
+    @staticmethod
+    async def get_processed_version(db: AsyncSession, device_id: int) -> int | None:
+        """
+        Get the latest processed reading id for a device (read validator).
+        
+        Processed rows are append-only and only ever deleted per device,
+        so the max id changes whenever the readings list would.
+        """
+        result = await db.execute(
+            select(func.max(ProcessedSensorData.id))
+            .where(ProcessedSensorData.device_id == device_id)
+        )
+        return result.scalar()
+    
+    @staticmethod
+    async def get_processed_rows(db: AsyncSession, device_id: int, limit: int) -> list[dict]:
+        """
+        Get the latest processed readings for a device as plain dicts.
+        
+        Selects column tuples instead of ORM entities so bulk reads skip
+        identity-map bookkeeping and per-row Pydantic validation.
+        """
+        result = await db.execute(
+            select(*PROCESSED_COLUMNS)
+            .where(ProcessedSensorData.device_id == device_id)
+            .order_by(ProcessedSensorData.created_at.desc())
+            .limit(limit)
+        )
+        keys = tuple(result.keys())
+        return [dict(zip(keys, row)) for row in result]
+    
+    @staticmethod
+    def reading_to_dict(reading: ProcessedSensorData) -> dict:
+        """Plain-dict form of a processed reading (same shape as the read endpoints)."""
+        return {column.key: getattr(reading, column.key) for column in PROCESSED_COLUMNS}
+    
+    @staticmethod
+    async def get_reading_by_dedup_key(db: AsyncSession, device_id: int, dedup_key: str) -> dict | None:
+        """Get the processed reading stored for a device's idempotency key."""
+        result = await db.execute(
+            select(*PROCESSED_COLUMNS)
+            .join(RawSensorData, RawSensorData.id == ProcessedSensorData.raw_data_id)
+            .where(RawSensorData.device_id == device_id, RawSensorData.dedup_key == dedup_key)
+        )
+        row = result.first()
+        return dict(row._mapping) if row else None
+    
     @staticmethod
     def calculate_tilt_angle(tilt_x: float, tilt_y: float, tilt_z: float) -> float:
         """Calculate total tilt angle in degrees."""
         return math.sqrt(tilt_x**2 + tilt_y**2 + tilt_z**2)
     
+    @staticmethod
+    def compute_changes(
+        tilt_x: float,
+        tilt_y: float,
+        tilt_z: float,
+        distance_mm: float,
+        baseline: tuple[float, float, float, float]
+    ) -> tuple[float, float, float, float, float, float]:
+        """
+        Compare a reading with the device baseline (x, y, z, distance).
+        
+        Returns:
+            (tilt_diff_x, tilt_diff_y, tilt_diff_z, distance_diff_mm,
+            tilt_change_percent, distance_change_percent)
+        """
+        base_tilt_x, base_tilt_y, base_tilt_z, base_distance = baseline
+        
+        # Calculate differences (absolute change)
+        tilt_diff_x = tilt_x - base_tilt_x
+        tilt_diff_y = tilt_y - base_tilt_y
+        tilt_diff_z = tilt_z - base_tilt_z
+        
+        # For Distance:
+        # SINK = Distance DECREASES (Structure moves closer to sensor) => Positive difference
+        # RISE = Distance INCREASES (Structure moves away) => Negative difference
+        # Use signed diff to indicate direction
+        distance_diff_mm = base_distance - distance_mm
+        
+        # Calculate percentage change for each axis individually
+        # If baseline is 0, any deviation is considered 100% change
+        def calc_pct_change(current, baseline):
+            if baseline == 0:
+                return 100.0 if current != 0 else 0.0
+            return abs((current - baseline) / baseline) * 100.0
+        
+        # Use the MAXIMUM change among all axes to trigger alerts if ANY axis goes wide
+        tilt_change_percent = max(
+            calc_pct_change(tilt_x, base_tilt_x),
+            calc_pct_change(tilt_y, base_tilt_y),
+            calc_pct_change(tilt_z, base_tilt_z),
+        )
+        
+        if base_distance == 0:
+            distance_change_percent = 0.0
+        else:
+            # distance_diff_mm allows negative values to show direction (Rise/Sink)
+            distance_change_percent = (distance_diff_mm / base_distance) * 100.0
+        
+        return (
+            tilt_diff_x, tilt_diff_y, tilt_diff_z, distance_diff_mm,
+            tilt_change_percent, distance_change_percent,
+        )
+    
     @staticmethod
     def determine_status(
         device: Device,
@@ -65,87 +249,93 @@ class SensorService:
         db: AsyncSession,
         device: Device,
         sensor_data: SensorIngestRequest,
-        timestamp: datetime | None = None
-    ) -> ProcessedSensorData:
+        timestamp: datetime | None = None,
+        dedup_key: str | None = None
+    ) -> ProcessedSensorData | None:
         """
         Process incoming sensor data.
         
-        1. Save RawSensorData.
-        2. Calculate stats against baseline.
-        3. Save ProcessedSensorData.
-        4. Update device online status.
+        1. Calculate stats against baseline.
+        2. Hold the reading if deadband compression allows it.
+        3. Save RawSensorData and ProcessedSensorData.
+        4. Update device online status and streaming statistics.
+        
+        Returns:
+            The stored ProcessedSensorData, or None if the reading was held
+            by deadband compression (see deadband_compressor.hold)
+        
+        Raises:
+            DuplicateReadingError: If dedup_key was already stored for the device
         """
-        # 1. Save Raw Data
+        device_id = device.id
+        created_at = timestamp or datetime.now(timezone.utc)
+        started = time.perf_counter()
+        
+        # 1. Get Baseline (first reading ever for this device, cached in memory).
+        # If this is the very first reading, it is the baseline itself, so diffs are 0.
+        baseline = await SensorService.get_baseline(db, device)
+        backdated = False
+        if baseline is not None and timestamp is not None and as_utc(created_at) < as_utc(baseline[4]):
+            # Backdated manual reading becomes the new first reading
+            baseline = None
+            backdated = True
+            _baselines.pop(device_id, None)
+        reading = (sensor_data.tilt_x, sensor_data.tilt_y, sensor_data.tilt_z, sensor_data.distance_mm)
+        mark = time.perf_counter()
+        _stage_timers["baseline"].observe(mark - started)
+        
+        (
+            tilt_diff_x, tilt_diff_y, tilt_diff_z, distance_diff_mm,
+            tilt_change_percent, distance_change_percent,
+        ) = SensorService.compute_changes(*reading, reading if baseline is None else baseline[:4])
+        status = SensorService.determine_status(device, tilt_change_percent, distance_change_percent)
+        started, mark = mark, time.perf_counter()
+        _stage_timers["evaluate"].observe(mark - started)
+        
+        # Previous status (cached per process while no other worker stored a reading)
+        previous_status = await status_tracker.get_previous(db, device)
+        
+        # 2. Deadband compression: count the reading instead of storing it
+        if deadband_compressor.should_hold(device, sensor_data, status, created_at, device.latest_reading_id):
+            deadband_compressor.hold(device_id)
+            online_stats.update(device_id, sensor_data, created_at)
+            now = datetime.now(timezone.utc)
+            last_seen = device.last_seen_at
+            if last_seen is None or (now - as_utc(last_seen)).total_seconds() >= LAST_SEEN_RESOLUTION_SECONDS:
+                device.connection_status = True
+                device.last_seen_at = now
+                await db.commit()
+            _stage_timers["hold"].observe(time.perf_counter() - mark)
+            return None
+        
+        # 3. Save Raw Data
         raw_reading = RawSensorData(
-            device_id=device.id,
+            device_id=device_id,
             tilt_x=sensor_data.tilt_x,
             tilt_y=sensor_data.tilt_y,
             tilt_z=sensor_data.tilt_z,
             distance_mm=sensor_data.distance_mm,
-            created_at=timestamp or datetime.now(timezone.utc)
+            dedup_key=dedup_key,
+            created_at=created_at
         )
         db.add(raw_reading)
-        await db.flush() # Flush to get the ID
-        
-        # 2. Get Baseline
-        
-        # If this is the very first reading, it is the baseline itself
-        # In that case, initial_reading might be the one we just added (or None if not committed yet? flush handles it)
-        # Actually effectively if it's the first reading, diffs are 0.
-        
-        # Calculate baselines (first reading ever for this device?)
-        # For now, we use the VERY FIRST reading as baseline.
-        # Check if we have a baseline reading
-        base_tilt_x = raw_reading.tilt_x
-        base_tilt_y = raw_reading.tilt_y
-        base_tilt_z = raw_reading.tilt_z
-        base_distance = raw_reading.distance_mm
+        try:
+            await db.flush() # Flush to get the ID
+        except IntegrityError:
+            # Unique (device_id, dedup_key) backstop: the reading was already stored
+            if dedup_key is None:
+                raise
+            await db.rollback()
+            await db.refresh(device) # rollback expired it; callers keep using it
+            existing = await SensorService.get_reading_by_dedup_key(db, device_id, dedup_key)
+            if existing is None:
+                raise
+            raise DuplicateReadingError(existing)
         
-        # optimized: could cache baseline in device record or redis
-        # For now, simple query: get first reading
-        first_reading = await SensorService.get_initial_reading(db, device.id)
-        if first_reading:
-            base_tilt_x = first_reading.tilt_x
-            base_tilt_y = first_reading.tilt_y
-            base_tilt_z = first_reading.tilt_z
-            base_distance = first_reading.distance_mm
-            
-        # Calculate differences (absolute change)
-        tilt_diff_x = raw_reading.tilt_x - base_tilt_x
-        tilt_diff_y = raw_reading.tilt_y - base_tilt_y
-        tilt_diff_z = raw_reading.tilt_z - base_tilt_z
-        
-        # For Distance:
-        # SINK = Distance DECREASES (Structure moves closer to sensor) => Positive difference
-        # RISE = Distance INCREASES (Structure moves away) => Negative difference
-        # Use signed diff to indicate direction
-        raw_diff = base_distance - raw_reading.distance_mm
-        distance_diff_mm = raw_diff
-                
-        # Calculate percentage change for each axis individually
-        # If baseline is 0, any deviation is considered 100% change
-        def calc_pct_change(current, baseline):
-            if baseline == 0:
-                return 100.0 if current != 0 else 0.0
-            return abs((current - baseline) / baseline) * 100.0
-
-        pct_x = calc_pct_change(raw_reading.tilt_x, base_tilt_x)
-        pct_y = calc_pct_change(raw_reading.tilt_y, base_tilt_y)
-        pct_z = calc_pct_change(raw_reading.tilt_z, base_tilt_z)
-        
-        # Use the MAXIMUM change among all axes to trigger alerts if ANY axis goes wide
-        tilt_change_percent = max(pct_x, pct_y, pct_z)
-            
-        if base_distance == 0:
-             distance_change_percent = 0.0
-        else:
-            # distance_diff_mm allows negative values to show direction (Rise/Sink)
-            distance_change_percent = (distance_diff_mm / base_distance) * 100.0
-            
-        status = SensorService.determine_status(device, tilt_change_percent, distance_change_percent)
+        held_count, held_since = deadband_compressor.pending_hold(device_id)
         
         processed_reading = ProcessedSensorData(
-            device_id=device.id,
+            device_id=device_id,
             raw_data_id=raw_reading.id,
             tilt_diff_x=tilt_diff_x, # Signed value
             tilt_diff_y=tilt_diff_y, # Signed value
@@ -154,15 +344,42 @@ class SensorService:
             tilt_change_percent=tilt_change_percent,
             distance_change_percent=distance_change_percent,
             status=status,
+            held_count=held_count,
+            held_since=held_since,
             created_at=raw_reading.created_at # sync timestamp
         )
         db.add(processed_reading)
         
+        # 4. Record status transitions and queue an alert notification on
+        # transitions into WARNING/ALERT (same transaction; delivery happens
+        # in the background dispatcher)
+        StatusEventService.record_transition(db, device_id, previous_status, processed_reading)
+        NotificationService.enqueue_transition(db, device, previous_status, processed_reading)
+        # The reading's hour is recomputed by the next rollup refresh
+        await AnalyticsService.mark_rollup_dirty(db, device_id, (created_at,))
+        await db.flush() # Reading id for the device row, before its update is flushed
+        
         # 5. Update Device Status
         device.connection_status = True
         device.last_seen_at = datetime.now(timezone.utc)
+        if backdated:
+            # New first reading: other workers must reload the baseline
+            device.generation += 1
+        if status_tracker.is_latest(device_id, created_at):
+            status_tracker.stored(device, processed_reading.id, status, created_at)
+        started, mark = mark, time.perf_counter()
+        _stage_timers["store"].observe(mark - started)
         
         await db.commit()
+        started, mark = mark, time.perf_counter()
+        _stage_timers["commit"].observe(mark - started)
+        online_stats.update(device_id, sensor_data, created_at)
+        if baseline is None:
+            _baselines[device_id] = (device.generation, (
+                sensor_data.tilt_x, sensor_data.tilt_y, sensor_data.tilt_z, sensor_data.distance_mm, created_at
+            ))
         await db.refresh(processed_reading)
+        deadband_compressor.stored(device, sensor_data, status, SensorService.reading_to_dict(processed_reading))
+        _stage_timers["refresh"].observe(time.perf_counter() - mark)
         
         return processed_reading
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert, func, literal
+
+from app.core.timeutils import as_utc
+from app.models.processed_sensor_data import ProcessedSensorData
+from app.models.status_event import StatusEvent
+
+class StatusEventService:
+    """
+    Status transition log.
+    
+    Transitions are recorded while readings are written, so alert history
+    and time-in-state queries only ever touch the small status_events table.
+    """
+    
+    @staticmethod
+    def record_transition(
+        db: AsyncSession,
+        device_id: int,
+        previous_status: str | None,
+        reading: ProcessedSensorData
+    ) -> StatusEvent | None:
+        """
+        Add a StatusEvent if the reading's status differs from the previous one.
+        
+        The event is linked through the relationship, so no flush is needed;
+        it is committed together with the reading by the caller.
+        """
+        if reading.status == previous_status:
+            return None
+        
+        event = StatusEvent(
+            device_id=device_id,
+            previous_status=previous_status,
+            status=reading.status,
+            reading=reading,
+            created_at=reading.created_at,
+        )
+        db.add(event)
+        return event
+    
+    @staticmethod
+    async def record_bulk_transitions(
+        db: AsyncSession,
+        device_id: int,
+        readings: list[ProcessedSensorData]
+    ) -> int:
+        """
+        Rebuild transitions after a batch of uploaded readings (caller commits).
+        
+        Uploaded readings may land between stored ones, which changes the
+        transitions after them too: every event from the earliest uploaded
+        timestamp onward is deleted and recomputed from the readings (in
+        the database, one window query), starting from the status of the
+        latest reading before that timestamp.
+        
+        Returns:
+            Number of events recorded
+        """
+        if not readings:
+            return 0
+        
+        await db.flush()
+        earliest = min(as_utc(reading.created_at) for reading in readings)
+        await db.execute(
+            delete(StatusEvent).where(StatusEvent.device_id == device_id, StatusEvent.created_at >= earliest)
+        )
+        
+        P = ProcessedSensorData
+        # Include the readings at the last timestamp before the batch, to seed lag()
+        before = (
+            select(P.created_at)
+            .where(P.device_id == device_id, P.created_at < earliest)
+            .order_by(P.created_at.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        ordered = (
+            select(
+                P.id,
+                P.status,
+                P.created_at,
+                func.lag(P.status).over(order_by=(P.created_at, P.id)).label("previous_status"),
+            )
+            .where(P.device_id == device_id, P.created_at >= func.coalesce(before, earliest))
+            .subquery()
+        )
+        transitions = select(
+            literal(device_id), ordered.c.previous_status, ordered.c.status, ordered.c.id, ordered.c.created_at
+        ).where(
+            ordered.c.created_at >= earliest,
+            ordered.c.previous_status.is_distinct_from(ordered.c.status),
+        )
+        result = await db.execute(
+            insert(StatusEvent).from_select(
+                ["device_id", "previous_status", "status", "processed_data_id", "created_at"], transitions
+            )
+        )
+        return result.rowcount
+    
+    @staticmethod
+    async def get_status_history(
+        db: AsyncSession,
+        device_id: int,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        limit: int = 1000
+    ) -> dict:
+        """
+        Get transitions and time spent in each status over [start, end].
+        
+        Args:
+            db: Database session
+            device_id: Device ID
+            start: Range start (None = since the first event)
+            end: Range end (None = now)
+            limit: Maximum number of (most recent) events returned; durations
+                always cover the whole range
+            
+        Returns:
+            Dict matching StatusHistoryResponse
+        """
+        end = as_utc(end) if end else datetime.now(timezone.utc)
+        start = as_utc(start) if start else None
+        
+        # Status in effect at the start of the range
+        status_at_start = None
+        if start is not None:
+            result = await db.execute(
+                select(StatusEvent.status)
+                .where(StatusEvent.device_id == device_id, StatusEvent.created_at < start)
+                .order_by(StatusEvent.created_at.desc())
+                .limit(1)
+            )
+            status_at_start = result.scalar()
+        
+        query = select(StatusEvent).where(
+            StatusEvent.device_id == device_id,
+            StatusEvent.created_at <= end
+        )
+        if start is not None:
+            query = query.where(StatusEvent.created_at >= start)
+        result = await db.execute(query.order_by(StatusEvent.created_at.asc()))
+        events = list(result.scalars().all())
+        
+        durations: dict[str, float] = defaultdict(float)
+        cursor_status = status_at_start
+        cursor_time = start if start is not None else (as_utc(events[0].created_at) if events else end)
+        for event in events:
+            event_time = as_utc(event.created_at)
+            if cursor_status is not None:
+                durations[cursor_status] += (event_time - cursor_time).total_seconds()
+            cursor_status, cursor_time = event.status, event_time
+        if cursor_status is not None:
+            durations[cursor_status] += max(0.0, (end - cursor_time).total_seconds())
+        
+        return {
+            "device_id": device_id,
+            "start": start,
+            "end": end,
+            "current_status": cursor_status,
+            "durations_seconds": dict(durations),
+            "events": events[-limit:] if limit else events,
+        }
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.core.timeutils import as_utc
+from app.models.device import Device
+from app.models.processed_sensor_data import ProcessedSensorData
+
+class _Latest:
+    __slots__ = ("generation", "reading_id", "status", "created_at")
+
+    def __init__(self, generation: int, reading_id: int | None, status: str | None, created_at: datetime | None):
+        self.generation = generation
+        self.reading_id = reading_id
+        self.status = status
+        self.created_at = created_at
+
+class StatusTracker:
+    """
+    Status of each device's latest stored reading, kept in memory.
+
+    Lets ingest detect status transitions without querying the previous
+    reading. An entry is only used while the device's generation and
+    latest_reading_id (both on the device row ingest loads anyway) are the
+    ones it was cached with: a reading stored by another worker, a reset or
+    an upload changes one of them, and the next reading here looks the
+    status up again.
+    """
+
+    def __init__(self):
+        self._latest: dict[int, _Latest] = {}
+
+    async def get_previous(self, db: AsyncSession, device: Device) -> str | None:
+        """Get the device's last status (None if it has no readings yet)."""
+        latest = self._latest.get(device.id)
+        if latest is None or latest.generation != device.generation or latest.reading_id != device.latest_reading_id:
+            result = await db.execute(
+                select(ProcessedSensorData.status, ProcessedSensorData.created_at)
+                .where(ProcessedSensorData.device_id == device.id)
+                .order_by(ProcessedSensorData.created_at.desc())
+                .limit(1)
+            )
+            row = result.first()
+            latest = _Latest(
+                device.generation,
+                device.latest_reading_id,
+                row.status if row else None,
+                as_utc(row.created_at) if row else None,
+            )
+            self._latest[device.id] = latest
+        return latest.status
+
+    def is_latest(self, device_id: int, created_at: datetime) -> bool:
+        """Whether a reading taken at created_at is newer than the device's latest one (call after get_previous)."""
+        latest = self._latest.get(device_id)
+        return latest is None or latest.created_at is None or as_utc(created_at) >= latest.created_at
+
+    def stored(self, device: Device, reading_id: int, status: str, created_at: datetime) -> None:
+        """
+        Make a stored reading the device's latest (caller commits): sets
+        device.latest_reading_id, so other workers drop their entry.
+        """
+        device.latest_reading_id = reading_id
+        self._latest[device.id] = _Latest(device.generation, reading_id, status, as_utc(created_at))
+
+    def forget(self, device_id: int) -> None:
+        """Drop cached state (device deleted or its data reset)."""
+        self._latest.pop(device_id, None)
+
+status_tracker = StatusTracker()
@@ -0,0 +1,22 @@
+"""Shared helpers for the benchmark scripts."""
+import math
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies_s: list[float]) -> dict:
+    """p50/p95/p99/max latency in milliseconds."""
+    return {
+        "count": len(latencies_s),
+        "p50_ms": round(percentile(latencies_s, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies_s, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies_s, 99) * 1000, 2),
+        "max_ms": round(max(latencies_s, default=0.0) * 1000, 2),
+    }
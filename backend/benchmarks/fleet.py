@@ -0,0 +1,328 @@
+"""
+Simulated ESP32 fleet against a live instance.
+
+Each simulated device behaves like sensor_code/Tilt_sensor_code.ino: it
+POSTs the same compact JSON body to /sensor/ingest (raw MPU6050 counts and
+a distance with two decimals, Idempotency-Key `<boot id>-<sequence>`), waits
+3 seconds after each response (plus jitter for sensor reads and WiFi), and
+honours Retry-After on 429/503 (capped at 60s). Like the firmware, it opens a
+new connection per request unless --keep-alive is given.
+
+Readings drift realistically: every device has its own mounting offset,
+sensor noise and a slow tilt/settlement trend. With --outage-at, a share of
+the fleet loses connectivity for --outage-seconds and reconnects at the same
+moment, producing the synchronized burst seen after WiFi or power outages.
+
+The summary (throughput, p50/p95/p99 latency, error rates, overall and
+during the post-outage burst) is printed as JSON with --json or written with
+--output; --compare checks it against an earlier baseline and exits with
+status 1 if throughput, latency or error rate regressed beyond --threshold.
+
+Usage (from the backend directory, against a running instance):
+    python -m benchmarks.fleet --base-url http://localhost:8000 --devices 500 \\
+        --duration 120 --register --token <superuser token> --output fleet-baseline.json
+    python -m benchmarks.fleet --devices 500 --duration 120 --register --token <superuser token> \\
+        --compare fleet-baseline.json
+
+Devices are registered as <uid-prefix><n>. --register (with a superuser
+--token) creates missing ones and rotates each device's ingest key, and
+every simulated device then sends its own X-Device-Key, so authenticated
+ingest (and INGEST_REQUIRE_DEVICE_KEY) is exercised like in production.
+Without --register the devices send no key, which only works for devices
+without one. Set INGEST_RATE_LIMIT_* on the server above 1 request per 3
+seconds, and run
+the generator on another machine for large fleets (check client_lag_p99_ms:
+if the generator itself falls behind, the numbers describe the client).
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.common import summarize_latencies
+
+INGEST_PATH = "/api/v1/sensor/ingest"
+# ESP32 HTTPClient default timeout
+REQUEST_TIMEOUT_SECONDS = 5.0
+MAX_BACKOFF_SECONDS = 60.0
+# MPU6050 at +-2g: 16384 counts per g
+ONE_G = 16384
+
+
+class SimulatedDevice:
+    """Sensor state of one device: mounting offset, noise and slow drift."""
+
+    def __init__(self, uid: str, rng: random.Random, key: str | None = None):
+        self.uid = uid
+        self.key = key
+        self.rng = rng
+        self.boot_id = rng.getrandbits(32)
+        self.sequence = 0
+        self.tilt = [rng.gauss(0, 400), rng.gauss(0, 400), ONE_G + rng.gauss(0, 150)]
+        self.tilt_drift = [rng.gauss(0, 0.05) for _ in range(3)]  # counts per reading
+        self.distance = rng.uniform(300, 1500)
+        self.distance_drift = rng.gauss(0, 0.002)  # mm per reading (settlement)
+
+    def next_body(self) -> str:
+        """Next reading, formatted exactly like the firmware's String concatenation."""
+        self.sequence += 1
+        for axis in range(3):
+            self.tilt[axis] += self.tilt_drift[axis]
+        self.distance += self.distance_drift
+        ax, ay, az = (int(value + self.rng.gauss(0, 40)) for value in self.tilt)
+        distance = max(0.0, self.distance + self.rng.gauss(0, 0.4))
+        return (
+            f'{{"device_uid":"{self.uid}","tilt_x":{ax},"tilt_y":{ay},'
+            f'"tilt_z":{az},"distance_mm":{distance:.2f}}}'
+        )
+
+    def idempotency_key(self) -> str:
+        return f"{self.boot_id:x}-{self.sequence}"
+
+
+class Recorder:
+    def __init__(self, started: float, burst_window: tuple[float, float] | None):
+        self.started = started
+        self.burst_window = burst_window
+        self.latencies: list[float] = []
+        self.burst_latencies: list[float] = []
+        self.client_lag: list[float] = []
+        self.statuses: Counter[str] = Counter()
+        self.burst_statuses: Counter[str] = Counter()
+
+    def record(self, sent_at: float, latency: float, outcome: str) -> None:
+        self.latencies.append(latency)
+        self.statuses[outcome] += 1
+        offset = sent_at - self.started
+        if self.burst_window and self.burst_window[0] <= offset < self.burst_window[1]:
+            self.burst_latencies.append(latency)
+            self.burst_statuses[outcome] += 1
+
+
+async def run_device(
+    client: httpx.AsyncClient,
+    device: SimulatedDevice,
+    args: argparse.Namespace,
+    recorder: Recorder,
+    deadline: float,
+    outage: tuple[float, float] | None,
+) -> None:
+    # Devices boot at random points of the first cycle
+    await asyncio.sleep(device.rng.uniform(0, args.interval))
+    planned = time.perf_counter()
+    while planned < deadline:
+        now = time.perf_counter()
+        if outage and outage[0] <= now < outage[1]:
+            # Offline: the firmware keeps looping but nothing reaches the server
+            planned = outage[1]
+            await asyncio.sleep(outage[1] - now)
+            continue
+        recorder.client_lag.append(max(0.0, now - planned))
+
+        body = device.next_body()
+        headers = {"Content-Type": "application/json", "Idempotency-Key": device.idempotency_key()}
+        if device.key:
+            headers["X-Device-Key"] = device.key
+        backoff = 0.0
+        try:
+            response = await client.post(INGEST_PATH, content=body, headers=headers)
+            outcome = str(response.status_code)
+            if response.status_code in (429, 503):
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    backoff = min(max(int(retry_after), 1), MAX_BACKOFF_SECONDS)
+        except httpx.TimeoutException:
+            outcome = "timeout"
+        except httpx.HTTPError:
+            outcome = "connection_error"
+        finished = time.perf_counter()
+        recorder.record(now, finished - now, outcome)
+
+        delay = max(backoff, args.interval + device.rng.uniform(-args.jitter, args.jitter))
+        planned = finished + delay
+        await asyncio.sleep(max(0.0, planned - time.perf_counter()))
+
+
+async def register_devices(args: argparse.Namespace, uids: list[str]) -> dict[str, str]:
+    """Create missing devices and rotate every device's ingest key; returns uid -> key."""
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0, headers=headers) as client:
+        semaphore = asyncio.Semaphore(32)
+
+        async def register(uid: str) -> None:
+            async with semaphore:
+                response = await client.post(
+                    "/api/v1/devices/", json={"device_uid": uid, "name": uid, "type": "tilt-sensor"}
+                )
+                if response.status_code not in (201, 400, 409):
+                    response.raise_for_status()
+
+        await asyncio.gather(*(register(uid) for uid in uids))
+
+        response = await client.get("/api/v1/devices")
+        response.raise_for_status()
+        wanted = set(uids)
+        device_ids = {device["device_uid"]: device["id"] for device in response.json() if device["device_uid"] in wanted}
+
+        async def rotate_key(uid: str) -> tuple[str, str]:
+            async with semaphore:
+                response = await client.post(f"/api/v1/devices/{device_ids[uid]}/ingest-key")
+                response.raise_for_status()
+                return uid, response.json()["ingest_key"]
+
+        return dict(await asyncio.gather(*(rotate_key(uid) for uid in uids)))
+
+
+def _phase_summary(latencies: list[float], statuses: Counter, seconds: float) -> dict:
+    total = sum(statuses.values())
+    ok = sum(n for outcome, n in statuses.items() if outcome in ("200", "201", "202"))
+    return {
+        "requests": total,
+        "requests_per_s": round(total / seconds, 2) if seconds else 0.0,
+        "accepted_per_s": round(ok / seconds, 2) if seconds else 0.0,
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "latency": summarize_latencies(latencies),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    uids = [f"{args.uid_prefix}{n:05d}" for n in range(args.devices)]
+    keys = await register_devices(args, uids) if args.register else {}
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    outage = burst_window = None
+    outage_devices: set[int] = set()
+    if args.outage_at is not None:
+        outage = (started + args.outage_at, started + args.outage_at + args.outage_seconds)
+        outage_devices = set(rng.sample(range(args.devices), math.ceil(args.devices * args.outage_fraction)))
+        # Reconnect burst: the first cadence after the outage ends
+        burst_start = args.outage_at + args.outage_seconds
+        burst_window = (burst_start, burst_start + args.interval + args.jitter)
+    recorder = Recorder(started, burst_window)
+
+    limits = httpx.Limits(
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_connections if args.keep_alive else 0,
+    )
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=REQUEST_TIMEOUT_SECONDS, limits=limits) as client:
+        await asyncio.gather(*(
+            run_device(
+                client,
+                SimulatedDevice(uid, random.Random(rng.getrandbits(64)), keys.get(uid)),
+                args,
+                recorder,
+                deadline,
+                outage if index in outage_devices else None,
+            )
+            for index, uid in enumerate(uids)
+        ))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "benchmark": "fleet",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "devices": args.devices,
+            "duration_s": args.duration,
+            "interval_s": args.interval,
+            "jitter_s": args.jitter,
+            "keep_alive": args.keep_alive,
+            "outage_at_s": args.outage_at,
+            "outage_seconds": args.outage_seconds if outage else None,
+            "outage_fraction": args.outage_fraction if outage else None,
+            "seed": args.seed,
+        },
+        "overall": _phase_summary(recorder.latencies, recorder.statuses, elapsed),
+        "client_lag_p99_ms": summarize_latencies(recorder.client_lag)["p99_ms"],
+    }
+    if burst_window:
+        result["burst"] = _phase_summary(
+            recorder.burst_latencies, recorder.burst_statuses, burst_window[1] - burst_window[0]
+        )
+    return result
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list[str]:
+    """Regressions of `result` against `baseline` beyond `threshold` (fraction)."""
+    regressions = []
+    for phase in ("overall", "burst"):
+        new, old = result.get(phase), baseline.get(phase)
+        if not new or not old:
+            continue
+        if new["accepted_per_s"] < old["accepted_per_s"] * (1 - threshold):
+            regressions.append(f"{phase} accepted/s {old['accepted_per_s']} -> {new['accepted_per_s']}")
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if new["latency"][key] > old["latency"][key] * (1 + threshold):
+                regressions.append(f"{phase} {key} {old['latency'][key]} -> {new['latency'][key]}")
+        if new["error_rate"] > old["error_rate"] + threshold / 10:
+            regressions.append(f"{phase} error rate {old['error_rate']} -> {new['error_rate']}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run")
+    parser.add_argument("--interval", type=float, default=3.0, help="Firmware send interval")
+    parser.add_argument("--jitter", type=float, default=0.25, help="+- seconds added to each interval")
+    parser.add_argument("--uid-prefix", default="loadtest_")
+    parser.add_argument(
+        "--register", action="store_true", help="Register missing devices and rotate a key for each (needs --token)"
+    )
+    parser.add_argument("--token", help="Superuser access token for --register")
+    parser.add_argument("--outage-at", type=float, default=None, help="Start a connectivity outage after N seconds")
+    parser.add_argument("--outage-seconds", type=float, default=30.0)
+    parser.add_argument("--outage-fraction", type=float, default=1.0, help="Share of devices affected")
+    parser.add_argument("--keep-alive", action="store_true", help="Reuse connections (the firmware does not)")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results only")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression (fraction)")
+    args = parser.parse_args()
+    if args.register and not args.token:
+        parser.error("--register needs a superuser --token (device keys can only be issued by superusers)")
+
+    result = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        result["regressions"] = regressions
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for phase in ("overall", "burst"):
+            summary = result.get(phase)
+            if not summary:
+                continue
+            latency = summary["latency"]
+            print(
+                f"{phase:<8} {summary['requests_per_s']} req/s ({summary['accepted_per_s']} accepted/s) "
+                f"p50={latency['p50_ms']}ms p95={latency['p95_ms']}ms p99={latency['p99_ms']}ms "
+                f"errors={summary['error_rate']:.2%} {summary['statuses']}"
+            )
+        print(f"client lag p99={result['client_lag_p99_ms']}ms")
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
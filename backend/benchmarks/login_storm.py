@@ -0,0 +1,109 @@
+"""
+Ingest latency during a login storm.
+
+Runs a steady stream of /sensor/ingest requests against a live instance,
+first alone (baseline) and then while many clients hammer
+/auth/access-token, and reports ingest p50/p95/p99 for both phases.
+With argon2 running on the event loop the storm phase p99 jumps by
+tens of milliseconds per concurrent login; with the hash pool it should not.
+
+Requires a running backend with a registered device and an existing user.
+
+Usage (from the backend directory):
+    python -m benchmarks.login_storm --base-url http://localhost:8000 \\
+        --device-uid esp32_structsense_001 --email admin@structsense.com --password admin
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from benchmarks.common import summarize_latencies
+
+
+async def ingest_loop(client: httpx.AsyncClient, device_uid: str, rate: float, stop: asyncio.Event) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    interval = 1.0 / rate
+    while not stop.is_set():
+        payload = {
+            "device_uid": device_uid,
+            "tilt_x": random.randint(-200, 200),
+            "tilt_y": random.randint(-200, 200),
+            "tilt_z": random.randint(16000, 16500),
+            "distance_mm": round(random.uniform(480, 520), 2),
+        }
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/v1/sensor/ingest", json=payload)
+            if response.status_code != 201:
+                errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+    return latencies, errors
+
+
+async def login_loop(client: httpx.AsyncClient, email: str, password: str, stop: asyncio.Event) -> int:
+    logins = 0
+    while not stop.is_set():
+        try:
+            await client.post("/api/v1/auth/access-token", data={"username": email, "password": password})
+            logins += 1
+        except httpx.HTTPError:
+            pass
+    return logins
+
+
+async def run_phase(args: argparse.Namespace, storm: bool) -> dict:
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0) as client:
+        ingest = asyncio.create_task(ingest_loop(client, args.device_uid, args.ingest_rate, stop))
+        logins = [
+            asyncio.create_task(login_loop(client, args.email, args.password, stop))
+            for _ in range(args.login_concurrency if storm else 0)
+        ]
+        await asyncio.sleep(args.duration)
+        stop.set()
+        latencies, errors = await ingest
+        login_count = sum(await asyncio.gather(*logins))
+
+    return {
+        "phase": "login_storm" if storm else "baseline",
+        "ingest": {**summarize_latencies(latencies), "errors": errors},
+        "logins": login_count,
+        "logins_per_s": round(login_count / args.duration, 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--device-uid", required=True)
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per phase")
+    parser.add_argument("--ingest-rate", type=float, default=20.0, help="Ingest requests per second")
+    parser.add_argument("--login-concurrency", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results only")
+    args = parser.parse_args()
+
+    results = [await run_phase(args, storm=False), await run_phase(args, storm=True)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        ingest = result["ingest"]
+        print(
+            f"{result['phase']:<12} ingest p50={ingest['p50_ms']}ms p95={ingest['p95_ms']}ms "
+            f"p99={ingest['p99_ms']}ms errors={ingest['errors']}  logins/s={result['logins_per_s']}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
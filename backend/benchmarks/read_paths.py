@@ -0,0 +1,231 @@
+"""
+Read-path latency at a given data size, and scaling reports across sizes.
+
+Runs the dashboard and analytics reads against a live instance whose
+database was filled by benchmarks.seed: device list, dashboard load (device
+list plus the latest readings of many devices concurrently), /processed in
+both formats, CSV export, summaries over a raw-path (24h) and rollup-path
+(30d) range, a multi-device aligned series and streaming stats. Each case is
+run --requests times at --concurrency, and its latency percentiles are
+recorded together with the table size (pg_class estimate, read with
+DATABASE_URL when set, else --rows).
+
+--report takes result files from runs at different sizes and prints, per
+case, p50/p95 at each size and the growth exponent k of p95 ~ rows^k
+(log-log slope between the smallest and largest run). Reads served from
+indexes or the rollup should stay near 0; cases above --max-exponent are
+flagged and make the command exit with status 1, so a query that starts
+scanning history shows up before production-sized tables do.
+
+Exports, summaries and series count against ADMISSION_HEAVY_MAX_IN_FLIGHT;
+keep --concurrency below it (or raise it on the server) unless measuring
+load shedding. Shed requests are reported under "errors" by status code.
+
+Usage (from the backend directory, against a running instance):
+    python -m benchmarks.seed --devices 200 --days 30 --interval 300
+    python -m benchmarks.read_paths --output reads-1m.json
+    python -m benchmarks.seed --devices 200 --days 365 --interval 300 --uid-prefix seed2_
+    python -m benchmarks.read_paths --output reads-10m.json
+    python -m benchmarks.read_paths --report reads-1m.json reads-10m.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from benchmarks.common import summarize_latencies
+
+API = "/api/v1"
+
+
+async def _table_rows() -> int | None:
+    """Estimated processed_sensor_data rows (needs DATABASE_URL)."""
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        return None
+    import asyncpg
+    from benchmarks.seed import asyncpg_dsn
+
+    connection = await asyncpg.connect(asyncpg_dsn(url))
+    try:
+        rows = await connection.fetchval(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = 'processed_sensor_data'"
+        )
+    finally:
+        await connection.close()
+    return max(int(rows or 0), 0)
+
+
+def build_cases(device_ids: list[int], building: str | None, args: argparse.Namespace) -> dict:
+    """Case name -> callable(client, rng) issuing that case's request(s)."""
+    now = datetime.now(timezone.utc)
+
+    def iso(delta: timedelta) -> str:
+        return (now - delta).isoformat()
+
+    async def get(client: httpx.AsyncClient, path: str, params=None) -> None:
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+
+    def per_device(path: str, params=None):
+        return lambda client, rng: get(client, path.format(rng.choice(device_ids)), params)
+
+    async def dashboard(client: httpx.AsyncClient, rng: random.Random) -> None:
+        await get(client, f"{API}/devices")
+        shown = rng.sample(device_ids, min(args.dashboard_devices, len(device_ids)))
+        await asyncio.gather(*(
+            get(client, f"{API}/sensor/devices/{device_id}/processed", {"limit": 5}) for device_id in shown
+        ))
+
+    series_params = [("device_ids", device_id) for device_id in device_ids[:10]]
+    series_params += [("start", iso(timedelta(days=7))), ("end", now.isoformat()), ("bucket_seconds", 3600)]
+    cases = {
+        "devices_list": lambda client, rng: get(client, f"{API}/devices"),
+        "dashboard": dashboard,
+        "processed_json_100": per_device(API + "/sensor/devices/{}/processed", {"limit": 100}),
+        "processed_columnar_200": per_device(
+            API + "/sensor/devices/{}/processed", {"limit": 200, "format": "columnar"}
+        ),
+        "export_csv_1000": per_device(API + "/sensor/devices/{}/export", {"limit": 1000}),
+        f"export_csv_{args.export_limit}": per_device(
+            API + "/sensor/devices/{}/export", {"limit": args.export_limit}
+        ),
+        "summary_24h": per_device(API + "/sensor/devices/{}/summary", {"start": iso(timedelta(hours=24))}),
+        "summary_30d": per_device(API + "/sensor/devices/{}/summary", {"start": iso(timedelta(days=30))}),
+        "series_10_devices_7d": lambda client, rng: get(client, f"{API}/sensor/series", series_params),
+        "stats": per_device(API + "/sensor/devices/{}/stats"),
+    }
+    if building:
+        cases["series_building_24h"] = lambda client, rng: get(
+            client, f"{API}/sensor/series", {"building_name": building, "start": iso(timedelta(hours=24))}
+        )
+    return cases
+
+
+async def run_case(client: httpx.AsyncClient, case, requests: int, concurrency: int, rng: random.Random) -> dict:
+    latencies: list[float] = []
+    errors: Counter[str] = Counter()
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await case(client, rng)
+            except httpx.HTTPStatusError as exc:
+                errors[str(exc.response.status_code)] += 1
+                continue
+            except httpx.HTTPError as exc:
+                errors[type(exc).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize_latencies(latencies),
+        "errors": dict(errors),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    rows = await _table_rows() if args.rows is None else args.rows
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        response = await client.get(f"{API}/devices")
+        response.raise_for_status()
+        devices = [device for device in response.json() if device["device_uid"].startswith(args.uid_prefix)]
+        if not devices:
+            raise SystemExit(f"No devices with prefix {args.uid_prefix!r}; run benchmarks.seed first")
+        device_ids = [device["id"] for device in devices]
+        building = devices[0].get("building_name")
+        cases = build_cases(device_ids, building, args)
+        selected = args.cases.split(",") if args.cases else list(cases)
+
+        results = {}
+        for name in selected:
+            # Warm caches and pools so the first requests don't skew p95
+            await run_case(client, cases[name], args.concurrency, args.concurrency, rng)
+            results[name] = await run_case(client, cases[name], args.requests, args.concurrency, rng)
+            if not args.json:
+                print(f"{name:<24} {json.dumps(results[name])}")
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "rows": rows,
+        "devices": len(device_ids),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "cases": results,
+    }
+
+
+def report(runs: list[dict], max_exponent: float) -> list[str]:
+    """Print the scaling table; returns the cases growing faster than rows^max_exponent."""
+    runs = sorted(runs, key=lambda run: run["rows"] or 0)
+    smallest, largest = runs[0], runs[-1]
+    header = f"{'case':<24}" + "".join(f"{run['rows']:>16,}" for run in runs) + f"{'exponent':>10}"
+    print("p50 / p95 ms by processed_sensor_data rows")
+    print(header)
+    flagged = []
+    for name in smallest["cases"]:
+        cells = []
+        for run in runs:
+            case = run["cases"].get(name)
+            cells.append(f"{case['p50_ms']:>8.1f}/{case['p95_ms']:<7.1f}" if case else f"{'-':>16}")
+        exponent = None
+        first, last = smallest["cases"][name], largest["cases"].get(name)
+        if last and smallest["rows"] and largest["rows"] > smallest["rows"] and first["p95_ms"] > 0:
+            exponent = math.log(last["p95_ms"] / first["p95_ms"]) / math.log(largest["rows"] / smallest["rows"])
+        mark = ""
+        if exponent is not None and exponent > max_exponent:
+            flagged.append(name)
+            mark = "  <- grows with table size"
+        print(f"{name:<24}" + "".join(cells) + (f"{exponent:>10.2f}" if exponent is not None else f"{'-':>10}") + mark)
+    return flagged
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--uid-prefix", default="seed_", help="Benchmark the devices created by the seeder")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per case")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--dashboard-devices", type=int, default=20, help="Devices shown on the dashboard")
+    parser.add_argument("--export-limit", type=int, default=50000, help="Row limit of the large export case")
+    parser.add_argument("--cases", help="Comma-separated subset of cases")
+    parser.add_argument("--rows", type=int, default=None, help="Table size to record when DATABASE_URL is unset")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results only")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--report", nargs="+", metavar="RESULT", help="Print a scaling report of earlier runs")
+    parser.add_argument("--max-exponent", type=float, default=0.3, help="Flag cases with p95 ~ rows^k above this k")
+    args = parser.parse_args()
+
+    if args.report:
+        runs = []
+        for path in args.report:
+            with open(path) as f:
+                runs.append(json.load(f))
+        return 1 if report(runs, args.max_exponent) else 0
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
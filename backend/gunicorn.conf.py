@@ -0,0 +1,78 @@
+"""
+Production server: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The master applies Alembic migrations once (under an advisory lock), imports
+the app and forks WORKERS workers from it, so workers start without
+importing anything or touching the schema (DB_CREATE_ALL is off for them).
+
+Metrics: workers write their Prometheus values to PROMETHEUS_MULTIPROC_DIR
+(cleared here, before the app and prometheus_client are imported) and any
+worker's /metrics aggregates all of them. /metrics is only served with a
+METRICS_TOKEN.
+
+Graceful restarts: SIGHUP replaces the workers (each finishes its in-flight
+requests within GRACEFUL_TIMEOUT), SIGTERM drains and stops. Code changes
+need a new master (container restart), since the app is preloaded.
+"""
+import glob
+import os
+import tempfile
+
+# Workers never run create_all; the master migrates before forking
+os.environ["DB_CREATE_ALL"] = "false"
+os.environ["METRICS_REQUIRE_TOKEN"] = "true"
+
+# Shared metrics directory, cleared so counters of a previous run don't carry over
+_default_metrics_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(_default_metrics_dir, "structsense-metrics")
+)
+os.makedirs(metrics_dir, exist_ok=True)
+for _name in glob.glob(os.path.join(metrics_dir, "*.db")):
+    os.remove(_name)
+
+from prometheus_client import multiprocess
+
+from app.core.config import settings
+from app.core.migrations import migrate
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WORKERS") or os.cpu_count() or 1)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Seconds a worker may be unresponsive before it is replaced, and the time
+# given to in-flight requests (and the lifespan shutdown) on restart/stop
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Optional periodic worker recycling (0 disables), jittered so workers
+# don't restart together
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# Heartbeat files on tmpfs (a disk-backed /tmp can stall workers in containers)
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+# Restarts are driven by signals; no control socket file in the app directory (gunicorn >= 25)
+control_socket_disable = True
+
+accesslog = None
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    server.log.info("Applying database migrations")
+    migrate()
+    server.log.info("Database schema is up to date")
+    if not settings.METRICS_TOKEN:
+        server.log.warning("METRICS_TOKEN is not set; /metrics is disabled")
+
+
+def child_exit(server, worker):
+    # Live-worker gauges stop including the exited worker (its counters stay in the totals)
+    multiprocess.mark_process_dead(worker.pid)
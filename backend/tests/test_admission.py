@@ -0,0 +1,73 @@
+from contextlib import ExitStack
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.admission import AdmissionController, admission
+from app.core.config import settings
+
+
+def assert_shed(controller: AdmissionController, workload: str) -> None:
+    with pytest.raises(HTTPException) as shed:
+        with controller.admit(workload):
+            pass
+    assert shed.value.status_code == 503
+    base = settings.ADMISSION_RETRY_AFTER_SECONDS
+    assert base <= int(shed.value.headers["Retry-After"]) <= 2 * base
+
+
+def test_ingest_is_shed_beyond_its_in_flight_cap(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_INGEST_MAX_IN_FLIGHT", 2)
+    controller = AdmissionController()
+    with ExitStack() as slots:
+        for _ in range(2):
+            slots.enter_context(controller.admit("ingest"))
+        assert_shed(controller, "ingest")
+    assert controller.in_flight["ingest"] == 0
+    with controller.admit("ingest"):
+        assert controller.in_flight["ingest"] == 1
+
+
+def test_saturated_pool_only_queues_up_to_its_size(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_INGEST_SIZE", 2)
+    controller = AdmissionController()
+    controller.record_wait("ingest", 10 * settings.ADMISSION_MAX_POOL_WAIT_SECONDS)
+    with ExitStack() as slots:
+        # Still admitted while a pooled connection is free
+        for _ in range(2):
+            slots.enter_context(controller.admit("ingest"))
+        assert_shed(controller, "ingest")
+
+    # Waits stop signalling pressure once no request has waited lately
+    controller._sampled_at["ingest"] -= 60
+    assert not controller.ingest_saturated()
+
+
+def test_heavy_requests_are_shed_first(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_INGEST_SIZE", 1)
+    monkeypatch.setattr(settings, "ADMISSION_HEAVY_MAX_IN_FLIGHT", 1)
+    controller = AdmissionController()
+    with controller.admit("heavy"):
+        assert_shed(controller, "heavy")
+    with controller.admit("ingest"):
+        # Ingest uses every pooled connection: heavy work waits
+        assert_shed(controller, "heavy")
+    with controller.admit("heavy"):
+        pass
+
+
+def test_shed_requests_get_503_with_retry_after(client, make_device, monkeypatch):
+    device = make_device()
+    reading = {"device_uid": device["device_uid"], "tilt_x": 1.0, "tilt_y": 2.0, "tilt_z": 3.0, "distance_mm": 4.0}
+
+    monkeypatch.setattr(settings, "ADMISSION_INGEST_MAX_IN_FLIGHT", 0)
+    response = client.post("/api/v1/sensor/ingest", json=reading)
+    assert response.status_code == 503 and int(response.headers["Retry-After"]) >= 1
+
+    monkeypatch.setattr(settings, "ADMISSION_HEAVY_MAX_IN_FLIGHT", 0)
+    response = client.get(f"/api/v1/sensor/devices/{device['id']}/export")
+    assert response.status_code == 503 and "Retry-After" in response.headers
+    assert admission.in_flight == {"ingest": 0, "heavy": 0}
+
+    monkeypatch.undo()
+    assert client.post("/api/v1/sensor/ingest", json=reading).status_code == 201
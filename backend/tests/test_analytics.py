@@ -0,0 +1,240 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.query_stats import assert_max_queries
+
+HOUR = timedelta(hours=1)
+
+
+def upload(client, device_id: int, rows: list[dict]) -> None:
+    """Add readings with chosen timestamps (upload is the backdating path)."""
+    body = "\n".join(json.dumps({**row, "created_at": row["created_at"].isoformat()}) for row in rows)
+    response = client.post(
+        f"/api/v1/sensor/devices/{device_id}/upload",
+        files={"file": ("readings.ndjson", body.encode(), "application/x-ndjson")},
+    )
+    assert response.status_code == 201, response.text
+    assert response.json()["errors"] is None
+
+
+def readings(start: datetime, count: int, step: timedelta, status: str = "SAFE") -> list[dict]:
+    return [
+        {
+            "created_at": start + step * i,
+            "status": status,
+            "tilt_change_percent": 10.0 + i % 7,
+            "distance_change_percent": -1.5 * (i % 3),
+            "distance_diff_mm": 0.25 * i,
+        }
+        for i in range(count)
+    ]
+
+
+def test_summary_columnar(client, make_device):
+    device = make_device()
+    start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=2)
+    upload(client, device["id"], readings(start, 4, timedelta(minutes=10)) + readings(start + HOUR, 1, HOUR, "ALERT"))
+    url = f"/api/v1/sensor/devices/{device['id']}/summary"
+
+    summary = client.get(url, params={"start": start.isoformat(), "exact": True}).json()
+    columnar = client.get(url, params={"start": start.isoformat(), "exact": True, "format": "columnar"}).json()
+
+    assert columnar["format"] == "columnar"
+    assert columnar["reading_count"] == summary["count"] == 5
+    metrics = columnar["columns"]["metric"]
+    assert metrics == list(summary["metrics"])
+    for i, name in enumerate(metrics):
+        assert columnar["columns"]["mean"][i] == pytest.approx(summary["metrics"][name]["mean"])
+        assert columnar["columns"]["p95"][i] == pytest.approx(summary["metrics"][name]["percentiles"]["p95"])
+    codes = columnar["status_codes"]
+    assert columnar["status_counts"][codes.index("ALERT")] == 1
+    assert codes[columnar["current_status"]] == summary["current_status"]
+
+
+def test_series_columnar(client, make_device):
+    first, second = make_device(), make_device()
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    upload(client, first["id"], readings(start, 6, timedelta(minutes=10)))
+    upload(client, second["id"], readings(start + HOUR, 3, timedelta(minutes=10)))
+    params = {
+        "device_ids": [first["id"], second["id"]],
+        "start": start.isoformat(),
+        "end": (start + 2 * HOUR).isoformat(),
+        "bucket_seconds": 3600,
+    }
+
+    series = client.get("/api/v1/sensor/series", params=params).json()
+    columnar = client.get("/api/v1/sensor/series", params={**params, "format": "columnar"}).json()
+
+    assert columnar["count"] == len(series["buckets"]) == 2
+    assert columnar["time_base"] == round(start.timestamp() * 1000)
+    assert columnar["columns"]["bucket"] == [0, 3_600_000]
+    assert columnar["devices"]["id"] == [first["id"], second["id"]]
+    assert columnar["columns"]["counts"] == series["counts"] == [[6, 0], [0, 3]]
+    assert columnar["columns"]["tilt_change_percent"] == series["values"]["tilt_change_percent"]
+
+
+def refresh_rollups(run) -> int:
+    from app.core.db import BulkSessionLocal
+    from app.services.analytics_service import AnalyticsService
+
+    async def refresh():
+        async with BulkSessionLocal() as db:
+            return await AnalyticsService.refresh_rollups(db)
+    return run(refresh)
+
+
+def assert_rollup_matches_raw(client, device_id: int) -> None:
+    url = f"/api/v1/sensor/devices/{device_id}/summary"
+    rolled = client.get(url).json()
+    exact = client.get(url, params={"exact": True}).json()
+    assert rolled["source"] == "rollup" and exact["source"] == "raw"
+    assert rolled["count"] == exact["count"]
+    assert rolled["status_counts"] == exact["status_counts"]
+    for name, expected in exact["metrics"].items():
+        for key in ("min", "max", "mean", "stddev"):
+            assert rolled["metrics"][name][key] == pytest.approx(expected[key], rel=1e-6), (name, key)
+
+
+def test_rollup_summary_is_exact(client, run, make_device):
+    device = make_device()
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    rows = readings(start, 60, timedelta(minutes=7))
+    for i, row in enumerate(rows):
+        # Large offset, small spread: sum(x*x) - sum(x)^2/n would cancel to noise
+        row["distance_diff_mm"] = 1e9 + 0.25 * (i % 4)
+    upload(client, device["id"], rows)
+    assert refresh_rollups(run) > 0
+    assert_rollup_matches_raw(client, device["id"])
+
+    # New readings in rolled-up hours are read raw until the next refresh
+    upload(client, device["id"], readings(start + timedelta(minutes=3), 5, HOUR, "WARNING"))
+    assert_rollup_matches_raw(client, device["id"])
+    refresh_rollups(run)
+    assert_rollup_matches_raw(client, device["id"])
+    assert refresh_rollups(run) == 0
+
+
+def test_rollup_includes_late_commits(client, run, make_device):
+    from app.core.db import BulkSessionLocal
+    from app.models.processed_sensor_data import ProcessedSensorData
+    from app.models.raw_sensor_data import RawSensorData
+    from app.services.analytics_service import AnalyticsService
+
+    device = make_device()
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    sessions = []
+
+    async def begin_slow_ingest():
+        # Takes a lower id than the upload below, but commits after the refresh
+        db = BulkSessionLocal()
+        sessions.append(db)
+        raw = RawSensorData(device_id=device["id"], tilt_x=0.0, tilt_y=0.0, tilt_z=0.0, distance_mm=0.0, created_at=start)
+        db.add(raw)
+        await db.flush()
+        db.add(ProcessedSensorData(
+            device_id=device["id"], raw_data_id=raw.id, created_at=start, status="ALERT",
+            tilt_diff_x=0.0, tilt_diff_y=0.0, tilt_diff_z=0.0, distance_diff_mm=7.0,
+            tilt_change_percent=50.0, distance_change_percent=5.0,
+        ))
+        await AnalyticsService.mark_rollup_dirty(db, device["id"], (start,))
+        await db.flush()
+
+    async def commit_slow_ingest():
+        await sessions[0].commit()
+        await sessions[0].close()
+
+    run(begin_slow_ingest)
+    upload(client, device["id"], readings(start + 2 * HOUR, 4, timedelta(minutes=10)))
+    refresh_rollups(run)
+    run(commit_slow_ingest)
+
+    assert_rollup_matches_raw(client, device["id"])
+    refresh_rollups(run)
+    assert_rollup_matches_raw(client, device["id"])
+    summary = client.get(f"/api/v1/sensor/devices/{device['id']}/summary").json()
+    assert summary["count"] == 5 and summary["status_counts"]["ALERT"] == 1
+
+
+def test_upload_between_stored_readings_rebuilds_transitions(client, make_device):
+    device = make_device()
+    start = datetime(2025, 3, 1, 10, tzinfo=timezone.utc)
+    upload(client, device["id"], readings(start, 1, HOUR) + readings(start + 2 * HOUR, 1, HOUR))
+    upload(client, device["id"], readings(start + HOUR, 1, HOUR, "ALERT"))
+
+    history = client.get(f"/api/v1/sensor/devices/{device['id']}/status-history").json()
+
+    transitions = [(event["previous_status"], event["status"]) for event in history["events"]]
+    assert transitions == [(None, "SAFE"), ("SAFE", "ALERT"), ("ALERT", "SAFE")]
+    assert history["current_status"] == "SAFE"
+    assert history["durations_seconds"]["ALERT"] == 3600
+
+
+def test_summary_and_history_query_counts(client, run, make_device):
+    device = make_device()
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    upload(client, device["id"], readings(start, 40, timedelta(minutes=30)) + readings(start + 21 * HOUR, 3, HOUR, "ALERT"))
+    refresh_rollups(run)
+    url = f"/api/v1/sensor/devices/{device['id']}"
+
+    # Rolled-up hours, the readings after them and the status events: no
+    # per-hour or per-metric queries
+    with assert_max_queries(3):
+        assert client.get(f"{url}/summary").json()["source"] == "rollup"
+    with assert_max_queries(3):
+        assert client.get(f"{url}/summary", params={"exact": True}).json()["source"] == "raw"
+    with assert_max_queries(1):
+        assert client.get(f"{url}/status-history").status_code == 200
+
+
+def test_marks_are_not_rewritten_by_each_reading(client, make_device):
+    from conftest import run_sql
+
+    device = make_device()
+    mark = f"SELECT xmin::text, claimed_until FROM rollup_dirty_hours WHERE device_id = {device['id']}"
+    body = {"device_uid": device["device_uid"], "tilt_x": 1.0, "tilt_y": 2.0, "tilt_z": 3.0, "distance_mm": 4.0}
+    assert client.post("/api/v1/sensor/ingest", json=body).status_code == 201
+    [(version, _)] = run_sql(mark)
+
+    assert client.post("/api/v1/sensor/ingest", json={**body, "tilt_x": 500.0}).status_code == 201
+    assert run_sql(mark) == [(version, None)]
+
+    # Claimed by a refresh still running: marking again resets the claim once
+    run_sql(f"UPDATE rollup_dirty_hours SET claimed_until = now() + interval '1 hour' WHERE device_id = {device['id']}")
+    assert client.post("/api/v1/sensor/ingest", json={**body, "tilt_x": 900.0}).status_code == 201
+    [(_, claimed_until)] = run_sql(mark)
+    assert claimed_until is None
+
+
+def test_refresh_skips_marks_of_uncommitted_writers(client, run, make_device):
+    import asyncio
+
+    from app.core.db import BulkSessionLocal
+    from app.services.analytics_service import AnalyticsService
+
+    device = make_device()
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    upload(client, device["id"], readings(start, 4, timedelta(minutes=10)))
+    sessions = []
+
+    async def begin_writer():
+        # Marks the (already marked) hour and keeps its transaction open
+        db = BulkSessionLocal()
+        sessions.append(db)
+        await AnalyticsService.mark_rollup_dirty(db, device["id"], (start,))
+
+    async def refresh_without_waiting():
+        async with BulkSessionLocal() as db:
+            return await asyncio.wait_for(AnalyticsService.refresh_rollups(db), timeout=5)
+
+    async def commit_writer():
+        await sessions[0].commit()
+        await sessions[0].close()
+
+    run(begin_writer)
+    assert run(refresh_without_waiting) == 0
+    run(commit_writer)
+    assert refresh_rollups(run) == 1
+    assert_rollup_matches_raw(client, device["id"])
@@ -0,0 +1,94 @@
+from app.api.conditional import etag_matches, make_etag
+from app.core.query_stats import assert_max_queries
+from app.core.serialization import to_columnar
+
+
+class _Request:
+    def __init__(self, if_none_match: str | None):
+        self.headers = {"if-none-match": if_none_match} if if_none_match else {}
+
+
+def test_etag_weak_comparison():
+    etag = make_etag("processed", 1, 42)
+    assert etag.startswith('W/"')
+    assert etag_matches(_Request(etag), etag)
+    assert etag_matches(_Request(etag.removeprefix("W/")), etag)
+    assert etag_matches(_Request(f'"other", {etag}'), etag)
+    assert etag_matches(_Request("*"), etag)
+    assert not etag_matches(_Request('W/"other"'), etag)
+    assert not etag_matches(_Request(None), etag)
+    assert make_etag("processed", 1, 43) != etag
+
+
+def test_columnar_time_deltas_and_status_codes():
+    from datetime import datetime, timedelta, timezone
+
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = [
+        {"id": 1, "created_at": start, "status": "SAFE"},
+        {"id": 2, "created_at": start + timedelta(seconds=3), "status": "CUSTOM"},
+    ]
+    content = to_columnar(rows)
+    assert content["columns"]["created_at"] == [0, 3000]
+    assert content["time_base"] == round(start.timestamp() * 1000)
+    assert content["status_codes"][content["columns"]["status"][1]] == "CUSTOM"
+    assert content["columns"]["status"][0] == 0
+
+
+def _ingest(client, device_uid: str, **values):
+    reading = {"device_uid": device_uid, "tilt_x": 100, "tilt_y": 200, "tilt_z": 16000, "distance_mm": 500, **values}
+    response = client.post("/api/v1/sensor/ingest", json=reading)
+    assert response.status_code == 201, response.text
+
+
+def test_device_list_not_modified_until_changed(client, make_device):
+    device = make_device()
+    response = client.get("/api/v1/devices")
+    etag = response.headers["etag"]
+
+    # The version query only: the list is neither loaded nor serialized
+    with assert_max_queries(1):
+        response = client.get("/api/v1/devices", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert not response.content
+
+    client.patch(f"/api/v1/devices/{device['id']}", json={"name": "Renamed"})
+    response = client.get("/api/v1/devices", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_device_list_query_count_does_not_grow_with_devices(client, make_device):
+    for _ in range(20):
+        make_device()
+    with assert_max_queries(2):
+        response = client.get("/api/v1/devices")
+    assert len(response.json()) == 20
+
+
+def test_processed_not_modified_carries_vary(client, make_device):
+    device = make_device()
+    _ingest(client, device["device_uid"])
+    url = f"/api/v1/sensor/devices/{device['id']}/processed"
+
+    response = client.get(url)
+    assert response.headers["vary"] == "Accept"
+    etag = response.headers["etag"]
+
+    with assert_max_queries(1):
+        response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["vary"] == "Accept"
+
+    # Each representation has its own validator
+    columnar = client.get(url, params={"format": "columnar"}).headers["etag"]
+    msgpack = client.get(url, headers={"Accept": "application/msgpack"}).headers["etag"]
+    assert len({etag, columnar, msgpack}) == 3
+    response = client.get(url, headers={"If-None-Match": etag, "Accept": "application/msgpack"})
+    assert response.status_code == 200
+
+    _ingest(client, device["device_uid"], tilt_x=150)
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
@@ -0,0 +1,122 @@
+import pytest
+from sqlalchemy import text
+from starlette.requests import Request
+
+from app.core import db as core_db
+from app.core.config import settings
+from conftest import TEST_DATABASE_URL
+
+
+def request(**headers: str) -> Request:
+    return Request({"type": "http", "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()]})
+
+
+async def read_only(dependency, req: Request) -> str:
+    """transaction_read_only of the session the dependency yields ("on": replica)."""
+    sessions = dependency(req)
+    session = await sessions.__anext__()
+    try:
+        return await session.scalar(text("SHOW transaction_read_only"))
+    finally:
+        await sessions.aclose()
+
+
+@pytest.fixture
+def replica(client, run, monkeypatch):
+    """The test database standing in as a read replica of the interactive pool."""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    engine = core_db._create_engine(
+        TEST_DATABASE_URL,
+        "interactive",
+        "interactive_replica",
+        connect_args={"server_settings": {"default_transaction_read_only": "on"}},
+    )
+    monkeypatch.setitem(core_db.read_engines, "interactive", engine)
+    monkeypatch.setitem(
+        core_db.read_session_factories, "interactive",
+        async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession),
+    )
+    monitor = core_db.ReplicaMonitor()
+    monkeypatch.setattr(core_db, "replica_monitor", monitor)
+    yield monitor
+    run(engine.dispose)
+
+
+def test_read_only_sessions_use_a_fresh_replica(run, replica, monkeypatch):
+    read = core_db.session_dependency("interactive", read_only=True)
+    write = core_db.session_dependency("interactive")
+
+    # Not checked yet: the primary serves reads
+    assert run(read_only, read, request()) == "off"
+
+    assert run(replica.check) == 0
+    assert run(read_only, read, request()) == "on"
+    assert run(read_only, write, request()) == "off"
+    # Read-your-writes clients opt out
+    assert run(read_only, read, request(**{"X-Read-Consistency": "strong"})) == "off"
+
+    # Lagging beyond the limit: back to the primary
+    monkeypatch.setattr(settings, "READ_REPLICA_MAX_LAG_SECONDS", -1.0)
+    assert run(read_only, read, request()) == "off"
+
+
+def test_unreachable_replica_falls_back_to_primary(run, replica, monkeypatch):
+    read = core_db.session_dependency("interactive", read_only=True)
+    assert run(replica.check) == 0
+
+    # Nothing listens on port 1
+    unreachable = core_db._create_engine("postgresql+asyncpg://postgres@127.0.0.1:1/replica", "interactive", "interactive_replica")
+    monkeypatch.setitem(core_db.read_engines, "interactive", unreachable)
+    assert run(replica.check) is None
+    assert not replica.usable
+    assert run(read_only, read, request()) == "off"
+    run(unreachable.dispose)
+
+
+def checkouts(pool: str) -> float:
+    from prometheus_client import REGISTRY
+
+    return REGISTRY.get_sample_value("db_pool_checkouts_total", {"pool": pool}) or 0.0
+
+
+def test_endpoints_use_their_workload_pool(client, make_device):
+    device = make_device()
+    reading = {"device_uid": device["device_uid"], "tilt_x": 1.0, "tilt_y": 2.0, "tilt_z": 3.0, "distance_mm": 4.0}
+    requests = {
+        "ingest": lambda: client.post("/api/v1/sensor/ingest", json=reading),
+        "interactive": lambda: client.get("/api/v1/devices"),
+        "bulk": lambda: client.get(f"/api/v1/sensor/devices/{device['id']}/export", params={"format": "ndjson"}),
+    }
+    for pool, send in requests.items():
+        before = {name: checkouts(name) for name in core_db.POOLS}
+        assert send().status_code in (200, 201), pool
+        assert checkouts(pool) > before[pool], pool
+        # (background jobs may use the bulk pool at any time)
+        for other in ("ingest", "interactive"):
+            if other != pool:
+                assert checkouts(other) == before[other], (pool, other)
+
+
+def test_ingest_is_served_while_the_bulk_pool_is_exhausted(client, run, make_device):
+    device = make_device()
+    reading = {"device_uid": device["device_uid"], "tilt_x": 1.0, "tilt_y": 2.0, "tilt_z": 3.0, "distance_mm": 4.0}
+    held = []
+
+    async def exhaust_bulk_pool():
+        for _ in range(settings.DB_POOL_BULK_SIZE + settings.DB_POOL_BULK_OVERFLOW):
+            session = core_db.BulkSessionLocal()
+            await session.connection()
+            held.append(session)
+        return core_db.engines["bulk"].pool.checkedout()
+
+    async def release():
+        for session in held:
+            await session.close()
+
+    try:
+        assert run(exhaust_bulk_pool) == settings.DB_POOL_BULK_SIZE + settings.DB_POOL_BULK_OVERFLOW
+        assert client.post("/api/v1/sensor/ingest", json=reading).status_code == 201
+        assert client.get("/api/v1/devices").status_code == 200
+    finally:
+        run(release)
@@ -0,0 +1,154 @@
+from app.core.query_stats import assert_max_queries
+from app.services.deadband import deadband_compressor
+from app.services.ingest_dedup import ingest_dedup
+from app.services.status_tracker import status_tracker
+from conftest import run_sql
+
+
+def ingest(client, device: dict, headers: dict | None = None, **values):
+    body = {"device_uid": device["device_uid"], "tilt_x": 100.0, "tilt_y": 200.0, "tilt_z": 300.0, "distance_mm": 50.0, **values}
+    return client.post("/api/v1/sensor/ingest", json=body, headers=headers)
+
+
+def stored_count(device: dict) -> int:
+    [(count,)] = run_sql(f"SELECT count(*) FROM processed_sensor_data WHERE device_id = {device['id']}")
+    return count
+
+
+def test_retry_with_idempotency_key_is_stored_once(client, make_device):
+    device = make_device()
+    headers = {"Idempotency-Key": "boot1-1"}
+    first = ingest(client, device, headers)
+    assert first.status_code == 201
+
+    retry = ingest(client, device, headers)
+    assert retry.status_code == 200 and retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"]
+
+    # Another worker (or an expired window) falls back to the unique constraint
+    ingest_dedup.forget(device["device_uid"])
+    retry = ingest(client, device, headers)
+    assert retry.status_code == 200 and retry.json()["id"] == first.json()["id"]
+    assert stored_count(device) == 1
+
+
+def test_bare_seq_is_only_deduplicated_within_the_window(client, make_device, monkeypatch):
+    device = make_device()
+    assert ingest(client, device, seq=1).status_code == 201
+    assert ingest(client, device, seq=1).status_code == 200
+
+    # After a reboot the counter starts again: once the window expires, seq 1 is a new reading
+    monkeypatch.setattr(ingest_dedup, "ttl", 0.0)
+    assert ingest(client, device, seq=1).status_code == 201
+    assert stored_count(device) == 2
+
+
+def test_seq_is_scoped_by_boot_id(client, make_device):
+    device = make_device()
+    assert ingest(client, device, seq=1, boot_id="a").status_code == 201
+    assert ingest(client, device, seq=1, boot_id="b").status_code == 201
+    ingest_dedup.forget(device["device_uid"])
+    assert ingest(client, device, seq=1, boot_id="a").status_code == 200
+    assert stored_count(device) == 2
+
+
+def test_batch_size_is_bounded(client, make_device):
+    from app.schemas.sensor import MAX_BATCH_READINGS
+
+    device = make_device()
+    reading = {"tilt_x": 1.0, "tilt_y": 2.0, "tilt_z": 3.0, "distance_mm": 4.0}
+    body = {"device_uid": device["device_uid"], "readings": [reading] * (MAX_BATCH_READINGS + 1)}
+    assert client.post("/api/v1/sensor/ingest/batch", json=body).status_code == 422
+
+
+def test_ingest_query_count_does_not_grow_with_history(client, make_device):
+    device = make_device()
+    for i in range(20):
+        assert ingest(client, device, tilt_x=100.0 + i).status_code == 201
+
+    # Device lookup, raw and processed rows, refresh, rollup mark, status
+    # event and last-seen update; the previous status comes from memory
+    with assert_max_queries(7):
+        assert ingest(client, device, tilt_x=500.0).status_code == 201
+
+
+def test_previous_status_is_reloaded_after_another_worker_stores(client, make_device):
+    device = make_device()
+    assert ingest(client, device).status_code == 201
+
+    # Another worker (empty status cache) stores an ALERT meanwhile
+    cached = status_tracker._latest.pop(device["id"])
+    assert ingest(client, device, tilt_x=5000.0).json()["status"] == "ALERT"
+    status_tracker._latest[device["id"]] = cached
+
+    # Our cached SAFE is stale: the transition back is ALERT -> SAFE, not missed
+    assert ingest(client, device).json()["status"] == "SAFE"
+    history = client.get(f"/api/v1/sensor/devices/{device['id']}/status-history").json()
+    transitions = [(event["previous_status"], event["status"]) for event in history["events"]]
+    assert transitions == [(None, "SAFE"), ("SAFE", "ALERT"), ("ALERT", "SAFE")]
+
+
+def test_deadband_reference_is_dropped_after_another_worker_stores(client, make_device):
+    device = make_device(compression_enabled=True)
+    assert ingest(client, device).status_code == 201
+    assert ingest(client, device).status_code == 202
+
+    # Another worker (empty deadband state) stores a reading meanwhile
+    reference = deadband_compressor._states.pop(device["id"])
+    assert ingest(client, device, tilt_x=100.5).status_code == 201
+    deadband_compressor._states[device["id"]] = reference
+
+    # Our reference is no longer the latest stored reading: store, carrying our held reading
+    response = ingest(client, device)
+    assert response.status_code == 201
+    assert response.json()["held_count"] == 1
+    assert ingest(client, device).status_code == 202
+
+
+def test_held_reading_only_looks_up_the_device(client, make_device):
+    device = make_device(compression_enabled=True)
+    assert ingest(client, device).status_code == 201
+
+    # Baseline, previous status and deadband reference all come from memory
+    with assert_max_queries(1):
+        assert ingest(client, device).status_code == 202
+
+
+def test_baseline_reloads_after_reset_elsewhere(client, make_device):
+    device = make_device()
+    ingest(client, device)
+    assert ingest(client, device, distance_mm=60.0).json()["distance_change_percent"] != 0
+
+    # Reset by another worker: data gone, generation bumped, our cache untouched
+    run_sql(
+        f"DELETE FROM status_events WHERE device_id = {device['id']}",
+        f"DELETE FROM processed_sensor_data WHERE device_id = {device['id']}",
+        f"DELETE FROM raw_sensor_data WHERE device_id = {device['id']}",
+        f"UPDATE devices SET generation = generation + 1 WHERE id = {device['id']}",
+    )
+
+    first = ingest(client, device, distance_mm=60.0).json()
+    assert first["distance_change_percent"] == 0
+    assert first["status"] == "SAFE"
+
+
+def test_unauthenticated_requests_do_not_spend_device_tokens(client, make_device, auth_headers):
+    device = make_device(ingest_rate_limit=0.001, ingest_burst=2)
+    response = client.post(f"/api/v1/devices/{device['id']}/ingest-key", headers=auth_headers(superuser=True))
+    key = response.json()["ingest_key"]
+
+    for _ in range(5):
+        assert ingest(client, device, {"X-Device-Key": "forged"}).status_code == 401
+    assert ingest(client, device, {"X-Device-Key": key}).status_code == 201
+    assert ingest(client, device, {"X-Device-Key": key}).status_code == 201
+    throttled = ingest(client, device, {"X-Device-Key": key})
+    assert throttled.status_code == 429 and int(throttled.headers["Retry-After"]) > 1
+
+
+def test_batch_is_charged_per_reading(client, make_device):
+    device = make_device(ingest_rate_limit=0.001, ingest_burst=3)
+    reading = {"tilt_x": 1.0, "tilt_y": 2.0, "tilt_z": 3.0, "distance_mm": 4.0}
+    batch = {"device_uid": device["device_uid"], "readings": [reading] * 3}
+
+    assert client.post("/api/v1/sensor/ingest/batch", json=batch).status_code == 200
+    assert ingest(client, device).status_code == 429
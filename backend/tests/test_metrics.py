@@ -0,0 +1,41 @@
+from app.core.config import settings
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert "http_request_duration_seconds_bucket" in response.text
+
+
+def test_metrics_not_served_without_required_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    monkeypatch.setattr(settings, "METRICS_REQUIRE_TOKEN", True)
+    assert client.get("/metrics").status_code == 404
+
+
+def test_ingest_metrics_have_no_device_labels(client, make_device):
+    device = make_device()
+    body = {"device_uid": device["device_uid"], "tilt_x": 1.0, "tilt_y": 2.0, "tilt_z": 3.0, "distance_mm": 4.0}
+    assert client.post("/api/v1/sensor/ingest", json=body).status_code == 201
+
+    text = client.get("/metrics").text
+    assert 'ingest_readings_total{outcome="stored"}' in text
+    assert device["device_uid"] not in text
+
+
+def test_pool_sizes_are_reported_at_worker_startup(client):
+    from prometheus_client import REGISTRY
+
+    from app.core.db import report_pool_sizes
+    from app.core.metrics import DB_POOL_SIZE
+
+    # Reported by the lifespan, which runs in every worker
+    assert REGISTRY.get_sample_value("db_pool_size", {"pool": "ingest"}) == settings.DB_POOL_INGEST_SIZE
+
+    DB_POOL_SIZE.clear()
+    report_pool_sizes()
+    for pool in ("interactive", "ingest", "bulk"):
+        expected = getattr(settings, f"DB_POOL_{pool.upper()}_SIZE")
+        assert REGISTRY.get_sample_value("db_pool_size", {"pool": pool}) == expected
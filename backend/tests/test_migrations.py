@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import pool, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.core.db import Base
+from app.core.migrations import ALEMBIC_INI, BASELINE_REVISION, migrate
+from conftest import TEST_DATABASE_URL, run_sql
+
+
+def _autocommit(url: str, *statements: str) -> None:
+    async def execute():
+        engine = create_async_engine(url, poolclass=pool.NullPool, isolation_level="AUTOCOMMIT")
+        try:
+            async with engine.connect() as conn:
+                for statement in statements:
+                    await conn.execute(text(statement))
+        finally:
+            await engine.dispose()
+    asyncio.run(execute())
+
+
+@pytest.fixture
+def scratch_url(monkeypatch):
+    """An empty database next to the test database; the app's migrations target it."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    url = make_url(TEST_DATABASE_URL)
+    name = f"{url.database}_migrations"
+    _autocommit(TEST_DATABASE_URL, f"DROP DATABASE IF EXISTS {name}", f"CREATE DATABASE {name}")
+    scratch = url.set(database=name).render_as_string(hide_password=False)
+    monkeypatch.setattr(settings, "DATABASE_URL", scratch)
+    yield scratch
+    _autocommit(TEST_DATABASE_URL, f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_current_head()
+
+
+def schema_differences(url: str) -> list:
+    async def compare():
+        engine = create_async_engine(url, poolclass=pool.NullPool)
+        try:
+            async with engine.connect() as conn:
+                return await conn.run_sync(lambda sync: compare_metadata(MigrationContext.configure(sync), Base.metadata))
+        finally:
+            await engine.dispose()
+    return asyncio.run(compare())
+
+
+def test_fresh_database_migrates_to_the_models(scratch_url):
+    migrate()
+    assert run_sql("SELECT version_num FROM alembic_version", url=scratch_url) == [(head_revision(),)]
+    assert schema_differences(scratch_url) == []
+
+
+def test_create_all_database_is_adopted_and_upgraded(scratch_url):
+    # A database built by create_all before migrations existed: the baseline tables, no alembic_version
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, BASELINE_REVISION)
+    run_sql(
+        "DROP TABLE alembic_version",
+        "INSERT INTO devices (id, device_uid, name, type, tilt_warning_threshold, tilt_alert_threshold,"
+        " distance_warning_threshold, distance_alert_threshold, installed_at, connection_status, created_at)"
+        " VALUES (1, 'legacy', 'Legacy', 'tilt', 30, 50, 5, 10, now(), true, now())",
+        "INSERT INTO raw_sensor_data (id, device_id, tilt_x, tilt_y, tilt_z, distance_mm, created_at) VALUES"
+        " (1, 1, 0, 0, 16384, 100, '2025-01-01 10:00+00'), (2, 1, 0, 0, 16384, 100, '2025-01-01 10:10+00'),"
+        " (3, 1, 0, 0, 16384, 100, '2025-01-01 11:00+00')",
+        "INSERT INTO processed_sensor_data (device_id, raw_data_id, tilt_diff_x, tilt_diff_y, tilt_diff_z,"
+        " distance_diff_mm, tilt_change_percent, distance_change_percent, status, created_at) VALUES"
+        " (1, 1, 0, 0, 0, 0, 0, 0, 'SAFE', '2025-01-01 10:00+00'),"
+        " (1, 2, 0, 0, 0, 0, 0, 0, 'SAFE', '2025-01-01 10:10+00'),"
+        " (1, 3, 0, 0, 0, 9, 0, 9, 'ALERT', '2025-01-01 11:00+00')",
+        url=scratch_url,
+    )
+
+    migrate()
+    migrate()  # Already at head: nothing to do
+
+    assert run_sql("SELECT version_num FROM alembic_version", url=scratch_url) == [(head_revision(),)]
+    assert schema_differences(scratch_url) == []
+    device = run_sql("SELECT generation, compression_enabled, ingest_key_hash FROM devices", url=scratch_url)
+    assert device == [(0, False, None)]
+    events = run_sql("SELECT previous_status, status FROM status_events ORDER BY created_at", url=scratch_url)
+    assert [tuple(event) for event in events] == [(None, "SAFE"), ("SAFE", "ALERT")]
+    [(dirty_hours,)] = run_sql("SELECT count(*) FROM rollup_dirty_hours", url=scratch_url)
+    assert dirty_hours == 2
+
+
+def test_create_all_database_from_current_models_is_stamped_head(scratch_url):
+    async def create_all():
+        engine = create_async_engine(scratch_url, poolclass=pool.NullPool)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        finally:
+            await engine.dispose()
+    asyncio.run(create_all())
+
+    migrate()
+
+    assert run_sql("SELECT version_num FROM alembic_version", url=scratch_url) == [(head_revision(),)]
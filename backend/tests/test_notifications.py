@@ -0,0 +1,80 @@
+import pytest
+
+from app.services.notification_service import NotificationService
+from conftest import run_sql
+
+
+def dispatch(run) -> int:
+    from app.core.db import BulkSessionLocal
+
+    async def dispatch_once():
+        async with BulkSessionLocal() as db:
+            return await NotificationService.dispatch_pending(db)
+    return run(dispatch_once)
+
+
+def outbox(device_id: int) -> list:
+    return run_sql(
+        "SELECT previous_status, status, state, attempts, next_attempt_at > now() AS backing_off "
+        f"FROM notification_outbox WHERE device_id = {device_id} ORDER BY id"
+    )
+
+
+@pytest.fixture
+def alerting_device(client, make_device):
+    """A device with a notification email that just went SAFE -> ALERT."""
+    device = make_device(notification_email="ops@test.local")
+    for tilt_x in (100.0, 100.0, 200.0):
+        body = {"device_uid": device["device_uid"], "tilt_x": tilt_x, "tilt_y": 200.0, "tilt_z": 300.0, "distance_mm": 50.0}
+        assert client.post("/api/v1/sensor/ingest", json=body).status_code == 201
+    return device
+
+
+def test_transition_is_enqueued_once(alerting_device):
+    # The previous status is looked up before the new reading is flushed,
+    # so the first transition is not mistaken for ALERT -> ALERT
+    [(previous, current, state, attempts, _)] = outbox(alerting_device["id"])
+    assert (previous, current, state, attempts) == ("SAFE", "ALERT", "PENDING", 0)
+
+
+def test_send_happens_after_the_claim_is_committed(run, monkeypatch, alerting_device):
+    seen = []
+
+    def send(message):
+        # Another connection sees the claim: no transaction (or row lock) is open during SMTP
+        seen.append(outbox(alerting_device["id"])[0].state)
+    monkeypatch.setattr(NotificationService, "send_email", staticmethod(send))
+
+    assert dispatch(run) == 1
+    assert seen == ["SENDING"]
+    assert outbox(alerting_device["id"])[0].state == "SENT"
+
+
+def test_failed_sends_back_off_then_give_up(run, monkeypatch, alerting_device):
+    from app.core.config import settings
+
+    def send(message):
+        raise OSError("connection refused")
+    monkeypatch.setattr(NotificationService, "send_email", staticmethod(send))
+    monkeypatch.setattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 2)
+
+    assert dispatch(run) == 0
+    [row] = outbox(alerting_device["id"])
+    assert (row.state, row.attempts, row.backing_off) == ("PENDING", 1, True)
+
+    # Not retried before the backoff ends
+    dispatch(run)
+    assert outbox(alerting_device["id"])[0].attempts == 1
+
+    run_sql(f"UPDATE notification_outbox SET next_attempt_at = now() WHERE device_id = {alerting_device['id']}")
+    dispatch(run)
+    [row] = outbox(alerting_device["id"])
+    assert (row.state, row.attempts) == ("FAILED", 2)
+
+
+def test_retry_delay_grows_exponentially_up_to_the_cap():
+    from app.core.config import settings
+
+    delays = [NotificationService.retry_delay(attempts).total_seconds() for attempts in range(1, 20)]
+    assert delays[:3] == [settings.NOTIFICATION_RETRY_BASE_SECONDS * factor for factor in (1, 2, 4)]
+    assert max(delays) == settings.NOTIFICATION_RETRY_MAX_SECONDS
@@ -0,0 +1,110 @@
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.online_stats import METRICS, OnlineStats, _DeviceStats
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def sample(count: int, seed: int = 1) -> list[tuple[SimpleNamespace, datetime]]:
+    """Readings a minute apart, shuffled a little (out-of-order arrivals)."""
+    rng = random.Random(seed)
+    rows = [
+        (SimpleNamespace(**{name: 1000.0 + rng.gauss(0, 0.5) + i * 0.01 for name in METRICS}), START + timedelta(minutes=i))
+        for i in range(count)
+    ]
+    for i in range(0, count - 1, 5):
+        rows[i], rows[i + 1] = rows[i + 1], rows[i]
+    return rows
+
+
+def assert_same(summary: dict, expected: dict) -> None:
+    assert summary["sample_count"] == expected["sample_count"]
+    assert summary["last_reading_at"] == expected["last_reading_at"]
+    for name in METRICS:
+        for key, value in expected["metrics"][name].items():
+            assert summary["metrics"][name][key] == pytest.approx(value, rel=1e-9, abs=1e-9), (name, key)
+
+
+def test_partial_states_merge_exactly():
+    rows = sample(200)
+    whole, first, second = _DeviceStats(), _DeviceStats(), _DeviceStats()
+    for i, (values, created_at) in enumerate(rows):
+        whole.add(values, created_at)
+        (first if i % 3 else second).add(values, created_at)
+
+    first.merge(second)
+
+    assert first.count == whole.count and first.last_at == whole.last_at
+    for name in METRICS:
+        merged, expected = first.metrics[name].summary(), whole.metrics[name].summary()
+        for key, value in expected.items():
+            assert merged[key] == pytest.approx(value, rel=1e-9, abs=1e-9), (name, key)
+
+
+def test_workers_checkpoint_into_one_row(run, make_device):
+    from app.core.db import AsyncSessionLocal
+
+    device_id, reference_id = make_device()["id"], make_device()["id"]
+    rows = sample(120, seed=2)
+    single, workers = OnlineStats(), [OnlineStats(), OnlineStats()]
+    for i, (values, created_at) in enumerate(rows):
+        single.update(reference_id, values, created_at)
+        workers[i % 2].update(device_id, values, created_at)
+
+    async def checkpoint_all():
+        for worker in workers:
+            async with AsyncSessionLocal() as db:
+                assert await worker.checkpoint(db) == 1
+        async with AsyncSessionLocal() as db:
+            reader = OnlineStats()
+            return await reader.get_summary(db, device_id), await single.get_summary(db, reference_id)
+
+    stored, expected = run(checkpoint_all)
+    assert stored["sample_count"] == len(rows)
+    assert_same(stored, expected)
+
+
+def test_checkpoint_skips_deleted_devices(client, run, make_device):
+    from app.core.db import AsyncSessionLocal
+
+    kept, deleted = make_device()["id"], make_device()["id"]
+    stats = OnlineStats()
+    for values, created_at in sample(10):
+        stats.update(kept, values, created_at)
+        stats.update(deleted, values, created_at)
+    assert client.delete(f"/api/v1/devices/{deleted}").status_code in (200, 204)
+
+    async def checkpoint():
+        async with AsyncSessionLocal() as db:
+            written = await stats.checkpoint(db)
+            return written, await stats.get_summary(db, kept)
+
+    written, summary = run(checkpoint)
+    assert written == 1
+    assert summary["sample_count"] == 10
+    assert stats.pending_checkpoints() == 0
+
+
+def test_reset_discards_earlier_partial_states(run, make_device):
+    from app.core.db import AsyncSessionLocal
+
+    device_id = make_device()["id"]
+    before_reset, resetting = OnlineStats(), OnlineStats()
+    for values, created_at in sample(10):
+        before_reset.update(device_id, values, created_at)
+
+    async def reset_then_checkpoint():
+        async with AsyncSessionLocal() as db:
+            await resetting.reset(db, device_id)
+            await db.commit()
+        async with AsyncSessionLocal() as db:
+            written = await before_reset.checkpoint(db)
+            return written, await resetting.get_summary(db, device_id)
+
+    written, summary = run(reset_then_checkpoint)
+    assert written == 0
+    assert summary["sample_count"] == 0
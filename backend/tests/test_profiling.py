@@ -0,0 +1,44 @@
+import os
+import time
+
+from app.core.profiling import event_loop_monitor, profiler_lock
+
+
+def test_profile_requires_a_superuser(client, auth_headers):
+    assert client.get("/api/v1/admin/profile", params={"seconds": 0.1}).status_code == 401
+    assert client.get("/api/v1/admin/profile", params={"seconds": 0.1}, headers=auth_headers()).status_code == 403
+
+
+def test_profile_samples_then_releases_the_worker(client, auth_headers):
+    headers = auth_headers(superuser=True)
+    response = client.get("/api/v1/admin/profile", params={"seconds": 0.2, "interval_ms": 5}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["X-Worker-PID"] == str(os.getpid())
+    lines = response.text.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) >= 1 and stack
+    # Stopped: the next profile may start
+    assert not profiler_lock.locked()
+
+
+def test_one_profile_at_a_time(client, auth_headers):
+    headers = auth_headers(superuser=True)
+    with profiler_lock:
+        assert client.get("/api/v1/admin/profile", params={"seconds": 0.1}, headers=headers).status_code == 409
+    assert client.get("/api/v1/admin/profile", params={"seconds": 0.1}, headers=headers).status_code == 200
+
+
+def test_event_loop_stalls_are_captured(client, run, auth_headers):
+    from app.core.config import settings
+
+    event_loop_monitor.stalls.clear()
+
+    async def block_the_loop():
+        time.sleep(settings.EVENT_LOOP_STALL_SECONDS + 4 * settings.EVENT_LOOP_LAG_CHECK_SECONDS)
+
+    run(block_the_loop)
+    stalls = client.get("/api/v1/admin/event-loop/stalls", headers=auth_headers(superuser=True)).json()["stalls"]
+    assert any("block_the_loop" in stall["stack"] for stall in stalls)
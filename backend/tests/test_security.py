@@ -0,0 +1,164 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.config import settings
+
+
+def test_cancelled_hash_jobs_release_queue_slots(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_QUEUE", 1)
+    release = threading.Event()
+    started = threading.Barrier(settings.PASSWORD_HASH_WORKERS + 1)
+
+    def block() -> str:
+        started.wait()
+        release.wait()
+        return "done"
+
+    async def scenario():
+        # Occupy every pool thread
+        busy = [asyncio.ensure_future(security._run_in_hash_pool(block)) for _ in range(settings.PASSWORD_HASH_WORKERS)]
+        await asyncio.to_thread(started.wait)
+
+        queued = asyncio.ensure_future(security._run_in_hash_pool(lambda: "queued"))
+        await asyncio.sleep(0)
+        assert security._queued == 1
+        with pytest.raises(HTTPException) as rejected:
+            await security._run_in_hash_pool(lambda: "rejected")
+        assert rejected.value.status_code == 503
+
+        # The client goes away while its job is still waiting
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert security._queued == 0
+
+        accepted = asyncio.ensure_future(security._run_in_hash_pool(lambda: "accepted"))
+        await asyncio.sleep(0)
+        release.set()
+        assert await accepted == "accepted"
+        assert await asyncio.gather(*busy) == ["done"] * settings.PASSWORD_HASH_WORKERS
+
+    asyncio.run(scenario())
+    assert security._queued == 0
+
+
+def test_password_hash_roundtrip_off_loop():
+    async def scenario():
+        hashed = await security.get_password_hash_async("correct horse")
+        assert await security.verify_password_async("correct horse", hashed)
+        assert not await security.verify_password_async("wrong", hashed)
+
+    asyncio.run(scenario())
+
+
+def _reading(device_uid: str) -> dict:
+    return {"device_uid": device_uid, "tilt_x": 100, "tilt_y": 200, "tilt_z": 16000, "distance_mm": 500}
+
+
+def test_ingest_key_rotation_requires_superuser(client, make_device, auth_headers):
+    device = make_device()
+    url = f"/api/v1/devices/{device['id']}/ingest-key"
+
+    assert client.post(url).status_code == 401
+    assert client.post(url, headers=auth_headers()).status_code == 403
+    response = client.post(url, headers=auth_headers(superuser=True))
+    assert response.status_code == 200
+    assert response.json()["ingest_key"]
+
+
+def test_ingest_key_verification_and_rotation_grace(client, make_device, auth_headers, monkeypatch):
+    device = make_device()
+    admin = auth_headers(superuser=True)
+    url = f"/api/v1/devices/{device['id']}/ingest-key"
+    ingest = "/api/v1/sensor/ingest"
+
+    # Without a key configured, keyless devices are accepted unless keys are required
+    assert client.post(ingest, json=_reading(device["device_uid"])).status_code == 201
+    monkeypatch.setattr(settings, "INGEST_REQUIRE_DEVICE_KEY", True)
+    assert client.post(ingest, json=_reading(device["device_uid"])).status_code == 401
+    monkeypatch.setattr(settings, "INGEST_REQUIRE_DEVICE_KEY", False)
+
+    first = client.post(url, headers=admin).json()["ingest_key"]
+    assert client.post(ingest, json=_reading(device["device_uid"])).status_code == 401
+    assert client.post(ingest, json=_reading(device["device_uid"]), headers={"X-Device-Key": "wrong"}).status_code == 401
+    assert client.post(ingest, json=_reading(device["device_uid"]), headers={"X-Device-Key": first}).status_code == 201
+
+    rotated = client.post(url, headers=admin).json()
+    second = rotated["ingest_key"]
+    assert rotated["previous_key_valid_until"] is not None
+    for key in (first, second):
+        response = client.post(ingest, json=_reading(device["device_uid"]), headers={"X-Device-Key": key})
+        assert response.status_code == 201, key
+
+    # Once the grace period is over only the new key works
+    monkeypatch.setattr(settings, "DEVICE_KEY_ROTATION_GRACE_SECONDS", 0)
+    third = client.post(url, headers=admin).json()["ingest_key"]
+    assert client.post(ingest, json=_reading(device["device_uid"]), headers={"X-Device-Key": second}).status_code == 401
+    assert client.post(ingest, json=_reading(device["device_uid"]), headers={"X-Device-Key": third}).status_code == 201
+
+
+def test_api_key_hash_is_keyed():
+    key = security.generate_api_key()
+    hashed = security.get_api_key_hash(key)
+    assert hashed != key
+    assert security.verify_api_key(key, hashed)
+    assert not security.verify_api_key(key + "x", hashed)
+
+
+def test_principal_cache_is_invalidated_by_user_updates(client, run, auth_headers):
+    from sqlalchemy import select
+
+    from app.core.db import AsyncSessionLocal
+    from app.core.query_stats import assert_max_queries
+    from app.models.user import User
+    from conftest import run_sql
+
+    headers = auth_headers()
+    user_id = client.get("/api/v1/users/me", headers=headers).json()["id"]
+
+    # Cached: no lookup, so a change made outside the ORM goes unnoticed until the TTL ends
+    run_sql(f"UPDATE users SET full_name = 'Changed' WHERE id = {user_id}")
+    with assert_max_queries(0):
+        assert client.get("/api/v1/users/me", headers=headers).json()["full_name"] is None
+
+    async def deactivate():
+        async with AsyncSessionLocal() as db:
+            user = (await db.execute(select(User).where(User.id == user_id))).scalar_one()
+            user.is_active = False
+            await db.commit()
+
+    run(deactivate)
+    assert client.get("/api/v1/users/me", headers=headers).status_code == 400
+
+
+def test_embedded_claims_authenticate_without_a_lookup(client, db, monkeypatch):
+    from jose import jwt
+
+    from app.core.query_stats import assert_max_queries
+    from conftest import run_sql
+
+    hashed = security.get_password_hash("correct horse")
+    run_sql(
+        "INSERT INTO users (email, full_name, hashed_password, is_active, is_superuser) "
+        f"VALUES ('claims@example.com', 'Claims', '{hashed}', true, true)"
+    )
+    monkeypatch.setattr(settings, "JWT_EMBED_CLAIMS", True)
+    response = client.post("/api/v1/auth/access-token", data={"username": "claims@example.com", "password": "correct horse"})
+    token = response.json()["access_token"]
+
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    assert (claims["email"], claims["name"], claims["active"], claims["su"]) == ("claims@example.com", "Claims", True, True)
+
+    # Everything comes from the token: even a deleted user is served until it expires
+    run_sql("DELETE FROM users WHERE email = 'claims@example.com'")
+    with assert_max_queries(0):
+        me = client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.status_code == 200 and me.json()["full_name"] == "Claims"
+
+    # Without the option the same token is checked against the database
+    monkeypatch.setattr(settings, "JWT_EMBED_CLAIMS", False)
+    assert client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {token}"}).status_code == 404
@@ -0,0 +1,30 @@
+import json
+
+
+def test_upload_without_file_rereads_the_last_upload_in_its_format(client, make_device, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    device = make_device()
+    url = f"/api/v1/sensor/devices/{device['id']}/upload"
+    rows = [
+        {"created_at": f"2025-01-01T10:0{i}:00+00:00", "status": "SAFE", "tilt_change_percent": float(i)}
+        for i in range(3)
+    ]
+    body = "\n".join(json.dumps(row) for row in rows).encode()
+
+    response = client.post(url, files={"file": ("readings.jsonl", body, "application/x-ndjson")})
+    assert response.status_code == 201 and response.json()["errors"] is None
+    assert [path.name for path in (tmp_path / "temp_uploads").iterdir()] == ["sensor_data_processed.jsonl"]
+
+    response = client.post(url)
+    assert response.status_code == 201 and response.json()["errors"] is None
+    assert response.json()["message"] == "Successfully processed 3 entries."
+
+
+def test_upload_of_unsupported_file_is_not_stored(client, make_device, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    device = make_device()
+    response = client.post(
+        f"/api/v1/sensor/devices/{device['id']}/upload", files={"file": ("notes.txt", b"a", "text/plain")}
+    )
+    assert response.status_code == 400
+    assert not (tmp_path / "temp_uploads").exists()
@@ -25,6 +25,7 @@ import {
 import { AxisChart, AxisDataPoint } from "@/components/dashboard/axis-chart"
 import { DistanceChart, DistanceDataPoint } from "@/components/dashboard/distance-chart"
 import { PageHeader } from "@/components/dashboard/page-header"
+import { fromColumnar, ColumnarPayload } from "@/lib/columnar"
 
 interface Device {
     id: number
@@ -117,10 +118,12 @@ export default function AnalysisPage() {
             // Build query params
             const params = new URLSearchParams()
             params.append("limit", "200") // Get more points for charts
+            params.append("format", "columnar") // Compact payload, one array per field
 
             const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/v1/sensor/devices/${deviceId}/processed?${params.toString()}`)
             if (response.ok) {
-                let result: ProcessedData[] = await response.json()
+                const payload: ColumnarPayload = await response.json()
+                let result = fromColumnar<ProcessedData>(payload)
 
                 // Filter by Date Range (Client-side)
                 if (dateRange?.from) {
@@ -0,0 +1,39 @@
+export interface ColumnarPayload {
+  format: "columnar"
+  count: number
+  columns: Record<string, unknown[]>
+  time_base?: number
+  time_unit?: "ms"
+  status_codes?: string[]
+}
+
+// Rebuild row objects from a `format=columnar` API response.
+// Timestamps arrive as millisecond deltas (first relative to time_base,
+// then to the previous row) and statuses as indexes into status_codes.
+export function fromColumnar<T>(
+  payload: ColumnarPayload,
+  timeKey = "created_at",
+  statusKey = "status"
+): T[] {
+  const { columns, count } = payload
+  const keys = Object.keys(columns)
+  const rows: Record<string, unknown>[] = []
+
+  let time = payload.time_base ?? 0
+  for (let i = 0; i < count; i++) {
+    const row: Record<string, unknown> = {}
+    for (const key of keys) {
+      const value = columns[key][i]
+      if (key === timeKey) {
+        time += value as number
+        row[key] = new Date(time).toISOString()
+      } else if (key === statusKey && payload.status_codes) {
+        row[key] = payload.status_codes[value as number]
+      } else {
+        row[key] = value
+      }
+    }
+    rows.push(row)
+  }
+  return rows as T[]
+}
@@ -10,6 +10,20 @@ const char *password = "password";
 // ================= API =================
 const char *serverUrl = "https://[yourdomain.com]/api/v1/sensor/ingest";
 String deviceUID = "esp32_structsense_001";
+// Ingest key from POST /api/v1/devices/{id}/ingest-key (leave empty if none)
+String deviceKey = "";
+
+// Idempotency: a reading that got no definitive answer (network error,
+// 5xx, 429) is resent with the same body and Idempotency-Key, so the backend
+// stores it once. The boot id keeps keys unique across reboots.
+uint32_t bootId = 0;
+uint32_t readingSeq = 0;
+String pendingBody = "";  // Reading awaiting a definitive answer
+String pendingKey = "";
+int pendingAttempts = 0;
+#define MAX_SEND_ATTEMPTS 5  // Then the reading is dropped
+// Delay requested by the server (Retry-After on 503/429)
+unsigned long backoffMs = 0;
 
 // ================= MPU6050 =============
 MPU6050 mpu;
@@ -23,6 +37,7 @@ MPU6050 mpu;
 // ================= Setup ===============
 void setup() {
   Serial.begin(115200);
+  bootId = esp_random();
 
   // WiFi connect
   WiFi.begin(ssid, password);
@@ -112,30 +127,58 @@ void loop() {
   Serial.println(distance_mm, 2);
 
   // ----- Send to backend -----
+  if (pendingBody.length() == 0) {
+    // New reading (the previous one was answered): new key
+    readingSeq++;
+    pendingKey = String(bootId, HEX) + "-" + String(readingSeq);
+    pendingBody = "{";
+    pendingBody += "\"device_uid\":\"" + deviceUID + "\",";
+    pendingBody += "\"tilt_x\":" + String(ax) + ",";
+    pendingBody += "\"tilt_y\":" + String(ay) + ",";
+    pendingBody += "\"tilt_z\":" + String(az) + ",";
+    pendingBody += "\"distance_mm\":" + String(distance_mm, 2);
+    pendingBody += "}";
+    pendingAttempts = 0;
+  }
+  // Otherwise retry the unanswered reading as is (this loop's sample waits)
+
   if (WiFi.status() == WL_CONNECTED) {
 
     HTTPClient http;
     http.begin(serverUrl);
     http.addHeader("Content-Type", "application/json");
+    if (deviceKey.length() > 0) {
+      http.addHeader("X-Device-Key", deviceKey);
+    }
+    http.addHeader("Idempotency-Key", pendingKey);
 
-    String jsonData = "{";
-    jsonData += "\"device_uid\":\"" + deviceUID + "\",";
-    jsonData += "\"tilt_x\":" + String(ax) + ",";
-    jsonData += "\"tilt_y\":" + String(ay) + ",";
-    jsonData += "\"tilt_z\":" + String(az) + ",";
-    jsonData += "\"distance_mm\":" + String(distance_mm, 2);
-    jsonData += "}";
-
-    int httpResponseCode = http.POST(jsonData);
+    const char* responseHeaders[] = {"Retry-After"};
+    http.collectHeaders(responseHeaders, 1);
+    int httpResponseCode = http.POST(pendingBody);
+    pendingAttempts++;
 
     Serial.print("HTTP Response: ");
     Serial.println(httpResponseCode);
 
+    // Server busy or throttled: wait as long as it asks (capped at 60s)
+    if ((httpResponseCode == 503 || httpResponseCode == 429) && http.hasHeader("Retry-After")) {
+      long retryAfter = http.header("Retry-After").toInt();
+      backoffMs = (unsigned long)constrain(retryAfter, 1L, 60L) * 1000UL;
+    } else {
+      backoffMs = 0;
+    }
+
+    // Retry on transport errors (< 0), 429 and 5xx; anything else is final
+    bool retry = httpResponseCode < 0 || httpResponseCode == 429 || httpResponseCode >= 500;
+    if (!retry || pendingAttempts >= MAX_SEND_ATTEMPTS) {
+      pendingBody = "";
+    }
+
     http.end();
 
   } else {
     Serial.println("WiFi disconnected");
   }
 
-  delay(3000); // Send every 3 seconds
+  delay(backoffMs > 3000 ? backoffMs : 3000); // Send every 3 seconds (or after Retry-After)
 }